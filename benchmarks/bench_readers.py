@@ -0,0 +1,112 @@
+"""
+Бенчмарк движков чтения Excel на синтетических файлах: для каждого установленного
+движка замеряет чтение листа целиком (как в pd.read_excel) и потоковый проход
+по всем строкам (как при чтении больших файлов порциями).
+
+    python -m benchmarks.bench_readers --rows 1000 100000 --output benchmarks/results/readers.json
+    python -m benchmarks.bench_readers --files uploads/*.xls
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from benchmarks.generate_workbooks import REPORT_TYPES, generate_workbook, workbook_path
+from utils.excel_readers import ENGINES
+
+
+def _timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def _read_full(engine, path: str) -> None:
+    engine.read(path, header=None)
+
+
+def _read_rows(engine, path: str) -> None:
+    with engine.rows(path) as rows:
+        for _ in rows:
+            pass
+
+
+def benchmark_file(path: str, repeat: int) -> list[dict]:
+    results = []
+    for engine in ENGINES.values():
+        if not engine.supports(path) or not engine.is_available():
+            continue
+        result = {"file": os.path.basename(path), "file_bytes": os.path.getsize(path), "engine": engine.name}
+        try:
+            # Лучший прогон из repeat: он меньше всего зависит от шума системы
+            result["full_s"] = min(_timed(_read_full, engine, path) for _ in range(repeat))
+            result["rows_s"] = min(_timed(_read_rows, engine, path) for _ in range(repeat))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        results.append(result)
+
+        if "error" in result:
+            print(f"{result['file']:28} {engine.name:18} ошибка: {result['error']}", file=sys.stderr)
+        else:
+            print(
+                f"{result['file']:28} {engine.name:18} целиком {result['full_s']:.3f} с, "
+                f"по строкам {result['rows_s']:.3f} с",
+                file=sys.stderr
+            )
+    return results
+
+
+def run(args) -> dict:
+    paths = list(args.files or [])
+    if not paths:
+        for report_type in args.reports:
+            for rows in args.rows:
+                path = workbook_path(args.data, report_type, rows)
+                if not os.path.exists(path):
+                    print(f"+ генерирую {path}", file=sys.stderr)
+                    generate_workbook(report_type, rows, path)
+                paths.append(path)
+
+    results = []
+    for path in paths:
+        results.extend(benchmark_file(path, args.repeat))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "engines": [engine.name for engine in ENGINES.values() if engine.is_available()],
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк движков чтения Excel")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--reports", nargs="+", choices=REPORT_TYPES, default=list(REPORT_TYPES))
+    parser.add_argument("--data", default=os.path.join("benchmarks", "data"))
+    parser.add_argument("--files", nargs="+", help="замерить на этих файлах вместо синтетических")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="куда записать результаты в JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    payload = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк запуска бота: каждый прогон — свежий процесс Python, как после перезапуска.
+Замеряет импорт обработчиков (с этого момента бот отвечает на команды в режиме
+STARTUP_MODE=lazy), импорт модулей отчётов (pandas, NumPy, openpyxl) и прогрев.
+
+    python -m benchmarks.bench_startup --repeat 5 --output benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Корень репозитория: дочерний процесс импортирует модули бота оттуда
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: печатает длительности этапов в JSON
+_CHILD = """
+import json, time
+
+started = time.perf_counter()
+from handlers import file_handler
+handlers_s = time.perf_counter() - started
+
+started = time.perf_counter()
+file_handler.load_report_stack()
+report_stack_s = time.perf_counter() - started
+
+from reports.runner import warm_up
+started = time.perf_counter()
+warm_up()
+warm_up_s = time.perf_counter() - started
+
+print(json.dumps({"handlers_s": handlers_s, "report_stack_s": report_stack_s, "warm_up_s": warm_up_s}))
+"""
+
+STAGES = ("process_s", "handlers_s", "report_stack_s", "warm_up_s")
+
+
+def _run_once(workdir: str) -> dict:
+    # Обработчики создают папки загрузок и снимков в текущем каталоге — не засоряем репозиторий
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    process_s = time.perf_counter() - started
+    return {"process_s": process_s, **json.loads(output.strip().splitlines()[-1])}
+
+
+def run(repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [_run_once(workdir) for _ in range(repeat)]
+
+    # Лучший прогон по каждому этапу: он меньше всего зависит от шума системы
+    result = {stage: min(run[stage] for run in runs) for stage in STAGES}
+    print(
+        f"процесс целиком {result['process_s']:.3f} с, обработчики {result['handlers_s']:.3f} с, "
+        f"модули отчётов {result['report_stack_s']:.3f} с, прогрев {result['warm_up_s']:.3f} с",
+        file=sys.stderr
+    )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "result": result,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска бота")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="куда записать результаты в JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    payload = json.dumps(run(args.repeat), ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
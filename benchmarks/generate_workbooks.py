@@ -0,0 +1,154 @@
+"""
+Генератор синтетических Excel-файлов для бенчмарков.
+
+Для каждого типа отчёта создаёт книгу с реалистичной структурой:
+    python -m benchmarks.generate_workbooks --rows 1000 100000 --out benchmarks/data
+"""
+import argparse
+import os
+import random
+
+from openpyxl import Workbook
+
+# Типы отчётов, для которых умеем генерировать файлы
+REPORT_TYPES = ("schedule", "topics", "students", "attendance", "homework_check", "homework_submit")
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Васильев", "Соколов"]
+NAMES = ["Алексей", "Мария", "Дмитрий", "Анна", "Игорь", "Елена", "Павел", "Ольга"]
+SUBJECTS = [
+    "Математика", "Физика", "Информатика", "История", "Английский язык",
+    "Базы данных", "Web-программирование", "Операционные системы"
+]
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+PAIR_TIMES = ["09:00 - 10:30", "10:40 - 12:10", "12:40 - 14:10", "14:20 - 15:50", "16:00 - 17:30"]
+
+
+def _person(rnd: random.Random) -> str:
+    return f"{rnd.choice(SURNAMES)} {rnd.choice(NAMES)}"
+
+
+def _group(rnd: random.Random) -> str:
+    return f"{rnd.randint(1, 9)}/{rnd.randint(1, 4)}-РПО-{rnd.randint(20, 25)}/{rnd.randint(1, 3)}"
+
+
+def _schedule_rows(rows: int, rnd: random.Random):
+    yield ["Группа", "Пара", "Время", *DAYS]
+    for i in range(rows):
+        cells = []
+        for _ in DAYS:
+            # Часть ячеек пустая — у группы нет пары в этот день
+            if rnd.random() < 0.2:
+                cells.append(None)
+                continue
+            cells.append(
+                f"Предмет: {rnd.choice(SUBJECTS)}\n"
+                f"Преподаватель: {_person(rnd)}\n"
+                f"Аудитория: {rnd.randint(100, 450)}"
+            )
+        yield [_group(rnd), i % len(PAIR_TIMES) + 1, PAIR_TIMES[i % len(PAIR_TIMES)], *cells]
+
+
+def _topics_rows(rows: int, rnd: random.Random):
+    yield ["Дата", "Группа", "Тема урока"]
+    for i in range(rows):
+        subject = rnd.choice(SUBJECTS)
+        # Примерно каждая десятая тема записана с ошибкой
+        if rnd.random() < 0.1:
+            topic = rnd.choice([f"{subject}: занятие {i}", f"Урок {i} {subject}", ""])
+        else:
+            topic = f"Урок № {i % 40 + 1}. Тема: {subject}"
+        yield [f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", _group(rnd), topic or None]
+
+
+def _students_rows(rows: int, rnd: random.Random):
+    yield ["FIO", "Группа", "Homework", "Classroom", "Percentage Homework", "Average score"]
+    for _ in range(rows):
+        yield [
+            _person(rnd),
+            _group(rnd),
+            rnd.choice([1, 1, 2, 3, 4, 5, 4.5]),
+            rnd.choice([1, 2, 2.5, 3, 4, 5, None]),
+            round(rnd.uniform(0, 100), 1),
+            round(rnd.uniform(1, 5), 2),
+        ]
+
+
+def _attendance_rows(rows: int, rnd: random.Random):
+    yield ["ФИО преподавателя", "Количество пар", "Средняя посещаемость"]
+    for _ in range(rows):
+        percent = round(rnd.uniform(10, 100), 1)
+        # Посещаемость в выгрузках встречается и числом, и строкой "35,5%"
+        value = percent if rnd.random() < 0.5 else f"{percent}".replace(".", ",") + "%"
+        yield [_person(rnd), rnd.randint(1, 80), value]
+
+
+def _homework_check_rows(rows: int, rnd: random.Random):
+    # Двухуровневая шапка: пустые ячейки верхнего уровня pandas протягивает вправо
+    yield ["ФИО преподавателя", "Месяц", None, "Неделя", None]
+    yield [None, "Получено", "Проверено", "Получено", "Проверено"]
+    for _ in range(rows):
+        month_received = rnd.randint(0, 200)
+        week_received = rnd.randint(0, 50)
+        yield [
+            _person(rnd),
+            month_received,
+            rnd.randint(0, month_received),
+            week_received,
+            rnd.randint(0, week_received),
+        ]
+
+
+ROW_GENERATORS = {
+    "schedule": _schedule_rows,
+    "topics": _topics_rows,
+    "students": _students_rows,
+    "attendance": _attendance_rows,
+    "homework_check": _homework_check_rows,
+    "homework_submit": _students_rows,
+}
+
+
+def workbook_path(out_dir: str, report_type: str, rows: int) -> str:
+    return os.path.join(out_dir, f"{report_type}_{rows}.xlsx")
+
+
+def generate_workbook(report_type: str, rows: int, path: str, seed: int = 0) -> str:
+    """
+    Записывает книгу для отчёта report_type с rows строками данных.
+    Используется потоковый режим openpyxl, поэтому память не растёт с размером файла.
+    """
+    rnd = random.Random(f"{seed}:{report_type}:{rows}")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Лист1")
+    for row in ROW_GENERATORS[report_type](rows, rnd):
+        sheet.append(row)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генерация синтетических Excel-файлов для бенчмарков")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--reports", nargs="+", choices=REPORT_TYPES, default=list(REPORT_TYPES))
+    parser.add_argument("--out", default=os.path.join("benchmarks", "data"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="перезаписать существующие файлы")
+    args = parser.parse_args()
+
+    for report_type in args.reports:
+        for rows in args.rows:
+            path = workbook_path(args.out, report_type, rows)
+            if os.path.exists(path) and not args.force:
+                print(f"= {path}")
+                continue
+            generate_workbook(report_type, rows, path, args.seed)
+            print(f"+ {path} ({os.path.getsize(path) / 1024 / 1024:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Бенчмарк построения отчётов: отдельно замеряет разбор файла, построение отчёта
+и форматирование сообщения, а также пиковую память.
+
+    python -m benchmarks.run_benchmarks --rows 1000 100000 --output benchmarks/results/run.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/base.json benchmarks/results/run.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from benchmarks.generate_workbooks import REPORT_TYPES, generate_workbook, workbook_path
+from reports.registry import REPORTS
+from utils.dataframe_cache import load_excel
+from utils.universal_report_sender import prepare_report
+
+# Во сколько раз стадия может замедлиться, прежде чем это считается регрессией
+DEFAULT_THRESHOLD = 1.2
+
+
+def _timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _format(result) -> None:
+    # Сообщения и файлы (полный список и выгрузка) собираются в памяти, как в боте
+    prepare_report(chat_id=0, title="Отчёт", items=result.items, table=result.table)
+
+
+def _run_once(path: str, options: dict, builder) -> dict:
+    # Разбор без кэша, но с теми же колонками и типами, что и в боте
+    df, parse_s = _timed(load_excel, path, **options)
+    result, build_s = _timed(builder, df)
+    _, format_s = _timed(_format, result)
+    return {"parse_s": parse_s, "build_s": build_s, "format_s": format_s, "items": len(result.items)}
+
+
+def _peak_memory(path: str, options: dict, builder) -> dict:
+    # Отдельный прогон под tracemalloc: он замедляет код, поэтому время здесь не меряем
+    peaks = {}
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        df = load_excel(path, **options)
+        peaks["parse_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+
+        tracemalloc.reset_peak()
+        result = builder(df)
+        peaks["build_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+
+        tracemalloc.reset_peak()
+        _format(result)
+        peaks["format_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def benchmark_case(report_type: str, path: str, repeat: int, measure_memory: bool) -> dict:
+    report = REPORTS[report_type]
+    options = report.load_options()
+
+    runs = [_run_once(path, options, report.builder) for _ in range(repeat)]
+    # Берём лучший прогон по каждой стадии: он меньше всего зависит от шума системы
+    result = {
+        "report": report_type,
+        "file": os.path.basename(path),
+        "file_bytes": os.path.getsize(path),
+        "items": runs[0]["items"],
+        **{stage: min(run[stage] for run in runs) for stage in ("parse_s", "build_s", "format_s")},
+    }
+    if measure_memory:
+        result.update(_peak_memory(path, options, report.builder))
+    return result
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    results = []
+    for report_type in args.reports:
+        for rows in args.rows:
+            path = workbook_path(args.data, report_type, rows)
+            if not os.path.exists(path):
+                print(f"+ генерирую {path}", file=sys.stderr)
+                generate_workbook(report_type, rows, path)
+
+            result = benchmark_case(report_type, path, args.repeat, not args.no_memory)
+            result["rows"] = rows
+            results.append(result)
+            print(
+                f"{report_type:16} {rows:>9} строк: разбор {result['parse_s']:.3f} с, "
+                f"отчёт {result['build_s']:.3f} с, формат {result['format_s']:.3f} с",
+                file=sys.stderr
+            )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """
+    Сравнивает два прогона и печатает стадии, которые замедлились сильнее threshold.
+    Возвращает код выхода: 1, если найдены регрессии.
+    """
+    with open(base_path, encoding="utf-8") as f:
+        base = {(r["report"], r["rows"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r["report"], r["rows"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for key in sorted(base.keys() & new.keys()):
+        for stage in ("parse_s", "build_s", "format_s"):
+            before, after = base[key][stage], new[key][stage]
+            ratio = after / before if before else 1.0
+            mark = ""
+            if ratio > threshold:
+                mark = "  <-- регрессия"
+                regressions += 1
+            print(f"{key[0]:16} {key[1]:>9} {stage:9} {before:9.4f} -> {after:9.4f} ({ratio:5.2f}x){mark}")
+
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк отчётов по синтетическим файлам")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--reports", nargs="+", choices=REPORT_TYPES, default=list(REPORT_TYPES))
+    parser.add_argument("--data", default=os.path.join("benchmarks", "data"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="не замерять пиковую память")
+    parser.add_argument("--output", help="куда записать результаты в JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="сравнить два прогона")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, args.threshold))
+
+    results = run(args)
+    payload = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
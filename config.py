@@ -1,5 +1,93 @@
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+# Максимальный объём памяти (в МБ) под кэш разобранных Excel-файлов
+DF_CACHE_MAX_MB = int(os.getenv("DF_CACHE_MAX_MB", "512"))
+
+# Режим построения отчётов: "inline" — в потоке обработчика, "process" — в пуле процессов
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "inline")
+# Количество процессов в пуле (по умолчанию — по числу ядер)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0")) or os.cpu_count()
+# Сколько отчётов может одновременно стоять в очереди и выполняться
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "50"))
+
+# Адрес Bot API (например, локального сервера Bot API или тестовой заглушки).
+# По умолчанию используется https://api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Файлы больше этого размера (в МБ) читаются потоково, порциями по STREAM_CHUNK_ROWS строк
+STREAMING_THRESHOLD_MB = int(os.getenv("STREAMING_THRESHOLD_MB", "50"))
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "50000"))
+
+# Форматы выгрузки строк отчёта файлами через запятую: "xlsx", "csv" (пусто — без выгрузки).
+# По умолчанию выключено: лишний документ к каждому отчёту удваивает число отправок в чат
+EXPORT_FORMATS = [fmt.strip() for fmt in os.getenv("EXPORT_FORMATS", "").split(",") if fmt.strip()]
+
+# Хранилище загруженных файлов: сколько МБ может занимать файл одного чата,
+# все файлы вместе (включая файлы пакетов и колоночные копии), и через сколько часов без обращений файл удаляется
+UPLOAD_CHAT_QUOTA_MB = int(os.getenv("UPLOAD_CHAT_QUOTA_MB", "100"))
+UPLOAD_TOTAL_QUOTA_MB = int(os.getenv("UPLOAD_TOTAL_QUOTA_MB", "2048"))
+UPLOAD_TTL_HOURS = float(os.getenv("UPLOAD_TTL_HOURS", "24"))
+
+# Пакетный режим (/batch и ZIP-архивы): сколько файлов может быть в пакете
+# и сколько МБ могут занимать все файлы пакета вместе (и ZIP-архив)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "40"))
+BATCH_QUOTA_MB = int(os.getenv("BATCH_QUOTA_MB", "500"))
+
+# Сколько МБ памяти могут занимать готовые результаты отчётов (0 — не хранить)
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "128"))
+
+# Длинные списки отчётов для листания кнопками ◀ / ▶: сколько МБ они могут занимать
+# в памяти и через сколько часов без листания список удаляется
+PAGE_STORE_MB = int(os.getenv("PAGE_STORE_MB", "64"))
+PAGE_TTL_HOURS = float(os.getenv("PAGE_TTL_HOURS", "48"))
+
+# Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 — не запускать)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Telegram ID администраторов через запятую: им доступна команда /stats
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
+# Способ получения обновлений: "polling" — long polling, "webhook" — встроенный HTTP-сервер
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+# Публичный адрес webhook для setWebhook (пусто — адрес не меняется, например,
+# если он уже задан для балансировщика перед несколькими процессами бота)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Адрес, порт и путь, на которых HTTP-сервер принимает обновления
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Секретный токен: Telegram присылает его в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Ограничения исходящих запросов к Telegram: запросов в секунду на бота и на чат,
+# сколько запросов подряд можно отправить в чат без ожидания, и сколько раз
+# повторять запрос после 429 или временной ошибки
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "5"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))
+# Сколько потоков отправляют запросы из очереди (обработчики только ставят запросы в очередь)
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "4"))
+
+# Допустимые форматы темы урока: JSON-список регулярных выражений (без учёта регистра).
+# Тема считается верной, если с начала строки подходит хотя бы одно выражение
+LESSON_TOPIC_PATTERNS = json.loads(os.getenv("LESSON_TOPIC_PATTERNS") or "null") or [
+    r"^Урок\s*№?\s*\d+\.\s*Тема:\s*.+",
+]
+
+# Запуск: "eager" — модули отчётов (pandas, openpyxl) импортируются до приёма сообщений,
+# "lazy" — при первой загрузке файла, чтобы после перезапуска бот сразу отвечал на команды
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+# Прогревать бота в фоне сразу после запуска: импорт модулей отчётов,
+# пробный разбор книги и запуск процесса пула (1 — включено)
+PREWARM = os.getenv("PREWARM", "0") == "1"
+
+# Движок чтения Excel: "auto" — по типу и размеру файла из установленных
+# (calamine, openpyxl_readonly, openpyxl, xlrd) или название движка, который пробовать первым
+READER_ENGINE = os.getenv("READER_ENGINE", "auto")
@@ -0,0 +1,296 @@
+import asyncio
+import io
+import logging
+import time
+
+from telebot.types import InputFile
+
+from handlers import file_handler
+from handlers.file_handler import (
+    PAGES_EXPIRED_TEXT, BatchRun, batch_mode_text, batch_reply_options, batch_status_text,
+    cancel_batch, diff_mode_text, get_report_keyboard, is_excel_file, is_not_modified, is_upload_too_large, is_zip_file,
+    job_result, load_report_stack, page_action, page_store, remember_result, reply_options, report_error_text,
+    report_job, report_results, save_batch_upload, save_upload, snapshot_store, submit_batch, upload_too_large_text
+)
+from utils.telegram_api import iter_file_chunks
+from utils.upload_store import UploadTooLargeError
+from utils.report_pages import is_page_callback
+from reports.registry import ALL_REPORTS, REPORTS, result_key
+from utils.report_queue import QueueFullError, create_report_queue
+from utils import metrics
+from config import EXECUTION_MODE, REPORT_WORKERS, REPORT_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def register_async(bot):
+    """
+    Регистрация обработчиков документов и кнопок для AsyncTeleBot.
+    Сетевые вызовы выполняются асинхронно, а чтение файла и построение отчёта —
+    в пуле потоков или процессов (EXECUTION_MODE), чтобы не блокировать цикл событий.
+    """
+    file_handler.open_stores()
+    upload_store, batch_store = file_handler.upload_store, file_handler.batch_store
+
+    # Та же очередь используется в save_upload для отмены отчётов по старому файлу
+    if file_handler.report_queue is None:
+        file_handler.report_queue = create_report_queue(EXECUTION_MODE, REPORT_WORKERS, REPORT_QUEUE_SIZE)
+    report_queue = file_handler.report_queue
+
+    async def send(chat_id: int, digest: str, report_type: str, result) -> None:
+        from utils.async_report_sender import send_combined_report_async, send_report_with_preview_async
+
+        # Снимки для режима сравнения читаются и пишутся на диск — не в цикле событий
+        combined, options = await asyncio.to_thread(reply_options, chat_id, digest, report_type, result)
+        if combined:
+            await send_combined_report_async(bot=bot, chat_id=chat_id, **options)
+        else:
+            await send_report_with_preview_async(bot=bot, chat_id=chat_id, pages=page_store, **options)
+
+    async def deliver(
+        chat_id: int, digest: str, report_type: str, result, error, started: float | None = None
+    ) -> None:
+        try:
+            if error is not None:
+                raise error
+            with metrics.timed("send", report=report_type):
+                await send(chat_id, digest, report_type, result)
+        except Exception as e:
+            await bot.send_message(chat_id, report_error_text(e), parse_mode='HTML')
+
+        # От нажатия кнопки до отправки, включая ожидание в очереди
+        if started is not None:
+            metrics.observe("bot_stage_seconds", time.perf_counter() - started, stage="total", report=report_type)
+
+    async def show_batch_status(chat_id: int, text: str, has_files: bool) -> None:
+        # Обновляем сообщение о пакете с меню отчётов или отправляем новое
+        keyboard = get_report_keyboard() if has_files else None
+        message_id = batch_store.status_message(chat_id)
+        if message_id is not None:
+            try:
+                await bot.edit_message_text(text, chat_id, message_id, parse_mode='HTML', reply_markup=keyboard)
+                return
+            except Exception as e:
+                if is_not_modified(e):
+                    return
+
+        message = await bot.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
+        batch_store.set_status_message(chat_id, message.message_id)
+
+    async def run_batch(chat_id: int, report_type: str) -> None:
+        """
+        Строит отчёт по всем файлам пакета, обновляя сообщение о ходе обработки.
+        """
+        from utils.async_report_sender import send_combined_report_async
+
+        files = await asyncio.to_thread(batch_store.files, chat_id)
+        if not files:
+            await bot.send_message(chat_id, batch_status_text(files, "📦 В пакете пока нет файлов"), parse_mode='HTML')
+            return
+
+        loop = asyncio.get_running_loop()
+        run = BatchRun(files, report_type)
+        run.progress_message = (await bot.send_message(chat_id, run.progress_text(0), parse_mode='HTML')).message_id
+
+        async def progress(done: int, update: bool) -> None:
+            # Обновления приходят из потоков пула не по порядку — устаревшие пропускаем
+            if update and run.claim(done):
+                try:
+                    await bot.edit_message_text(run.progress_text(done), chat_id, run.progress_message, parse_mode='HTML')
+                except Exception as e:
+                    if not is_not_modified(e):
+                        logger.warning("Не удалось обновить ход пакета в чате %s: %s", chat_id, e)
+            if done < len(run.files):
+                return
+
+            metrics.observe("bot_stage_seconds", time.perf_counter() - run.started, stage="batch", report=report_type)
+            try:
+                options = await asyncio.to_thread(batch_reply_options, run)
+                with metrics.timed("send", report=report_type):
+                    await send_combined_report_async(bot=bot, chat_id=chat_id, **options)
+            except Exception as e:
+                await bot.send_message(chat_id, report_error_text(e), parse_mode='HTML')
+
+        # Колбэк вызывается из потока пула (или сразу — для результатов из кэша)
+        def on_file(index, result, error):
+            done, update = run.finish(index, result, error)
+            asyncio.run_coroutine_threadsafe(progress(done, update), loop)
+
+        try:
+            position = await asyncio.to_thread(submit_batch, report_queue, chat_id, run, on_file)
+        except QueueFullError:
+            await bot.edit_message_text(
+                "⏳ <b>Сейчас бот перегружен.</b>\nПопробуй выбрать отчёт чуть позже",
+                chat_id, run.progress_message, parse_mode='HTML'
+            )
+            return
+
+        if position:
+            await bot.send_message(chat_id, f"⏳ <b>Пакет в очереди</b> (позиция {position})", parse_mode='HTML')
+
+    @bot.message_handler(commands=['batch'])
+    async def batch_command(message):
+        """
+        Включает и выключает пакетный режим: отчёт по нескольким файлам сразу.
+        """
+        enabled = await asyncio.to_thread(batch_store.toggle, message.chat.id)
+        if not enabled:
+            cancel_batch(message.chat.id)
+        await bot.send_message(message.chat.id, batch_mode_text(enabled), parse_mode='HTML')
+
+    @bot.message_handler(commands=['diff'])
+    async def diff_command(message):
+        """
+        Включает и выключает режим сравнения с прошлой загрузкой.
+        """
+        enabled = await asyncio.to_thread(snapshot_store.toggle_diff, message.chat.id)
+        await bot.send_message(message.chat.id, diff_mode_text(enabled), parse_mode='HTML')
+
+    @bot.message_handler(content_types=["document"])
+    async def handle_document(message):
+        """
+        Принимает документ, скачивает его без блокировки и предлагает меню выбора отчёта.
+        """
+        file_name = message.document.file_name
+        if not is_excel_file(file_name) and not is_zip_file(file_name):
+            await bot.send_message(
+                message.chat.id,
+                "❌ <b>Неверный формат файла!\nПожалуйста, отправь Excel-файл или ZIP-архив с ними</b>",
+                parse_mode='HTML'
+            )
+            return
+
+        if is_upload_too_large(message.document.file_size, file_name):
+            await bot.send_message(message.chat.id, upload_too_large_text(file_name), parse_mode='HTML')
+            return
+
+        with metrics.timed("get_file"):
+            file_info = await bot.get_file(message.document.file_id)
+
+        # ZIP-архив и файлы в пакетном режиме добавляются в пакет (скачивание и распаковка — в потоке)
+        if is_zip_file(file_name) or await asyncio.to_thread(batch_store.is_active, message.chat.id):
+            text, has_files = await asyncio.to_thread(
+                save_batch_upload, message.chat.id, file_name, iter_file_chunks(bot.token, file_info.file_path)
+            )
+            await show_batch_status(message.chat.id, text, has_files)
+            return
+
+        # Потоковое скачивание, запись на диск и хэширование — блокирующие операции,
+        # выносим их в поток, чтобы не держать файл целиком в памяти и не блокировать цикл
+        try:
+            await asyncio.to_thread(
+                save_upload,
+                message.chat.id,
+                message.document.file_name,
+                iter_file_chunks(bot.token, file_info.file_path)
+            )
+        except UploadTooLargeError:
+            await bot.send_message(message.chat.id, upload_too_large_text(), parse_mode='HTML')
+            return
+
+        await bot.send_message(
+            message.chat.id,
+            "📊 <b>Файл получен!</b>\nВыбери тип отчёта:",
+            reply_markup=get_report_keyboard(),
+            parse_mode='HTML'
+        )
+
+    @bot.callback_query_handler(func=lambda call: is_page_callback(call.data))
+    async def handle_page(call):
+        """
+        Листает список отчёта, редактируя то же сообщение, или отправляет его файлом.
+        """
+        chat_id = call.message.chat.id
+        # Выгрузка таблицы в XLSX — работа процессора, выносим её из цикла событий
+        with metrics.timed("page"):
+            action = await asyncio.to_thread(page_action, chat_id, call.data)
+        if action is None:
+            await bot.answer_callback_query(call.id, PAGES_EXPIRED_TEXT, show_alert=True)
+            return
+
+        await bot.answer_callback_query(call.id)
+        kind, payload = action
+        if kind == "files":
+            for name, content in payload:
+                with metrics.timed("send_document"):
+                    await bot.send_document(chat_id, InputFile(io.BytesIO(content), name))
+            return
+
+        text, keyboard = payload
+        try:
+            with metrics.timed("edit_message"):
+                await bot.edit_message_text(
+                    text, chat_id, call.message.message_id, parse_mode='HTML', reply_markup=keyboard
+                )
+        except Exception as e:
+            if not is_not_modified(e):
+                raise
+
+    @bot.callback_query_handler(func=lambda call: not is_page_callback(call.data))
+    async def handle_callback(call):
+        """
+        Ставит построение отчёта в очередь; результат отправляется, когда отчёт готов.
+        """
+        chat_id = call.message.chat.id
+        started = time.perf_counter()
+
+        # В пакетном режиме отчёт строится по всем файлам пакета
+        if call.data in REPORTS or call.data == ALL_REPORTS:
+            if await asyncio.to_thread(batch_store.is_active, chat_id):
+                await bot.answer_callback_query(call.id)
+                await asyncio.to_thread(load_report_stack)
+                await run_batch(chat_id, call.data)
+                return
+
+        # Проверка: загрузил ли пользователь файл перед нажатием кнопки
+        upload = await asyncio.to_thread(upload_store.get, chat_id)
+        if upload is None:
+            await bot.answer_callback_query(call.id, "❌ Сначала отправь Excel-файл")
+            return
+
+        if call.data not in REPORTS and call.data != ALL_REPORTS:
+            await bot.answer_callback_query(call.id)
+            await bot.send_message(chat_id, "❌ <b>Неизвестный тип отчёта</b>", parse_mode='HTML')
+            return
+
+        # Файл мог быть загружен до перезапуска: модули отчётов ещё не импортированы.
+        # Импорт занимает заметное время — не в цикле событий
+        await asyncio.to_thread(load_report_stack)
+
+        loop = asyncio.get_running_loop()
+        report_type = call.data
+
+        # Такой же отчёт по такому же файлу уже строился (возможно, в другом чате)
+        cached = report_results.get(result_key(upload.digest, report_type))
+        if cached is not None:
+            metrics.inc("bot_report_cache_hits_total", report=report_type)
+            await bot.answer_callback_query(call.id)
+            await deliver(chat_id, upload.digest, report_type, cached, None)
+            return
+
+        # Колбэк вызывается из потока пула, поэтому отправку передаём обратно в цикл событий
+        def on_done(outcome, error):
+            result, error = job_result(report_type, outcome, error)
+            if error is None:
+                remember_result(upload.digest, report_type, result)
+            asyncio.run_coroutine_threadsafe(deliver(chat_id, upload.digest, report_type, result, error, started), loop)
+
+        func, args = report_job(upload.path, report_type)
+        try:
+            position = report_queue.submit(chat_id, func, args, on_done)
+        except QueueFullError:
+            await bot.answer_callback_query(call.id)
+            await bot.send_message(
+                chat_id,
+                "⏳ <b>Сейчас бот перегружен.</b>\nПопробуй выбрать отчёт чуть позже",
+                parse_mode='HTML'
+            )
+            return
+
+        await bot.answer_callback_query(call.id)
+        if position:
+            await bot.send_message(
+                chat_id,
+                f"⏳ <b>Отчёт в очереди</b> (позиция {position})",
+                parse_mode='HTML'
+            )
@@ -1,21 +1,192 @@
+import atexit
+import html
+import importlib
+import io
+import logging
 import os
-import pandas as pd
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+import sys
+import threading
+import time
+import zipfile
+from typing import TYPE_CHECKING
 
-from utils.universal_report_sender import send_report_with_preview
-from reports.attendance_report import build_attendance_report
-from reports.lesson_topics_report import build_lesson_topics_report
-from reports.students_report import build_students_report
-from reports.homework_submit_report import build_homework_submit_report
-from reports.schedule_report import build_schedule_report
-from reports.homework_check_report import build_homework_check_report
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, InputFile
 
-# Словарь для хранения путей к файлам пользователей
-user_files = {}
+from utils.telegram_api import iter_file_chunks
+from utils.report_queue import QueueFullError, create_report_queue
+from utils.send_queue import is_not_modified
+from utils import metrics
+from reports.registry import ALL_REPORTS, REPORTS, ReportDefinition, load_reports, result_key
+from utils.result_cache import ResultCache
+from utils.report_pages import EXPORT_CURSOR, FILE_CURSOR, PageStore, is_page_callback, parse_page_callback
+from utils.upload_store import StoredFile, UploadStore, UploadTooLargeError
+from utils.batch_store import BatchFullError, BatchStore, StorageFullError
+from utils.columnar_files import remove_conversion, sweep_conversions, total_size as columnar_size
+from utils.snapshot_store import SnapshotStore
+from config import (
+    EXECUTION_MODE, REPORT_WORKERS, REPORT_QUEUE_SIZE,
+    UPLOAD_CHAT_QUOTA_MB, UPLOAD_TOTAL_QUOTA_MB, UPLOAD_TTL_HOURS, RESULT_CACHE_MB,
+    PAGE_STORE_MB, PAGE_TTL_HOURS, BATCH_MAX_FILES, BATCH_QUOTA_MB
+)
+
+if TYPE_CHECKING:
+    from reports.diff import ReportDiff
+    from reports.result import ReportResult
+
+logger = logging.getLogger(__name__)
+
+# Модули построения и отправки отчётов (pandas, NumPy, openpyxl) импортируются
+# не при запуске, а в load_report_stack: при первом отчёте или при прогреве
+REPORT_STACK_MODULES = (
+    "reports.runner",
+    "reports.diff",
+    "utils.columnar_store",
+    "utils.universal_report_sender",
+)
+
+# Очередь отчётов в пуле процессов (создаётся в register, если включён режим "process")
+report_queue = None
 
 # Папка для сохранения загруженных файлов
 UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Папка для снимков результатов (режим сравнения с прошлой загрузкой)
+SNAPSHOT_DIR = "snapshots"
+
+# Папка для файлов пакетов (команда /batch и ZIP-архивы)
+BATCH_DIR = "batches"
+
+# Не чаще скольких секунд обновлять сообщение о ходе пакетной обработки
+BATCH_PROGRESS_INTERVAL = 2.0
+
+# Сколько последних файлов пакета перечислять в сообщении о пакете
+BATCH_STATUS_FILES = 10
+
+# Колонка с именем исходного файла в выгрузке пакета
+BATCH_FILE_COLUMN = "Файл"
+
+# Очередь для пакетов, если бот строит отчёты в потоке обработчика (EXECUTION_MODE=inline):
+# файлы пакета всё равно разбираются параллельно, в пуле процессов
+_batch_queue = None
+_batch_queue_lock = threading.Lock()
+
+_stack_lock = threading.Lock()
+_stack_loaded = False
+
+
+def load_report_stack() -> None:
+    """
+    Импортирует модули отчётов, если это ещё не сделано, и записывает,
+    сколько занял импорт (метрика bot_startup_seconds, этап report_stack).
+    """
+    global _stack_loaded
+    with _stack_lock:
+        if _stack_loaded:
+            return
+        started = time.perf_counter()
+        for name in REPORT_STACK_MODULES:
+            importlib.import_module(name)
+        load_reports()
+        elapsed = time.perf_counter() - started
+        metrics.set_max("bot_startup_seconds", elapsed, phase="report_stack")
+        logger.info("Модули отчётов загружены за %.2f с", elapsed)
+        _stack_loaded = True
+
+
+def prewarm() -> None:
+    """
+    Прогревает бота в фоне: импортирует модули отчётов, разбирает небольшую книгу
+    и запускает процесс пула, чтобы первый отчёт после перезапуска не ждал их.
+    """
+    threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+
+
+def _prewarm() -> None:
+    started = time.perf_counter()
+    try:
+        load_report_stack()
+        from reports.runner import run_measured, warm_up
+        if report_queue is None:
+            _, records = run_measured(warm_up)
+        else:
+            _, records = report_queue.prewarm(run_measured, warm_up).result()
+        metrics.replay(records)
+    except Exception:
+        logger.exception("Не удалось прогреть модули отчётов")
+        return
+
+    elapsed = time.perf_counter() - started
+    metrics.set_max("bot_startup_seconds", elapsed, phase="prewarm")
+    logger.info("Прогрев завершён за %.2f с", elapsed)
+
+
+def _forget_file(path: str, digest: str) -> None:
+    # Колоночная копия лежит на диске и после перезапуска — удаляем её по хэшу из индекса хранилища
+    remove_conversion(digest)
+
+    # Модули отчётов ещё не загружены — в памяти нет кэша этого файла,
+    # и незачем импортировать их ради удаления (например, при запуске)
+    if "utils.dataframe_cache" not in sys.modules:
+        return
+    from utils.dataframe_cache import invalidate_file
+
+    invalidate_file(path)
+
+
+# Текущие файлы пользователей (чат -> файл) с квотами и удалением по сроку.
+# Создаётся в open_stores(): этот модуль импортируют и процессы пула отчётов,
+# а хранилище при создании удаляет с диска чужие для него файлы
+upload_store: UploadStore | None = None
+
+# Готовые результаты отчётов: один и тот же файл из разных чатов не разбирается повторно
+report_results = ResultCache(RESULT_CACHE_MB * 1024 * 1024)
+
+# Снимки результатов по чатам для команды /diff
+snapshot_store = SnapshotStore(SNAPSHOT_DIR)
+
+# Пакеты файлов по чатам для пакетной обработки (создаётся в open_stores())
+batch_store: BatchStore | None = None
+
+# Длинные списки отчётов, которые листаются кнопками под сообщением
+page_store = PageStore(PAGE_STORE_MB * 1024 * 1024, PAGE_TTL_HOURS * 3600)
+
+PAGES_EXPIRED_TEXT = "⌛ Список устарел — выбери отчёт ещё раз"
+
+
+def _reserved_size() -> int:
+    # Файлы пакетов и колоночные копии занимают ту же общую квоту UPLOAD_TOTAL_QUOTA_MB,
+    # что и загрузки
+    batches = 0 if batch_store is None else batch_store.total_size()
+    return batches + columnar_size()
+
+
+def open_stores() -> None:
+    """
+    Открывает хранилища загруженных файлов и пакетов. Вызывается один раз в процессе бота
+    при регистрации обработчиков; индекс загрузок дописывается на диск при остановке.
+    """
+    global upload_store, batch_store
+    if upload_store is None:
+        upload_store = UploadStore(
+            UPLOAD_DIR,
+            chat_quota=UPLOAD_CHAT_QUOTA_MB * 1024 * 1024,
+            total_quota=UPLOAD_TOTAL_QUOTA_MB * 1024 * 1024,
+            ttl=UPLOAD_TTL_HOURS * 3600,
+            on_remove=_forget_file,
+            reserved=_reserved_size
+        )
+        atexit.register(upload_store.flush)
+    if batch_store is None:
+        batch_store = BatchStore(
+            BATCH_DIR,
+            max_files=BATCH_MAX_FILES,
+            chat_quota=BATCH_QUOTA_MB * 1024 * 1024,
+            ttl=UPLOAD_TTL_HOURS * 3600,
+            on_remove=_forget_file,
+            reserve=upload_store.reserve
+        )
+        # Копии файлов, удалённых, пока бот не работал, или недописанные при остановке
+        sweep_conversions(upload_store.digests() | batch_store.digests())
 
 
 # Меню выбора отчёта
@@ -25,21 +196,615 @@ def get_report_keyboard():
     Каждая кнопка содержит callback_data, который обрабатывается в handle_callback.
     """
     keyboard = InlineKeyboardMarkup(row_width=1)
-    keyboard.add(
-        InlineKeyboardButton("📓 Расписание групп", callback_data="schedule"),
-        InlineKeyboardButton("📋 Темы уроков", callback_data="topics"),
-        InlineKeyboardButton("🎓 Проблемные студенты", callback_data="students"),
-        InlineKeyboardButton("🏫 Посещаемость студентов", callback_data="attendance"),
-        InlineKeyboardButton("📘 Проверенные домашние задания", callback_data="homework_check"),
-        InlineKeyboardButton("📚 Сданные домашние задания", callback_data="homework_submit")
-    )
+    keyboard.add(*[
+        InlineKeyboardButton(report.button, callback_data=report.key)
+        for report in REPORTS.values()
+    ])
+    # Все отчёты, подходящие к файлу, за один разбор файла
+    keyboard.add(InlineKeyboardButton("🗂 Все подходящие отчёты", callback_data=ALL_REPORTS))
     return keyboard
 
 
+def report_job(file_path: str, report_type: str) -> tuple:
+    """
+    Функция и аргументы для построения отчёта (или всех подходящих отчётов).
+    Задача возвращает (результат, замеры стадий) — результат достаёт job_result.
+    """
+    from reports.runner import run_all_reports, run_measured, run_report
+
+    if report_type == ALL_REPORTS:
+        return run_measured, (run_all_reports, file_path)
+    return run_measured, (run_report, file_path, report_type)
+
+
+def job_result(report_type: str, outcome, error: Exception | None) -> tuple:
+    """
+    (результат, ошибка) задачи report_job. Замеры стадий из задачи
+    (в том числе из пула процессов) переносятся в метрики этого процесса.
+    """
+    if error is not None:
+        metrics.inc("bot_reports_total", report=report_type, status="error")
+        return None, error
+
+    result, records = outcome
+    metrics.replay(records)
+    metrics.inc("bot_reports_total", report=report_type, status="ok")
+    return result, None
+
+
+def combined_tables(results, diffs: dict | None = None) -> dict:
+    """
+    Таблицы отчётов из результатов run_all_reports для выгрузки в CSV/XLSX.
+    Для отчётов из diffs выгружаются только новые записи.
+    """
+    diffs = diffs or {}
+    return {
+        REPORTS[report_type].filename_prefix: (
+            diffs[report_type].new_table if report_type in diffs else result.table
+        )
+        for report_type, result, error in results if error is None
+    }
+
+
+def combined_sections(results, diffs: dict | None = None) -> list[tuple[str, list[str]]]:
+    """
+    Разделы сводного ответа из результатов run_all_reports.
+    Для отчётов из diffs вместо полного списка — изменения с прошлой загрузки.
+    """
+    if not results:
+        return [("❌ <b>По заголовкам таблицы не удалось определить подходящие отчёты</b>", [])]
+
+    diffs = diffs or {}
+    sections = []
+    for report_type, result, error in results:
+        report = REPORTS[report_type]
+        if error is not None:
+            sections.append((f"{report.title}\n{report_error_text(error)}", []))
+        elif report_type in diffs:
+            sections.extend(diff_sections(report, diffs[report_type]))
+        elif not result.items:
+            sections.append((report.empty_message, []))
+        else:
+            sections.append((report.title, result.items))
+    return sections
+
+
+def diff_sections(report: ReportDefinition, diff: "ReportDiff") -> list[tuple[str, list[str]]]:
+    """
+    Разделы ответа с изменениями отчёта: новые записи и записи, пропавшие из отчёта.
+    """
+    if not diff.new_items and not diff.recovered:
+        return [(f"{report.title}\n✅ <i>Без изменений с прошлой загрузки</i>", [])]
+
+    sections = []
+    if diff.new_items:
+        sections.append((f"{report.title}\n🆕 <b>Появились с прошлой загрузки</b>", diff.new_items))
+    if diff.recovered:
+        title = "✅ <b>Больше не попадают в отчёт</b>"
+        sections.append((title if sections else f"{report.title}\n{title}", diff.recovered))
+    return sections
+
+
+def track_result(
+    chat_id: int, digest: str, report_type: str, result: "ReportResult", compare: bool
+) -> "ReportDiff | None":
+    """
+    Запоминает снимок результата для чата и, если compare, сравнивает его
+    с прошлой загрузкой. Снимки запоминаются и при выключенном сравнении,
+    чтобы после /diff первое же сравнение было с прошлым файлом.
+    None — отчёт не сравнивается или сравнивать не с чем.
+    """
+    from reports.diff import diff_result, make_snapshot
+
+    report = REPORTS[report_type]
+    if report.diff_key is None:
+        return None
+
+    previous = snapshot_store.update(chat_id, report_type, digest, make_snapshot(result, report.diff_key))
+    if not compare or previous is None:
+        return None
+    return diff_result(result, report.diff_key, previous)
+
+
+def reply_options(chat_id: int, digest: str, report_type: str, result) -> tuple[bool, dict]:
+    """
+    Как отправить результат report_job: (сводный ли ответ, параметры для
+    send_combined_report или send_report_with_preview). В режиме сравнения
+    вместо полного списка отправляются изменения с прошлой загрузки.
+    """
+    compare = snapshot_store.is_diff_enabled(chat_id)
+
+    if report_type == ALL_REPORTS:
+        diffs = {}
+        for single_type, single_result, error in result:
+            diff = None if error is not None else track_result(chat_id, digest, single_type, single_result, compare)
+            if diff is not None:
+                diffs[single_type] = diff
+        return True, {"sections": combined_sections(result, diffs), "tables": combined_tables(result, diffs)}
+
+    report = REPORTS[report_type]
+    diff = track_result(chat_id, digest, report_type, result, compare)
+    if diff is None:
+        return False, {"items": result.items, "table": result.table, **report.message_options()}
+
+    # Полный список не отправляется повторно: только новые записи
+    return True, {
+        "sections": diff_sections(report, diff),
+        "tables": {report.filename_prefix: diff.new_table},
+        "filename_prefix": f"{report.filename_prefix}_diff",
+    }
+
+
+def send_result(bot, chat_id: int, digest: str, report_type: str, result) -> None:
+    """
+    Отправляет результат report_job: один отчёт, сводный ответ или изменения.
+    """
+    from utils.universal_report_sender import send_combined_report, send_report_with_preview
+
+    combined, options = reply_options(chat_id, digest, report_type, result)
+    if combined:
+        send_combined_report(bot=bot, chat_id=chat_id, **options)
+    else:
+        send_report_with_preview(bot=bot, chat_id=chat_id, pages=page_store, **options)
+
+
+def page_action(chat_id: int, data: str) -> tuple | None:
+    """
+    Ответ на кнопку листания: ("page", (текст, клавиатура)) — показать другую страницу,
+    ("files", [(имя, содержимое), ...]) — отправить полный список или выгрузку таблицы файлами.
+    None — список удалён из хранилища (по сроку, из-за нехватки места или перезапуска).
+    """
+    token, cursor = parse_page_callback(data)
+    pages = page_store.get(token, chat_id)
+    if pages is None:
+        return None
+
+    if cursor == FILE_CURSOR:
+        return "files", [(f"{pages.filename}.txt", pages.text().encode("utf-8"))]
+
+    # Список мог попасть в хранилище только после загрузки модулей отчётов
+    if cursor == EXPORT_CURSOR and pages.tables is not None:
+        from utils.report_export import export_on_demand
+
+        return "files", export_on_demand(pages.tables, pages.filename)
+    if not cursor.isdigit():
+        return None
+
+    from utils.universal_report_sender import format_page
+
+    return "page", format_page(pages, token, int(cursor))
+
+
+def batch_mode_text(enabled: bool) -> str:
+    if enabled:
+        return (
+            "📦 <b>Пакетный режим включён</b>\n"
+            "Отправь несколько Excel-файлов (или один ZIP-архив с ними) и выбери отчёт: "
+            "бот построит его по всем файлам и пришлёт один ответ, сгруппированный по файлам.\n"
+            "/batch — выключить пакетный режим"
+        )
+    return "📄 <b>Пакетный режим выключен</b>\nФайлы пакета удалены, бот снова работает с одним файлом"
+
+
+def batch_status_text(files: list[StoredFile], note: str = "") -> str:
+    """
+    Сообщение о пакете: сколько в нём файлов и последние добавленные.
+    """
+    lines = [note] if note else []
+    lines.append(f"📦 <b>Файлов в пакете: {len(files)}</b>")
+    if len(files) > BATCH_STATUS_FILES:
+        lines.append(f"<i>… и ещё {len(files) - BATCH_STATUS_FILES}, добавленных раньше</i>")
+    lines.extend(f"• {html.escape(upload.name)}" for upload in files[-BATCH_STATUS_FILES:])
+    if files:
+        lines.append("\nОтправь ещё файлы или выбери отчёт — он будет построен по всем файлам пакета:")
+    return "\n".join(lines)
+
+
+def save_batch_upload(chat_id: int, file_name: str, chunks) -> tuple[str, bool]:
+    """
+    Добавляет загруженный файл (или книги из ZIP-архива) в пакет чата.
+    Возвращает (сообщение о пакете, есть ли в пакете файлы).
+    """
+    note = ""
+    try:
+        if is_zip_file(file_name):
+            added, skipped = batch_store.add_zip(chat_id, chunks)
+            note = f"🗜 Из архива добавлено файлов: {len(added)}"
+            if skipped:
+                note += f", пропущено: {skipped} (повторы или превышен лимит пакета)"
+        elif batch_store.add(chat_id, file_name, chunks) is None:
+            note = "⚠️ Такой файл уже есть в пакете"
+    except BatchFullError:
+        note = f"❌ <b>В пакете уже {BATCH_MAX_FILES} файлов</b> — больше добавить нельзя"
+    except UploadTooLargeError:
+        note = f"❌ <b>Пакет слишком большой!</b>\nВсе файлы пакета вместе — не больше {BATCH_QUOTA_MB} МБ"
+    except StorageFullError:
+        note = "❌ <b>Закончилось место для файлов</b>\nПопробуй позже или выключи пакетный режим (/batch)"
+    except zipfile.BadZipFile:
+        note = "❌ <b>Архив повреждён или это не ZIP-архив</b>"
+    except OSError:
+        logger.exception("Не удалось сохранить файл пакета в чате %s", chat_id)
+        note = "❌ <b>Не удалось сохранить файл</b> — отправь его ещё раз"
+
+    files = batch_store.files(chat_id)
+    return batch_status_text(files, note), bool(files)
+
+
+def get_batch_queue():
+    """
+    Очередь для построения отчётов по пакету: общая очередь отчётов или,
+    если отчёты строятся в потоке обработчика, отдельный пул процессов.
+    """
+    global _batch_queue
+    if report_queue is not None:
+        return report_queue
+    with _batch_queue_lock:
+        if _batch_queue is None:
+            _batch_queue = create_report_queue("process", REPORT_WORKERS, REPORT_QUEUE_SIZE)
+        return _batch_queue
+
+
+def cancel_batch(chat_id: int) -> None:
+    # Файлы пакета удалены — отчёты по ним больше не нужны
+    for queue in (report_queue, _batch_queue):
+        if queue is not None:
+            queue.cancel_chat(chat_id)
+
+
+class BatchRun:
+    """
+    Ход построения отчёта по пакету: результаты по файлам в порядке пакета
+    и сколько файлов уже готово.
+    """
+
+    def __init__(self, files: list[StoredFile], report_type: str):
+        self.files = files
+        self.report_type = report_type
+        # (результат, ошибка) по каждому файлу; None — файл ещё не готов
+        self.outcomes: list[tuple | None] = [None] * len(files)
+        self.done = 0
+        self.last_file = ""
+        self.started = time.perf_counter()
+        # Сообщение о ходе обработки и сколько готовых файлов в нём уже показано
+        self.progress_message: int | None = None
+        self.shown = 0
+        self._updated = 0.0
+        self._lock = threading.Lock()
+        # Обновления сообщения о ходе обработки отправляются по одному
+        self.edit_lock = threading.Lock()
+
+    def finish(self, index: int, result, error: Exception | None) -> tuple[int, bool]:
+        """
+        Записывает результат файла. Возвращает (сколько файлов готово, пора ли
+        обновить сообщение о ходе обработки): не чаще BATCH_PROGRESS_INTERVAL
+        и обязательно, когда готов последний файл.
+        """
+        with self._lock:
+            self.outcomes[index] = (result, error)
+            self.done += 1
+            self.last_file = self.files[index].name
+
+            now = time.perf_counter()
+            update = self.done == len(self.files) or now - self._updated >= BATCH_PROGRESS_INTERVAL
+            if update:
+                self._updated = now
+            return self.done, update
+
+    def claim(self, done: int) -> bool:
+        """
+        Можно ли показать состояние «готово done файлов»: более позднее уже не показано.
+        """
+        with self._lock:
+            if done <= self.shown:
+                return False
+            self.shown = done
+            return True
+
+    def progress_text(self, done: int) -> str:
+        total = len(self.files)
+        if done < total:
+            text = f"⏳ <b>Обработано файлов: {done} из {total}</b>"
+            if self.last_file:
+                text += f"\nГотов: {html.escape(self.last_file)}"
+            return text
+
+        errors = sum(1 for _, error in self.outcomes if error is not None)
+        text = f"✅ <b>Пакет обработан</b>\nФайлов: {total}, за {time.perf_counter() - self.started:.0f} с"
+        if errors:
+            text += f"\n❌ С ошибками: {errors}"
+        return text
+
+
+def submit_batch(queue, chat_id: int, run: BatchRun, on_file) -> int:
+    """
+    Ставит в очередь построение отчёта по всем файлам пакета: файлы разбираются
+    параллельно. Отчёты, которые уже есть в кэше результатов, не строятся заново.
+    on_file(index, результат, ошибка) вызывается по готовности каждого файла.
+    Возвращает позицию в очереди, как ReportQueue.submit.
+    """
+    tasks, indexes, cached = [], [], []
+    for index, upload in enumerate(run.files):
+        result = report_results.get(result_key(upload.digest, run.report_type))
+        if result is None:
+            tasks.append(report_job(upload.path, run.report_type))
+            indexes.append(index)
+        else:
+            cached.append((index, result))
+
+    def on_done(task_index, outcome, error):
+        index = indexes[task_index]
+        result, error = job_result(run.report_type, outcome, error)
+        if error is None:
+            remember_result(run.files[index].digest, run.report_type, result)
+        on_file(index, result, error)
+
+    position = queue.submit_many(chat_id, tasks, on_done) if tasks else 0
+    for index, result in cached:
+        metrics.inc("bot_report_cache_hits_total", report=run.report_type)
+        on_file(index, result, None)
+    return position
+
+
+def batch_sections(run: BatchRun) -> list[tuple[str, list[str]]]:
+    """
+    Разделы сводного ответа по пакету, сгруппированные по файлам в порядке пакета.
+    Имя файла повторяется в каждом разделе: в файле с полными списками разделы
+    без записей пропускаются.
+    """
+    report = REPORTS.get(run.report_type)
+    sections = []
+    for upload, (result, error) in zip(run.files, run.outcomes):
+        header = f"📄 <b>{html.escape(upload.name)}</b>"
+        if error is not None:
+            sections.append((f"{header}\n{report_error_text(error)}", []))
+        elif run.report_type == ALL_REPORTS:
+            sections.extend((f"{header}\n{title}", items) for title, items in combined_sections(result))
+        elif not result.items:
+            sections.append((f"{header}\n{report.empty_message}", []))
+        else:
+            sections.append((f"{header}\n{report.title}", result.items))
+    return sections
+
+
+def batch_tables(run: BatchRun) -> dict:
+    """
+    Таблицы для выгрузки пакета: по таблице на отчёт, строки всех файлов вместе
+    с колонкой BATCH_FILE_COLUMN — из какого файла строка.
+    """
+    import pandas as pd
+
+    frames: dict[str, list] = {}
+    for upload, (result, error) in zip(run.files, run.outcomes):
+        if error is not None:
+            continue
+        results = result if run.report_type == ALL_REPORTS else [(run.report_type, result, None)]
+        for report_type, single_result, single_error in results:
+            if single_error is not None or not len(single_result.table):
+                continue
+            table = single_result.table.copy()
+            table.insert(0, BATCH_FILE_COLUMN, upload.name, allow_duplicates=True)
+            frames.setdefault(REPORTS[report_type].filename_prefix, []).append(table)
+
+    return {name: pd.concat(tables, ignore_index=True) for name, tables in frames.items()}
+
+
+def batch_reply_options(run: BatchRun) -> dict:
+    """
+    Параметры send_combined_report для ответа по пакету.
+    """
+    prefix = ALL_REPORTS if run.report_type == ALL_REPORTS else REPORTS[run.report_type].filename_prefix
+    return {"sections": batch_sections(run), "tables": batch_tables(run), "filename_prefix": f"batch_{prefix}"}
+
+
+def run_batch(bot, chat_id: int, report_type: str) -> None:
+    """
+    Строит отчёт по всем файлам пакета. Сообщение о ходе обработки обновляется
+    по мере готовности файлов, результат приходит одним сводным ответом.
+    """
+    from utils.universal_report_sender import send_combined_report
+
+    files = batch_store.files(chat_id)
+    if not files:
+        bot.send_message(chat_id, batch_status_text(files, "📦 В пакете пока нет файлов"), parse_mode='HTML')
+        return
+
+    run = BatchRun(files, report_type)
+    # Сообщение правится, когда очередь отправки его отправит: обработчик не ждёт отправки
+    progress = bot.send_message(chat_id, run.progress_text(0), parse_mode='HTML')
+
+    def on_file(index, result, error):
+        done, update = run.finish(index, result, error)
+        if update:
+            with run.edit_lock:
+                if run.claim(done):
+                    edit_when_sent(bot, progress, chat_id, run.progress_text(done), parse_mode='HTML')
+        if done < len(run.files):
+            return
+
+        metrics.observe("bot_stage_seconds", time.perf_counter() - run.started, stage="batch", report=report_type)
+        try:
+            with metrics.timed("send", report=report_type):
+                send_combined_report(bot=bot, chat_id=chat_id, **batch_reply_options(run))
+        except Exception as e:
+            send_report_error(bot, chat_id, e)
+
+    try:
+        position = submit_batch(get_batch_queue(), chat_id, run, on_file)
+    except QueueFullError:
+        edit_when_sent(
+            bot, progress, chat_id, "⏳ <b>Сейчас бот перегружен.</b>\nПопробуй выбрать отчёт чуть позже",
+            parse_mode='HTML'
+        )
+        return
+
+    if position:
+        bot.send_message(chat_id, f"⏳ <b>Пакет в очереди</b> (позиция {position})", parse_mode='HTML')
+
+
+def show_batch_status(bot, chat_id: int, text: str, has_files: bool) -> None:
+    """
+    Обновляет сообщение о пакете с меню отчётов (или отправляет новое).
+    """
+    keyboard = get_report_keyboard() if has_files else None
+
+    def remember(sent):
+        if sent.exception() is None:
+            batch_store.set_status_message(chat_id, sent.result().message_id)
+
+    def resend(edited):
+        # Сообщение могли удалить — отправляем новое
+        error = edited.exception()
+        if error is not None and not is_not_modified(error):
+            sent = bot.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
+            sent.add_done_callback(remember)
+
+    message_id = batch_store.status_message(chat_id)
+    if message_id is not None:
+        edited = bot.edit_message_text(text, chat_id, message_id, parse_mode='HTML', reply_markup=keyboard)
+        edited.add_done_callback(resend)
+    else:
+        sent = bot.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
+        sent.add_done_callback(remember)
+
+
+def edit_when_sent(bot, sent, chat_id: int, text: str, **kwargs) -> None:
+    """
+    Правит сообщение, когда очередь отправки его отправит (sent — Future отправки).
+    """
+    def edit(future):
+        if future.exception() is None:
+            bot.edit_message_text(text, chat_id, future.result().message_id, **kwargs)
+
+    sent.add_done_callback(edit)
+
+
+def diff_mode_text(enabled: bool) -> str:
+    if enabled:
+        return (
+            "🔁 <b>Режим сравнения включён</b>\n"
+            "Для отчётов по тем же выгрузкам бот пришлёт только изменения с прошлой загрузки: "
+            "кто появился в отчёте и кто из него пропал"
+        )
+    return "📋 <b>Режим сравнения выключен</b>\nБот снова присылает отчёты полностью"
+
+
+def remember_result(digest: str, report_type: str, result) -> None:
+    """
+    Сохраняет результат report_job в кэше результатов.
+    """
+    report_results.put(result_key(digest, report_type), result)
+
+    # Результаты «всех отчётов» пригодятся и для отдельных кнопок
+    if report_type == ALL_REPORTS:
+        for single_type, single_result, error in result:
+            if error is None:
+                report_results.put(result_key(digest, single_type), single_result)
+
+
+def report_error_text(error: Exception) -> str:
+    """
+    Текст сообщения о том, почему отчёт не удалось построить.
+    """
+    from reports.runner import FileReadError
+
+    # Файл не читается как Excel-таблица
+    if isinstance(error, FileReadError):
+        return f"❌ <b>Ошибка чтения файла:</b>\n{error}"
+
+    # Обработка ошибки валидации колонок (если пользователь выбрал не тот отчёт)
+    if isinstance(error, ValueError):
+        return (
+            f"❌ <b>В таблице не найдены ожидаемые колонки:</b> <code>{error}</code>\n\n"
+            f"Возможно, вы выбрали не тот отчёт или загрузили неверный файл"
+        )
+
+    # Остальные непредвиденные ошибки
+    return f"❌ <b>Произошла ошибка при формировании отчёта:</b>\n{error}"
+
+
+def send_report_error(bot, chat_id: int, error: Exception) -> None:
+    """
+    Сообщает пользователю, почему отчёт не удалось построить.
+    """
+    bot.send_message(chat_id, report_error_text(error), parse_mode='HTML')
+
+
+def is_excel_file(file_name: str) -> bool:
+    return file_name.endswith((".xls", ".xlsx"))
+
+
+def is_zip_file(file_name: str) -> bool:
+    return file_name.lower().endswith(".zip")
+
+
+def upload_too_large_text(file_name: str = "") -> str:
+    quota = BATCH_QUOTA_MB if is_zip_file(file_name) else UPLOAD_CHAT_QUOTA_MB
+    return f"❌ <b>Файл слишком большой!</b>\nМаксимальный размер — {quota} МБ"
+
+
+def is_upload_too_large(file_size: int | None, file_name: str = "") -> bool:
+    # Размер документа известен заранее — не скачиваем заведомо слишком большой файл
+    quota = BATCH_QUOTA_MB if is_zip_file(file_name) else UPLOAD_CHAT_QUOTA_MB
+    return bool(file_size) and file_size > quota * 1024 * 1024
+
+
+def save_upload(chat_id: int, file_name: str, chunks) -> StoredFile:
+    """
+    Сохраняет загруженный файл (порции байтов) в хранилище, связывает его
+    с пользователем и сбрасывает всё, что относилось к предыдущему файлу.
+    """
+    load_report_stack()
+    from reports.runner import is_large_file
+    from utils.columnar_store import start_conversion
+    from utils.dataframe_cache import remember_digest
+
+    # Отчёты по предыдущему файлу больше не нужны
+    if report_queue is not None:
+        report_queue.cancel_chat(chat_id)
+
+    # Кэш и колоночная копия предыдущего файла сбрасываются в _forget_file
+    with metrics.timed("download"):
+        upload = upload_store.save(chat_id, file_name, chunks)
+    metrics.observe("bot_upload_bytes", os.path.getsize(upload.path))
+
+    # Хэш уже посчитан при скачивании — повторно файл не читаем
+    remember_digest(upload.path, upload.digest)
+
+    # Пока пользователь выбирает отчёт, конвертируем файл в колоночный формат
+    # (для уже загруженного ранее файла копия уже есть). Большие файлы
+    # читаются потоково, полная копия в памяти для них не нужна
+    if not is_large_file(upload.path):
+        start_conversion(upload.path, upload.digest)
+
+    return upload
+
+
 def register(bot):
     """
     Регистрация обработчиков сообщений и callback-запросов.
     """
+    global report_queue
+    open_stores()
+    if EXECUTION_MODE == "process" and report_queue is None:
+        report_queue = create_report_queue("process", REPORT_WORKERS, REPORT_QUEUE_SIZE)
+
+    @bot.message_handler(commands=['diff'])
+    def diff_command(message):
+        """
+        Включает и выключает режим сравнения с прошлой загрузкой.
+        """
+        enabled = snapshot_store.toggle_diff(message.chat.id)
+        bot.send_message(message.chat.id, diff_mode_text(enabled), parse_mode='HTML')
+
+    @bot.message_handler(commands=['batch'])
+    def batch_command(message):
+        """
+        Включает и выключает пакетный режим: отчёт по нескольким файлам сразу.
+        """
+        enabled = batch_store.toggle(message.chat.id)
+        if not enabled:
+            cancel_batch(message.chat.id)
+        bot.send_message(message.chat.id, batch_mode_text(enabled), parse_mode='HTML')
 
     @bot.message_handler(content_types=["document"])
     def handle_document(message):
@@ -47,30 +812,40 @@ def register(bot):
         Принимает документ от пользователя, проверяет формат,
         сохраняет файл на диск и предлагает меню выбора отчёта.
         """
-        if not message.document.file_name.endswith((".xls", ".xlsx")):
+        file_name = message.document.file_name
+        if not is_excel_file(file_name) and not is_zip_file(file_name):
             bot.send_message(
                 message.chat.id,
-                "❌ <b>Неверный формат файла!\nПожалуйста, отправь Excel-файл</b>",
+                "❌ <b>Неверный формат файла!\nПожалуйста, отправь Excel-файл или ZIP-архив с ними</b>",
                 parse_mode='HTML'
             )
             return
 
-        # Получение информации о файле и скачивание
-        file_info = bot.get_file(message.document.file_id)
-        downloaded_file = bot.download_file(file_info.file_path)
+        if is_upload_too_large(message.document.file_size, file_name):
+            bot.send_message(message.chat.id, upload_too_large_text(file_name), parse_mode='HTML')
+            return
 
-        # Формирование пути для сохранения
-        file_path = os.path.join(
-            UPLOAD_DIR,
-            f"{message.chat.id}_{message.document.file_name}"
-        )
+        # Получение информации о файле и потоковое скачивание на диск
+        with metrics.timed("get_file"):
+            file_info = bot.get_file(message.document.file_id)
 
-        # Запись файла на диск
-        with open(file_path, "wb") as f:
-            f.write(downloaded_file)
+        # ZIP-архив и файлы в пакетном режиме добавляются в пакет
+        if is_zip_file(file_name) or batch_store.is_active(message.chat.id):
+            text, has_files = save_batch_upload(
+                message.chat.id, file_name, iter_file_chunks(bot.token, file_info.file_path)
+            )
+            show_batch_status(bot, message.chat.id, text, has_files)
+            return
 
-        # Сохранение пути в глобальный словарь (связываем пользователя и файл)
-        user_files[message.chat.id] = file_path
+        try:
+            save_upload(
+                message.chat.id,
+                message.document.file_name,
+                iter_file_chunks(bot.token, file_info.file_path)
+            )
+        except UploadTooLargeError:
+            bot.send_message(message.chat.id, upload_too_large_text(), parse_mode='HTML')
+            return
 
         bot.send_message(
             message.chat.id,
@@ -79,117 +854,116 @@ def register(bot):
             parse_mode='HTML'
         )
 
-    @bot.callback_query_handler(func=lambda call: True)
+    @bot.callback_query_handler(func=lambda call: is_page_callback(call.data))
+    def handle_page(call):
+        """
+        Листает список отчёта, редактируя то же сообщение, или отправляет его файлом.
+        """
+        chat_id = call.message.chat.id
+        with metrics.timed("page"):
+            action = page_action(chat_id, call.data)
+        if action is None:
+            bot.answer_callback_query(call.id, PAGES_EXPIRED_TEXT, show_alert=True)
+            return
+
+        bot.answer_callback_query(call.id)
+        kind, payload = action
+        if kind == "files":
+            for name, content in payload:
+                bot.send_document(chat_id, InputFile(io.BytesIO(content), name))
+            return
+
+        # Повторное нажатие той же кнопки («message is not modified») очередь отправки не логирует
+        text, keyboard = payload
+        bot.edit_message_text(text, chat_id, call.message.message_id, parse_mode='HTML', reply_markup=keyboard)
+
+    @bot.callback_query_handler(func=lambda call: not is_page_callback(call.data))
     def handle_callback(call):
         """
         Обрабатывает нажатия на кнопки меню.
         Генерирует соответствующий отчёт и отправляет результат.
         """
         chat_id = call.message.chat.id
+        started = time.perf_counter()
+
+        # В пакетном режиме отчёт строится по всем файлам пакета
+        if batch_store.is_active(chat_id) and (call.data in REPORTS or call.data == ALL_REPORTS):
+            bot.answer_callback_query(call.id)
+            load_report_stack()
+            run_batch(bot, chat_id, call.data)
+            return
 
         # Проверка: загрузил ли пользователь файл перед нажатием кнопки
-        if chat_id not in user_files:
+        # (файл мог быть удалён по сроку хранения)
+        upload = upload_store.get(chat_id)
+        if upload is None:
             bot.answer_callback_query(call.id, "❌ Сначала отправь Excel-файл")
             return
 
-        # Чтение файла в Pandas DataFrame
-        try:
-            df = pd.read_excel(user_files[chat_id])
-        except Exception as e:
-            bot.send_message(
-                chat_id,
-                f"❌ <b>Ошибка чтения файла:</b>\n{e}",
-                parse_mode='HTML'
-            )
+        if call.data not in REPORTS and call.data != ALL_REPORTS:
+            bot.send_message(chat_id, "❌ <b>Неизвестный тип отчёта</b>", parse_mode='HTML')
+            bot.answer_callback_query(call.id)
+            return
+
+        # Файл мог быть загружен до перезапуска: модули отчётов ещё не импортированы
+        load_report_stack()
+
+        # Такой же отчёт по такому же файлу уже строился (возможно, в другом чате)
+        cached = report_results.get(result_key(upload.digest, call.data))
+        if cached is not None:
+            metrics.inc("bot_report_cache_hits_total", report=call.data)
+            try:
+                with metrics.timed("send", report=call.data):
+                    send_result(bot, chat_id, upload.digest, call.data, cached)
+            except Exception as e:
+                send_report_error(bot, chat_id, e)
+
+            bot.answer_callback_query(call.id)
+            return
+
+        def on_done(outcome, error):
+            result, error = job_result(call.data, outcome, error)
+            try:
+                if error is not None:
+                    raise error
+                remember_result(upload.digest, call.data, result)
+                with metrics.timed("send", report=call.data):
+                    send_result(bot, chat_id, upload.digest, call.data, result)
+            except Exception as e:
+                send_report_error(bot, chat_id, e)
+
+            # От нажатия кнопки до отправки, включая ожидание в очереди
+            metrics.observe("bot_stage_seconds", time.perf_counter() - started, stage="total", report=call.data)
+
+        func, args = report_job(upload.path, call.data)
+
+        # Построение отчёта в потоке обработчика
+        if report_queue is None:
+            try:
+                outcome, error = func(*args), None
+            except Exception as e:
+                outcome, error = None, e
+            on_done(outcome, error)
+
+            bot.answer_callback_query(call.id)
             return
 
-        # Выбор отчёта
+        # Построение отчёта в пуле процессов: результат отправит колбэк on_done
         try:
-            # === Расписание ===
-            if call.data == "schedule":
-                items = build_schedule_report(df)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="📖 <b>Отчёт по расписанию</b>",
-                    items=items,
-                    empty_message="❌ <b>Не удалось найти дисциплины в файле</b>",
-                    filename_prefix="schedule_report"
-                )
-            # === Темы уроков ===
-            elif call.data == "topics":
-                items = build_lesson_topics_report(df)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="🚨 <b>Неверный формат тем уроков</b>",
-                    items=items,
-                    empty_message="✅ <b>Все темы уроков соответствуют формату</b>",
-                    filename_prefix="invalid_lesson_topics"
-                )
-            # === Проблемные студенты ===
-            elif call.data == "students":
-                items = build_students_report(df)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="🚨 <b>Проблемные студенты</b>",
-                    items=items,
-                    empty_message="✅ <b>Студентов с критическими показателями не найдено</b>",
-                    filename_prefix="problem_students"
-                )
-            # === Посещаемость ===
-            elif call.data == "attendance":
-                items = build_attendance_report(df)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="🚨 <b>Посещаемость ниже 40%</b>",
-                    items=items,
-                    empty_message="✅ <b>Преподавателей с посещаемостью ниже 40% не найдено</b>",
-                    filename_prefix="low_attendance"
-                )
-            # === Проверка ДЗ ===
-            elif call.data == "homework_check":
-                # Для этого отчета нужно читать файл с двухуровневой шапкой (header=[0, 1])
-                df_homework_check = pd.read_excel(user_files[chat_id], header=[0, 1])
-
-                items = build_homework_check_report(df_homework_check)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="🚨 <b>Проверка ДЗ меньше 70%</b>",
-                    items=items,
-                    empty_message="✅ <b>Все преподаватели проверяют ДЗ вовремя</b>",
-                    filename_prefix="low_homework_check"
-                )
-            # === Сдача ДЗ ===
-            elif call.data == "homework_submit":
-                items = build_homework_submit_report(df)
-                send_report_with_preview(
-                    bot=bot,
-                    chat_id=chat_id,
-                    title="🚨 <b>Низкий процент сдачи домашних заданий</b>",
-                    items=items,
-                    empty_message="✅ <b>Студентов с низким процентом сдачи домашних заданий не найдено</b>",
-                    filename_prefix="low_homework_submit"
-                )
-            else:
-                bot.send_message(chat_id, "❌ <b>Неизвестный тип отчёта</b>", parse_mode='HTML')
-
-        # Обработка ошибки валидации колонок (если пользователь выбрал не тот отчёт)
-        except ValueError as e:
+            position = report_queue.submit(chat_id, func, args, on_done)
+        except QueueFullError:
+            bot.answer_callback_query(call.id)
             bot.send_message(
                 chat_id,
-                f"❌ <b>В таблице не найдены ожидаемые колонки:</b> <code>{e}</code>\n\n"
-                f"Возможно, вы выбрали не тот отчёт или загрузили неверный файл",
+                "⏳ <b>Сейчас бот перегружен.</b>\nПопробуй выбрать отчёт чуть позже",
                 parse_mode='HTML'
             )
-        # Ловим остальные непредвиденные ошибки
-        except Exception as e:
+            return
+
+        if position:
             bot.send_message(
                 chat_id,
-                f"❌ <b>Произошла ошибка при формировании отчёта:</b>\n{e}",
+                f"⏳ <b>Отчёт в очереди</b> (позиция {position})",
                 parse_mode='HTML'
             )
 
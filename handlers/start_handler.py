@@ -1,32 +1,51 @@
+START_TEXT = (
+    "👋 <b>Привет! Я помощник по проверке отчётов.</b>\n\n"
+    "Я умею анализировать таблицы с расписанием, посещаемостью "
+    "и домашними заданиями, находить в них ошибки и составлять статистику.\n\n"
+    "📂 <b>Чтобы начать, просто отправь мне Excel-файл (.xlsx или .xls).</b>"
+)
+
+HELP_TEXT = (
+    "🤖 <b>Справка по использованию бота</b>\n\n"
+    "Этот бот автоматизирует проверку учебных ведомостей. "
+    "Вам больше не нужно составлять отчёты вручную!\n\n"
+    "<b>🛠 Как пользоваться:</b>\n"
+    "1. Отправьте боту файл с таблицей.\n"
+    "2. Выберите тип отчёта, нажав на кнопку под сообщением.\n"
+    "3. Бот проанализирует файл и выдаст результат.\n\n"
+
+    "<b>📂 Поддерживаемые файлы:</b>\n"
+    "• <b>Входящие:</b> Excel (<code>.xlsx</code>, <code>.xls</code>) или ZIP-архив с ними\n"
+    "• <b>Исходящие:</b> Бот пишет отчёт в чат. Длинный список листается кнопками ◀ / ▶ "
+    "под сообщением, а полный список (<code>.txt</code>) и таблицу Excel можно получить "
+    "файлом по кнопкам.\n\n"
+
+    "<b>📌 Доступные команды:</b>\n"
+    "/start — Запустить бота / Приветствие\n"
+    "/help — Показать эту справку\n"
+    "/diff — Присылать только изменения с прошлой загрузки (повторная команда выключает режим)\n"
+    "/batch — Пакетный режим: один отчёт по нескольким файлам (повторная команда выключает режим)"
+)
+
+
 def register(bot):
     @bot.message_handler(commands=['start'])
     def start_command(message):
-        text = (
-            "👋 <b>Привет! Я помощник по проверке отчётов.</b>\n\n"
-            "Я умею анализировать таблицы с расписанием, посещаемостью "
-            "и домашними заданиями, находить в них ошибки и составлять статистику.\n\n"
-            "📂 <b>Чтобы начать, просто отправь мне Excel-файл (.xlsx или .xls).</b>"
-        )
-        bot.send_message(message.chat.id, text, parse_mode='HTML')
+        bot.send_message(message.chat.id, START_TEXT, parse_mode='HTML')
 
     @bot.message_handler(commands=['help'])
     def help_command(message):
-        text = (
-            "🤖 <b>Справка по использованию бота</b>\n\n"
-            "Этот бот автоматизирует проверку учебных ведомостей. "
-            "Вам больше не нужно составлять отчёты вручную!\n\n"
-            "<b>🛠 Как пользоваться:</b>\n"
-            "1. Отправьте боту файл с таблицей.\n"
-            "2. Выберите тип отчёта, нажав на кнопку под сообщением.\n"
-            "3. Бот проанализирует файл и выдаст результат.\n\n"
-
-            "<b>📂 Поддерживаемые файлы:</b>\n"
-            "• <b>Входящие:</b> Excel (<code>.xlsx</code>, <code>.xls</code>)\n"
-            "• <b>Исходящие:</b> Бот пишет отчёт в чат. Если записей слишком много, "
-            "он пришлёт файл (<code>.txt</code>).\n\n"
-
-            "<b>📌 Доступные команды:</b>\n"
-            "/start — Запустить бота / Приветствие\n"
-            "/help — Показать эту справку"
-        )
-        bot.send_message(message.chat.id, text, parse_mode='HTML')
+        bot.send_message(message.chat.id, HELP_TEXT, parse_mode='HTML')
+
+
+def register_async(bot):
+    """
+    Те же команды для AsyncTeleBot.
+    """
+    @bot.message_handler(commands=['start'])
+    async def start_command(message):
+        await bot.send_message(message.chat.id, START_TEXT, parse_mode='HTML')
+
+    @bot.message_handler(commands=['help'])
+    async def help_command(message):
+        await bot.send_message(message.chat.id, HELP_TEXT, parse_mode='HTML')
@@ -0,0 +1,22 @@
+from config import ADMIN_IDS
+from utils.metrics import format_stats
+
+
+def is_admin(message) -> bool:
+    return message.from_user is not None and message.from_user.id in ADMIN_IDS
+
+
+def register(bot):
+    # Остальным пользователям команда не отвечает, как будто её нет
+    @bot.message_handler(commands=['stats'], func=is_admin)
+    def stats_command(message):
+        bot.send_message(message.chat.id, format_stats(), parse_mode='HTML')
+
+
+def register_async(bot):
+    """
+    Та же команда для AsyncTeleBot.
+    """
+    @bot.message_handler(commands=['stats'], func=is_admin)
+    async def stats_command(message):
+        await bot.send_message(message.chat.id, format_stats(), parse_mode='HTML')
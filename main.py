@@ -1,10 +1,63 @@
+import time
+
+# Отсчёт времени запуска (без старта самого интерпретатора): до импорта telebot и обработчиков
+STARTED = time.perf_counter()
+
 from telebot import TeleBot
-from config import BOT_TOKEN
-from handlers import start_handler, file_handler
+from config import (
+    BOT_TOKEN, METRICS_HOST, METRICS_PORT, PREWARM, RUN_MODE, STARTUP_MODE, TELEGRAM_API_URL,
+    SEND_CHAT_BURST, SEND_CHAT_RATE, SEND_GLOBAL_RATE, SEND_MAX_RETRIES,
+    WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL
+)
+from handlers import start_handler, stats_handler, file_handler
+from utils import metrics
+from utils.metrics import start_metrics_server
+from utils.send_queue import QueuedBot, SendQueue
+from utils.telegram_api import configure_api_url
+from utils.webhook_server import WebhookServer
+
+
+def run_webhook(bot: TeleBot) -> None:
+    """
+    Принимает обновления через webhook. Обработчики выполняются в пуле потоков бота,
+    поэтому HTTP-сервер сразу отвечает Telegram и принимает следующие обновления.
+    """
+    server = WebhookServer(
+        WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+        on_update=lambda update: bot.process_new_updates([update])
+    )
+    if WEBHOOK_URL:
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    server.serve_forever()
+
+
+def main():
+    configure_api_url(TELEGRAM_API_URL)
+    start_metrics_server(METRICS_HOST, METRICS_PORT)
+    bot = TeleBot(BOT_TOKEN)
+
+    # Обработчики отправляют сообщения через очередь с ограничением частоты и повторами после 429
+    queued_bot = QueuedBot(bot, SendQueue(SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_MAX_RETRIES))
+
+    start_handler.register(queued_bot)
+    stats_handler.register(queued_bot)
+    file_handler.register(queued_bot)
+
+    # В режиме "lazy" модули отчётов импортируются при первой загрузке файла
+    if STARTUP_MODE != "lazy":
+        file_handler.load_report_stack()
+    metrics.set_max("bot_startup_seconds", time.perf_counter() - STARTED, phase="ready")
+
+    # Прогрев идёт в фоне, пока бот уже принимает обновления
+    if PREWARM:
+        file_handler.prewarm()
 
-bot = TeleBot(BOT_TOKEN)
+    if RUN_MODE == "webhook":
+        run_webhook(bot)
+    else:
+        bot.infinity_polling(timeout=10, long_polling_timeout=5)
 
-start_handler.register(bot)
-file_handler.register(bot)
 
-bot.infinity_polling(timeout=10, long_polling_timeout=5)
+# Защита нужна для пула процессов: дочерние процессы импортируют этот модуль
+if __name__ == "__main__":
+    main()
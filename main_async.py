@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+# Отсчёт времени запуска (без старта самого интерпретатора): до импорта telebot и обработчиков
+STARTED = time.perf_counter()
+
+from telebot.async_telebot import AsyncTeleBot
+from config import (
+    BOT_TOKEN, METRICS_HOST, METRICS_PORT, PREWARM, RUN_MODE, STARTUP_MODE, TELEGRAM_API_URL,
+    SEND_CHAT_BURST, SEND_CHAT_RATE, SEND_GLOBAL_RATE, SEND_MAX_RETRIES,
+    WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL
+)
+from handlers import start_handler, stats_handler, async_file_handler, file_handler
+from utils import metrics
+from utils.metrics import start_metrics_server
+from utils.send_queue import AsyncQueuedBot, AsyncSendQueue
+from utils.telegram_api import configure_api_url
+from utils.webhook_server import WebhookServer
+
+
+async def run_webhook(bot: AsyncTeleBot) -> None:
+    """
+    Принимает обновления через webhook. HTTP-сервер работает в отдельном потоке
+    и передаёт каждое обновление в цикл событий.
+    """
+    loop = asyncio.get_running_loop()
+    server = WebhookServer(
+        WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+        on_update=lambda update: asyncio.run_coroutine_threadsafe(bot.process_new_updates([update]), loop)
+    )
+    if WEBHOOK_URL:
+        await bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    try:
+        await asyncio.to_thread(server.serve_forever)
+    finally:
+        server.shutdown()
+
+
+async def main():
+    configure_api_url(TELEGRAM_API_URL)
+    start_metrics_server(METRICS_HOST, METRICS_PORT)
+    bot = AsyncTeleBot(BOT_TOKEN)
+
+    # Обработчики отправляют сообщения через очередь с ограничением частоты и повторами после 429
+    queued_bot = AsyncQueuedBot(bot, AsyncSendQueue(SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_MAX_RETRIES))
+
+    start_handler.register_async(queued_bot)
+    stats_handler.register_async(queued_bot)
+    async_file_handler.register_async(queued_bot)
+
+    # В режиме "lazy" модули отчётов импортируются при первой загрузке файла
+    if STARTUP_MODE != "lazy":
+        file_handler.load_report_stack()
+    metrics.set_max("bot_startup_seconds", time.perf_counter() - STARTED, phase="ready")
+
+    # Прогрев идёт в фоне, пока бот уже принимает обновления
+    if PREWARM:
+        file_handler.prewarm()
+
+    try:
+        if RUN_MODE == "webhook":
+            await run_webhook(bot)
+        else:
+            await bot.infinity_polling(timeout=10)
+    finally:
+        await bot.close_session()
+
+
+# Защита нужна для пула процессов: дочерние процессы импортируют этот модуль
+if __name__ == "__main__":
+    asyncio.run(main())
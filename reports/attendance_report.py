@@ -1,41 +1,21 @@
 import pandas as pd
 
+from reports.result import ReportResult
+from reports.rule_engine import ReportSpec, run_spec, run_spec_chunked
 
-def build_attendance_report(df: pd.DataFrame) -> list[str]:
-    required_columns = {'ФИО преподавателя', 'Средняя посещаемость'}
+# Преподаватели со средней посещаемостью ниже 40%.
+# Посещаемость может быть записана строкой ("35,5%"), поэтому приводим её к числу
+ATTENDANCE_SPEC = ReportSpec(
+    columns=['ФИО преподавателя', 'Средняя посещаемость'],
+    coerce={'Средняя посещаемость': 'percent'},
+    mask="`Средняя посещаемость` < 40",
+    template="👨🏻‍🏫 {ФИО преподавателя} — {Средняя посещаемость}%"
+)
 
-    # Проверяем, каких колонок не хватает в файле
-    missing_columns = required_columns - set(df.columns)
 
-    # Если есть недостающие колонки, выбрасываем ошибку с их списком
-    if missing_columns:
-        raise ValueError(f"{', '.join(missing_columns)}")
+def build_attendance_report(df: pd.DataFrame) -> ReportResult:
+    return run_spec(ATTENDANCE_SPEC, df)
 
-    df = df[['ФИО преподавателя', 'Средняя посещаемость']].dropna()
 
-    # Приводим посещаемость к числу
-    df['Средняя посещаемость'] = (
-        df['Средняя посещаемость']
-        .astype(str)
-        .str.replace('%', '', regex=False)
-        .str.replace(',', '.', regex=False)
-    )
-
-    df['Средняя посещаемость'] = pd.to_numeric(
-        df['Средняя посещаемость'],
-        errors='coerce'
-    )
-
-    df = df.dropna(subset=['Средняя посещаемость'])
-
-    low_attendance = df[df['Средняя посещаемость'] < 40]
-
-    if low_attendance.empty:
-        return []
-
-    result = []
-
-    for _, row in low_attendance.iterrows():
-        result.append(f"👨🏻‍🏫 {row['ФИО преподавателя']} — {row['Средняя посещаемость']}%")
-
-    return result
+def build_attendance_report_stream(chunks) -> ReportResult:
+    return run_spec_chunked(ATTENDANCE_SPEC, chunks)
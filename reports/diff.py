@@ -0,0 +1,76 @@
+from collections import Counter
+
+import pandas as pd
+
+from reports.result import ReportResult
+
+
+class ReportDiff:
+    """
+    Изменения отчёта по сравнению с прошлой загрузкой.
+
+    new_items / new_table — записи, которых в прошлый раз не было (строки и таблица);
+    recovered             — записи, которые были в прошлый раз, а теперь пропали из отчёта.
+    """
+
+    def __init__(self, new_items: list[str], new_table: pd.DataFrame, recovered: list[str]):
+        self.new_items = new_items
+        self.new_table = new_table
+        self.recovered = recovered
+
+
+def _plain(value):
+    # В JSON уходят только простые значения; пропуски (NaN, NA) — как null
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _keys(table: pd.DataFrame, key: list[str]) -> list[tuple]:
+    # Ключ записи сравнивается как строки: в разных выгрузках число может прочитаться как "101" или 101
+    return [tuple(str(_plain(value)) for value in row) for row in table[key].itertuples(index=False)]
+
+
+def make_snapshot(result: ReportResult, key: list[str]) -> dict:
+    """
+    Компактный снимок результата: ключевые колонки и значения остальных колонок таблицы.
+    """
+    table = result.table
+    return {
+        "columns": list(table.columns),
+        "key": key,
+        "rows": [[_plain(value) for value in row] for row in table.itertuples(index=False)],
+    }
+
+
+def diff_result(result: ReportResult, key: list[str], previous: dict) -> ReportDiff:
+    """
+    Сравнивает результат с прошлым снимком по ключевым колонкам.
+    Строки result.items соответствуют строкам result.table по порядку.
+    """
+    table = result.table
+    previous_table = pd.DataFrame(previous["rows"], columns=previous["columns"], dtype=object)
+
+    previous_keys = _keys(previous_table, key) if len(previous_table) else []
+    current_keys = _keys(table, key) if len(table) else []
+
+    # Ключи сравниваются с учётом повторов: у однофамильцев с одинаковыми ключами
+    # новой считается только запись сверх прошлого количества
+    unmatched = Counter(previous_keys)
+    is_new = []
+    for row_key in current_keys:
+        is_new.append(unmatched[row_key] == 0)
+        if unmatched[row_key]:
+            unmatched[row_key] -= 1
+
+    recovered = []
+    for row_key in previous_keys:
+        if unmatched[row_key]:
+            unmatched[row_key] -= 1
+            recovered.append(" — ".join(value for value in row_key if value != "None"))
+
+    return ReportDiff(
+        [item for item, new in zip(result.items, is_new) if new],
+        table[is_new].reset_index(drop=True) if len(table) else table,
+        recovered
+    )
@@ -1,65 +1,59 @@
 import pandas as pd
 
+from reports.result import ReportResult
+from reports.rule_engine import ReportSpec, run_spec, run_spec_chunked
 
-def build_homework_check_report(df: pd.DataFrame) -> list[str]:
-    required_columns = [
-        ('Месяц', 'Получено'),
-        ('Месяц', 'Проверено'),
-        ('Неделя', 'Получено'),
-        ('Неделя', 'Проверено')
-    ]
-
-    # Проверяем наличие колонок
-    missing_columns = [
-        f"{col[0]} - {col[1]}"
-        for col in required_columns
-        if col not in df.columns
-    ]
-
-    # Проверяем, есть ли 'ФИО преподавателя' в верхнем уровне заголовков
-    if 'ФИО преподавателя' not in df.columns.get_level_values(0):
-        missing_columns.append("ФИО преподавателя")
-
-    if missing_columns:
-        raise ValueError(", ".join(missing_columns))
-
-    result = []
 
-    for _, row in df.iterrows():
-        fio = row.get('ФИО преподавателя')
-        if isinstance(fio, pd.Series):
-            fio = fio.iloc[0]
+def _teacher_name(df: pd.DataFrame) -> pd.Series:
+    # При двухуровневой шапке под 'ФИО преподавателя' лежит одна подколонка
+    fio = df['ФИО преподавателя']
+    if isinstance(fio, pd.DataFrame):
+        fio = fio.iloc[:, 0]
+    return fio
 
-        if pd.isna(fio):
-            continue
 
-        lines = []
+def _checked_percent(period: str):
+    def derive(df: pd.DataFrame) -> pd.Series:
+        received = pd.to_numeric(df[(period, 'Получено')], errors='coerce')
+        checked = pd.to_numeric(df[(period, 'Проверено')], errors='coerce')
+        # Процент считаем только там, где работы вообще поступали
+        return (checked / received * 100).where(received > 0)
+    return derive
 
-        try:
-            month_received = row[('Месяц', 'Получено')]
-            month_checked = row[('Месяц', 'Проверено')]
-        except KeyError:
-            month_received = month_checked = None
 
-        if pd.notna(month_received) and pd.notna(month_checked) and month_received > 0:
-            month_percent = month_checked / month_received * 100
-            if month_percent < 70:
-                lines.append(f"За месяц: {month_percent:.1f}%")
-
-        try:
-            week_received = row[('Неделя', 'Получено')]
-            week_checked = row[('Неделя', 'Проверено')]
-        except KeyError:
-            week_received = week_checked = None
-
-        if pd.notna(week_received) and pd.notna(week_checked) and week_received > 0:
-            week_percent = week_checked / week_received * 100
-            if week_percent < 70:
-                lines.append(f"За неделю: {week_percent:.1f}%")
-
-        if lines:
-            result.append(
-                "👨🏻‍🎓 " + fio + "\n" + "\n".join(lines) + "\n"
-            )
-
-    return result
+# Преподаватели, проверившие меньше 70% работ за месяц или за неделю.
+# Файл читается с двухуровневой шапкой (header=[0, 1])
+HOMEWORK_CHECK_SPEC = ReportSpec(
+    required=[
+        ('Месяц', 'Получено'),
+        ('Месяц', 'Проверено'),
+        ('Неделя', 'Получено'),
+        ('Неделя', 'Проверено'),
+        'ФИО преподавателя'
+    ],
+    derive={
+        'fio': _teacher_name,
+        'month_percent': _checked_percent('Месяц'),
+        'week_percent': _checked_percent('Неделя'),
+    },
+    dropna=['fio'],
+    mask="month_percent < 70 or week_percent < 70",
+    template="👨🏻‍🎓 {fio}\n{sections}\n",
+    sections=[
+        ("month_percent < 70", "За месяц: {month_percent:.1f}%"),
+        ("week_percent < 70", "За неделю: {week_percent:.1f}%"),
+    ],
+    export={
+        'fio': 'ФИО преподавателя',
+        'month_percent': 'Проверено за месяц, %',
+        'week_percent': 'Проверено за неделю, %',
+    }
+)
+
+
+def build_homework_check_report(df: pd.DataFrame) -> ReportResult:
+    return run_spec(HOMEWORK_CHECK_SPEC, df)
+
+
+def build_homework_check_report_stream(chunks) -> ReportResult:
+    return run_spec_chunked(HOMEWORK_CHECK_SPEC, chunks)
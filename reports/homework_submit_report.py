@@ -1,29 +1,22 @@
 import pandas as pd
 
+from reports.result import ReportResult
+from reports.rule_engine import ReportSpec, run_spec, run_spec_chunked
 
-def build_homework_submit_report(df: pd.DataFrame) -> list[str]:
-    required_columns = {'FIO', 'Группа', 'Percentage Homework'}
+# Студенты, сдавшие меньше 70% домашних заданий
+HOMEWORK_SUBMIT_SPEC = ReportSpec(
+    columns=['FIO', 'Группа', 'Percentage Homework'],
+    mask="`Percentage Homework` < 70",
+    template=(
+        "👨🏻‍🎓 {FIO} — {Группа}\n"
+        "📚 Процент сданных домашних заданий: {Percentage Homework}%\n"
+    )
+)
 
-    # Проверяем, каких колонок не хватает в файле
-    missing_columns = required_columns - set(df.columns)
 
-    # Если есть недостающие колонки, выбрасываем ошибку с их списком
-    if missing_columns:
-        raise ValueError(f"{', '.join(missing_columns)}")
+def build_homework_submit_report(df: pd.DataFrame) -> ReportResult:
+    return run_spec(HOMEWORK_SUBMIT_SPEC, df)
 
-    df = df[['FIO', 'Группа', 'Percentage Homework']].dropna()
 
-    low_homework_submit = df[(df['Percentage Homework'] < 70)]
-
-    if low_homework_submit.empty:
-        return []
-
-    result = []
-
-    for _, row in low_homework_submit.iterrows():
-        result.append(
-            f"👨🏻‍🎓 {row['FIO']} — " f"{row['Группа']}\n"
-            f"📚 Процент сданных домашних заданий: {row['Percentage Homework']}%\n"
-        )
-
-    return result
+def build_homework_submit_report_stream(chunks) -> ReportResult:
+    return run_spec_chunked(HOMEWORK_SUBMIT_SPEC, chunks)
@@ -1,25 +1,39 @@
 import pandas as pd
 import re
 
+from config import LESSON_TOPIC_PATTERNS
+from reports.result import ReportResult
 
-def build_lesson_topics_report(df: pd.DataFrame) -> list[str]:
+
+# Допустимые форматы темы урока, объединённые в одно выражение (компилируется один раз на процесс).
+# Формат по умолчанию: "Урок № 5. Тема: ..." (регистр не важен, "№" и пробелы необязательны)
+TOPIC_PATTERN = re.compile("|".join(f"(?:{pattern})" for pattern in LESSON_TOPIC_PATTERNS), re.IGNORECASE)
+
+
+def _invalid_topics(df: pd.DataFrame) -> list[str]:
     # Проверка на наличия колонки в таблице
     if 'Тема урока' not in df.columns:
         raise ValueError("Тема урока")
 
-    # Регулярное выражение для проверки формата.
-    # ^ - начало строки
-    # \s* - возможные пробелы
-    # \d+ - номер урока (цифры)
-    # re.IGNORECASE - игнорируем регистр (урок/Урок)
-    pattern = re.compile(r"^Урок\s*№?\s*\d+\.\s*Тема:\s*.+", re.IGNORECASE)
+    # Все значения колонки (кроме пустых ячеек) проверяются разом, без цикла по строкам
+    topics = df['Тема урока'].dropna().astype(str).str.strip()
+    if topics.empty:
+        return []
+
+    # Строки, не подходящие ни под один формат, — ошибки
+    return topics[~topics.str.match(TOPIC_PATTERN)].tolist()
 
-    invalid_topics = []
 
-    # Проходим по всем значениям в колонке, исключая пустые ячейки (NaN)
-    for topic in df['Тема урока'].dropna():
-        if not pattern.match(str(topic).strip()):
-            # Если строка не соответствует паттерну — добавляем в список ошибок
-            invalid_topics.append(str(topic).strip())
+def _result(invalid_topics: list[str]) -> ReportResult:
+    return ReportResult(invalid_topics, pd.DataFrame({'Тема урока': invalid_topics}, dtype=object))
 
-    return invalid_topics
+
+def build_lesson_topics_report(df: pd.DataFrame) -> ReportResult:
+    return _result(_invalid_topics(df))
+
+
+def build_lesson_topics_report_stream(chunks) -> ReportResult:
+    invalid_topics = []
+    for chunk in chunks:
+        invalid_topics.extend(_invalid_topics(chunk))
+    return _result(invalid_topics)
@@ -0,0 +1,243 @@
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# callback_data кнопки «все подходящие отчёты»
+ALL_REPORTS = "all"
+
+
+class ReportDefinition:
+    """
+    Описание отчёта: как читать файл, чем строить отчёт и как его показать.
+
+    builder    — путь к функции построения отчёта по таблице ("модуль:функция"),
+                 stream_builder — к функции построения по порциям таблицы;
+    header     — режим заголовка для pd.read_excel;
+    required   — колонки, по которым в шапке файла узнаётся подходящий отчёт
+                 (кортеж — двухуровневая колонка, строка — колонка верхнего уровня)
+                 или путь к ним в модуле отчёта ("модуль:SPEC.required");
+    columns    — колонки, которые нужны отчёту (None — все колонки листа);
+    dtypes     — типы колонок при чтении (передаются в pd.read_excel как dtype);
+    converters — приведение колонок сразу после чтения: колонка -> путь к функции над Series.
+                 Результат кэшируется вместе с таблицей, поэтому повторные отчёты
+                 не тратят время на очистку строк;
+    diff_key   — колонки таблицы результата, по которым запись узнаётся при сравнении
+                 с прошлой загрузкой (None — отчёт не сравнивается);
+    version    — версия построения отчёта: увеличивается при любом изменении результата,
+                 чтобы не отдавать из кэша результаты, посчитанные старым кодом.
+    """
+
+    def __init__(
+        self,
+        *,
+        key: str,
+        button: str,
+        title: str,
+        empty_message: str,
+        filename_prefix: str,
+        builder: str,
+        stream_builder: str,
+        header=0,
+        required: list | str | None = None,
+        columns: list | None = None,
+        dtypes: dict | None = None,
+        converters: dict | None = None,
+        diff_key: list | None = None,
+        version: int = 1
+    ):
+        self.key = key
+        self.button = button
+        self.title = title
+        self.empty_message = empty_message
+        self.filename_prefix = filename_prefix
+        self._builder = builder
+        self._stream_builder = stream_builder
+        self.header = header
+        self._required = required or []
+        self.columns = columns
+        self.dtypes = dtypes or {}
+        self._converters = converters or {}
+        self.diff_key = diff_key
+        self.version = version
+
+    @property
+    def builder(self):
+        return _resolve(self._builder)
+
+    @property
+    def stream_builder(self):
+        return _resolve(self._stream_builder)
+
+    @property
+    def required(self) -> list:
+        if isinstance(self._required, str):
+            return _resolve(self._required)
+        return self._required
+
+    @property
+    def converters(self) -> dict:
+        return {column: _resolve(path) for column, path in self._converters.items()}
+
+    def supports(self, columns: "pd.Index") -> bool:
+        """
+        Подходит ли отчёт к таблице с такими колонками (прочитанными с self.header).
+        """
+        top_level = set(columns.get_level_values(0))
+        for column in self.required:
+            if isinstance(column, tuple):
+                if column not in columns:
+                    return False
+            elif column not in top_level:
+                return False
+        return True
+
+    def load_options(self) -> dict:
+        """
+        Параметры чтения файла для read_excel_cached / load_excel.
+        """
+        return {
+            "header": self.header,
+            "columns": self.columns,
+            "dtypes": self.dtypes,
+            "converters": self.converters,
+        }
+
+    def message_options(self) -> dict:
+        """
+        Заголовок, сообщение для пустого отчёта и префикс файла для send_report_with_preview.
+        """
+        return {
+            "title": self.title,
+            "empty_message": self.empty_message,
+            "filename_prefix": self.filename_prefix,
+        }
+
+
+# Модули отчётов (а с ними pandas и NumPy) импортируются при первом обращении
+# к построителю отчёта, а не при импорте реестра: меню и обработчики бота
+# доступны сразу после запуска. Путь "модуль:атрибут" -> объект
+_resolved: dict[str, object] = {}
+
+
+def _resolve(path: str):
+    value = _resolved.get(path)
+    if value is None:
+        module_name, _, attribute = path.partition(":")
+        value = importlib.import_module(module_name)
+        for name in attribute.split("."):
+            value = getattr(value, name)
+        _resolved[path] = value
+    return value
+
+
+_REPORT_LIST = [
+    ReportDefinition(
+        key="schedule",
+        button="📓 Расписание групп",
+        title="📖 <b>Отчёт по расписанию</b>",
+        empty_message="❌ <b>Не удалось найти дисциплины в файле</b>",
+        filename_prefix="schedule_report",
+        builder="reports.schedule_report:build_schedule_report",
+        stream_builder="reports.schedule_report:build_schedule_report_stream",
+        # Предметы ищутся во всех колонках, кроме технических,
+        # а сам лист расписания узнаётся по этим техническим колонкам
+        required=['Группа', 'Пара'],
+        columns=None,
+    ),
+    ReportDefinition(
+        key="topics",
+        button="📋 Темы уроков",
+        title="🚨 <b>Неверный формат тем уроков</b>",
+        empty_message="✅ <b>Все темы уроков соответствуют формату</b>",
+        filename_prefix="invalid_lesson_topics",
+        builder="reports.lesson_topics_report:build_lesson_topics_report",
+        stream_builder="reports.lesson_topics_report:build_lesson_topics_report_stream",
+        required=['Тема урока'],
+        columns=['Тема урока'],
+        dtypes={'Тема урока': str},
+        diff_key=['Тема урока'],
+    ),
+    ReportDefinition(
+        key="students",
+        button="🎓 Проблемные студенты",
+        title="🚨 <b>Проблемные студенты</b>",
+        empty_message="✅ <b>Студентов с критическими показателями не найдено</b>",
+        filename_prefix="problem_students",
+        builder="reports.students_report:build_students_report",
+        stream_builder="reports.students_report:build_students_report_stream",
+        required="reports.students_report:STUDENTS_SPEC.required",
+        columns=['FIO', 'Группа', 'Homework', 'Classroom'],
+        dtypes={'FIO': str, 'Группа': str},
+        diff_key=['FIO', 'Группа'],
+    ),
+    ReportDefinition(
+        key="attendance",
+        button="🏫 Посещаемость студентов",
+        title="🚨 <b>Посещаемость ниже 40%</b>",
+        empty_message="✅ <b>Преподавателей с посещаемостью ниже 40% не найдено</b>",
+        filename_prefix="low_attendance",
+        builder="reports.attendance_report:build_attendance_report",
+        stream_builder="reports.attendance_report:build_attendance_report_stream",
+        required="reports.attendance_report:ATTENDANCE_SPEC.required",
+        columns=['ФИО преподавателя', 'Средняя посещаемость'],
+        dtypes={'ФИО преподавателя': str},
+        # "35,5%" -> 35.5 сразу при чтении
+        converters={'Средняя посещаемость': "reports.rule_engine:to_percent"},
+        diff_key=['ФИО преподавателя'],
+    ),
+    ReportDefinition(
+        key="homework_check",
+        button="📘 Проверенные домашние задания",
+        title="🚨 <b>Проверка ДЗ меньше 70%</b>",
+        empty_message="✅ <b>Все преподаватели проверяют ДЗ вовремя</b>",
+        filename_prefix="low_homework_check",
+        builder="reports.homework_check_report:build_homework_check_report",
+        stream_builder="reports.homework_check_report:build_homework_check_report_stream",
+        # Для этого отчета нужно читать файл с двухуровневой шапкой (header=[0, 1])
+        header=[0, 1],
+        required="reports.homework_check_report:HOMEWORK_CHECK_SPEC.required",
+        diff_key=['ФИО преподавателя'],
+    ),
+    ReportDefinition(
+        key="homework_submit",
+        button="📚 Сданные домашние задания",
+        title="🚨 <b>Низкий процент сдачи домашних заданий</b>",
+        empty_message="✅ <b>Студентов с низким процентом сдачи домашних заданий не найдено</b>",
+        filename_prefix="low_homework_submit",
+        builder="reports.homework_submit_report:build_homework_submit_report",
+        stream_builder="reports.homework_submit_report:build_homework_submit_report_stream",
+        required="reports.homework_submit_report:HOMEWORK_SUBMIT_SPEC.required",
+        columns=['FIO', 'Группа', 'Percentage Homework'],
+        dtypes={'FIO': str, 'Группа': str},
+        diff_key=['FIO', 'Группа'],
+    ),
+]
+
+# Тип отчёта (callback_data кнопки) -> описание отчёта, в порядке кнопок меню
+REPORTS: dict[str, ReportDefinition] = {report.key: report for report in _REPORT_LIST}
+
+
+def load_reports() -> None:
+    """
+    Импортирует модули всех отчётов заранее (для прогрева после запуска).
+    """
+    for report in _REPORT_LIST:
+        paths = [report._builder, report._stream_builder, *report._converters.values()]
+        if isinstance(report._required, str):
+            paths.append(report._required)
+        for path in paths:
+            _resolve(path)
+
+
+def result_key(digest: str, report_type: str) -> tuple:
+    """
+    Ключ кэша результатов: (хэш файла, тип отчёта, версия построения).
+    Для «всех отчётов» версия складывается из версий всех отчётов.
+    """
+    if report_type == ALL_REPORTS:
+        version = tuple((report.key, report.version) for report in _REPORT_LIST)
+    else:
+        version = REPORTS[report_type].version
+    return digest, report_type, version
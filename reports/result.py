@@ -0,0 +1,14 @@
+import pandas as pd
+
+
+class ReportResult:
+    """
+    Результат отчёта.
+
+    items — строки для сообщения в чате;
+    table — те же записи таблицей (одна строка на запись) для выгрузки в CSV/XLSX.
+    """
+
+    def __init__(self, items: list[str], table: pd.DataFrame):
+        self.items = items
+        self.table = table
@@ -0,0 +1,232 @@
+from string import Formatter
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from reports.result import ReportResult
+
+
+def _to_numeric(column: pd.Series) -> pd.Series:
+    return pd.to_numeric(column, errors='coerce')
+
+
+def to_percent(column: pd.Series) -> pd.Series:
+    """
+    Приводит проценты вида "35%", "35,5%" или 35.5 к числу; нераспознанное — пропуск.
+    Целочисленные проценты остаются целыми даже при пустых ячейках в колонке.
+    """
+    # Уже числовая колонка не требует очистки от "%" и ","
+    if is_numeric_dtype(column):
+        return column
+
+    cleaned = (
+        column
+        .astype(str)
+        .str.replace('%', '', regex=False)
+        .str.replace(',', '.', regex=False)
+    )
+    return pd.to_numeric(cleaned.where(column.notna()), errors='coerce', dtype_backend='numpy_nullable')
+
+
+# Доступные приведения типов: название -> функция над колонкой
+COERCIONS = {
+    'numeric': _to_numeric,
+    'percent': to_percent,
+}
+
+
+class ReportSpec:
+    """
+    Декларативное описание порогового отчёта.
+
+    required — колонки, без которых отчёт не строится (кортеж — двухуровневая колонка,
+               строка при двухуровневой шапке ищется в верхнем уровне);
+    columns  — колонки, которые берутся из таблицы (словарь задаёт им короткие имена);
+    derive   — вычисляемые колонки: имя -> функция от исходной таблицы;
+    dropna   — True (все колонки), список колонок или False;
+    coerce   — приведение типов: колонка -> название из COERCIONS
+               (строки, не приведённые к числу, отбрасываются);
+    mask     — условие отбора: выражение для DataFrame.eval или функция от таблицы;
+    template — шаблон строки отчёта в формате str.format;
+    sections — необязательные блоки (условие, шаблон); попавшие под условие
+               блоки склеиваются через перевод строки и доступны в шаблоне как {sections};
+    export   — колонки таблицы для выгрузки: имя -> заголовок
+               (по умолчанию все взятые и вычисленные колонки под своими именами).
+    """
+
+    def __init__(
+        self,
+        *,
+        template: str,
+        mask,
+        required: list | None = None,
+        columns: list | dict | None = None,
+        derive: dict | None = None,
+        dropna: bool | list = True,
+        coerce: dict | None = None,
+        sections: list | None = None,
+        export: dict | None = None
+    ):
+        if isinstance(columns, dict):
+            self.columns = columns
+        else:
+            self.columns = {column: column for column in columns or []}
+
+        self.required = required if required is not None else list(self.columns)
+        self.derive = derive or {}
+        self.dropna = dropna
+        self.coerce = coerce or {}
+        self.mask = mask
+        self.template = _compile_template(template)
+        self.sections = [(condition, _compile_template(text)) for condition, text in sections or []]
+        self.export = export or {name: name for name in [*self.columns.values(), *self.derive]}
+
+
+def _compile_template(template: str) -> list[tuple[str, str | None, str]]:
+    # Разбираем шаблон один раз: список (текст, имя поля, формат)
+    return [
+        (literal, field, format_spec or "")
+        for literal, field, format_spec, _ in Formatter().parse(template)
+    ]
+
+
+def _missing_columns(spec: ReportSpec, df: pd.DataFrame) -> list[str]:
+    missing = []
+    top_level = set(df.columns.get_level_values(0))
+
+    for column in spec.required:
+        if isinstance(column, tuple):
+            if column not in df.columns:
+                missing.append(" - ".join(column))
+        elif column not in top_level:
+            missing.append(column)
+
+    return missing
+
+
+def _evaluate(condition, frame: pd.DataFrame) -> pd.Series:
+    if callable(condition):
+        return condition(frame)
+    return frame.eval(condition)
+
+
+def _format_column(column: pd.Series, format_spec: str) -> pd.Series:
+    if not format_spec:
+        return column.astype(str)
+    return column.map(("{:" + format_spec + "}").format)
+
+
+def _render(parts, frame: pd.DataFrame, extra: dict | None = None) -> pd.Series:
+    result = pd.Series("", index=frame.index, dtype=object)
+
+    for literal, field, format_spec in parts:
+        if literal:
+            result = result + literal
+        if field is None:
+            continue
+        column = extra[field] if extra and field in extra else frame[field]
+        result = result + _format_column(column, format_spec)
+
+    return result
+
+
+def select_rows(spec: ReportSpec, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Проверяет колонки, приводит типы и возвращает строки, попавшие под условие отчёта.
+    Все шаги выполняются над колонками целиком, без цикла по строкам.
+    """
+    missing = _missing_columns(spec, df)
+    if missing:
+        raise ValueError(", ".join(missing))
+
+    if spec.columns:
+        frame = df[list(spec.columns)].set_axis(list(spec.columns.values()), axis=1)
+    else:
+        frame = pd.DataFrame(index=df.index)
+
+    for name, derive in spec.derive.items():
+        frame[name] = derive(df)
+
+    if spec.dropna is True:
+        frame = frame.dropna()
+    elif spec.dropna:
+        frame = frame.dropna(subset=spec.dropna)
+
+    for column, kind in spec.coerce.items():
+        frame[column] = COERCIONS[kind](frame[column])
+        frame = frame.dropna(subset=[column])
+
+    if frame.empty:
+        return frame
+
+    return frame[np.asarray(_evaluate(spec.mask, frame), dtype=bool)]
+
+
+def render_rows(spec: ReportSpec, rows: pd.DataFrame) -> list[str]:
+    """
+    Форматирует отобранные строки по шаблону отчёта.
+    """
+    if rows.empty:
+        return []
+
+    extra = None
+    if spec.sections:
+        joined = pd.Series("", index=rows.index, dtype=object)
+        for condition, parts in spec.sections:
+            selected = np.asarray(_evaluate(condition, rows), dtype=bool)
+            separator = np.where(joined != "", "\n", "")
+            joined = joined.where(~selected, joined + separator + _render(parts, rows))
+        extra = {"sections": joined}
+
+    return _render(spec.template, rows, extra).tolist()
+
+
+def select_rows_chunked(spec: ReportSpec, chunks) -> pd.DataFrame:
+    """
+    То же, что select_rows, но для таблицы, прочитанной порциями:
+    в памяти остаются только отобранные строки.
+    """
+    parts = []
+    float_columns = set()
+
+    for chunk in chunks:
+        rows = select_rows(spec, chunk)
+        parts.append(rows)
+        float_columns.update(rows.columns[[dtype.kind == 'f' for dtype in rows.dtypes]])
+
+    if not parts:
+        return pd.DataFrame()
+
+    result = pd.concat(parts)
+
+    # При полном чтении колонка становится дробной, если дробное число есть хоть где-то.
+    # Повторяем это, даже если дробные значения были только в неотобранных строках
+    for column in float_columns:
+        if result[column].dtype.kind in 'iu':
+            result[column] = result[column].astype(float)
+
+    return result
+
+
+def export_rows(spec: ReportSpec, rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Таблица отобранных строк для выгрузки в CSV/XLSX.
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=list(spec.export.values()))
+
+    table = rows[list(spec.export)].set_axis(list(spec.export.values()), axis=1)
+    return table.reset_index(drop=True)
+
+
+def _result(spec: ReportSpec, rows: pd.DataFrame) -> ReportResult:
+    return ReportResult(render_rows(spec, rows), export_rows(spec, rows))
+
+
+def run_spec(spec: ReportSpec, df: pd.DataFrame) -> ReportResult:
+    return _result(spec, select_rows(spec, df))
+
+
+def run_spec_chunked(spec: ReportSpec, chunks) -> ReportResult:
+    return _result(spec, select_rows_chunked(spec, chunks))
@@ -0,0 +1,163 @@
+import io
+import os
+
+from openpyxl import Workbook
+
+from config import STREAMING_THRESHOLD_MB
+from utils import metrics
+from utils.dataframe_cache import apply_load_options, read_excel_cached, read_excel_modes
+from utils.excel_parsing import frame_from_raw, read_raw_sheet
+from utils.streaming_reader import iter_excel_chunks
+from reports.registry import ALL_REPORTS, REPORTS, load_reports
+from reports.result import ReportResult
+
+# Сколько первых строк читать, чтобы определить подходящие отчёты (двухуровневая шапка)
+HEADER_ROWS = 2
+
+
+class FileReadError(Exception):
+    """
+    Файл не удалось прочитать как Excel-таблицу.
+    """
+
+
+def is_large_file(file_path: str) -> bool:
+    """
+    Большие файлы читаются потоково, а не целиком в DataFrame.
+    """
+    return os.path.getsize(file_path) >= STREAMING_THRESHOLD_MB * 1024 * 1024
+
+
+def _read_chunks(file_path: str, header, columns=None, dtypes=None, converters=None):
+    # Ошибки чтения отличаем от ошибок построения отчёта (например, нет колонок)
+    try:
+        for chunk in iter_excel_chunks(file_path, header=header, columns=columns):
+            yield apply_load_options(chunk, None, dtypes or {}, converters or {})
+    except Exception as e:
+        raise FileReadError(str(e)) from e
+
+
+def run_report(file_path: str, report_type: str) -> ReportResult:
+    """
+    Читает файл и строит отчёт указанного типа.
+    Функция верхнего уровня, чтобы её можно было выполнять в пуле процессов.
+    """
+    with metrics.peak_memory(report=report_type):
+        return _run_report(file_path, report_type)
+
+
+def _run_report(file_path: str, report_type: str) -> ReportResult:
+    report = REPORTS[report_type]
+    options = report.load_options()
+
+    if is_large_file(file_path):
+        # Чтение и построение идут вперемешку, порциями — замеряем их вместе
+        with metrics.timed("stream", report=report_type):
+            return report.stream_builder(_read_chunks(file_path, **options))
+
+    try:
+        with metrics.timed("read", report=report_type):
+            df = read_excel_cached(file_path, **options)
+    except Exception as e:
+        raise FileReadError(str(e)) from e
+    metrics.observe("bot_report_rows", len(df), report=report_type)
+
+    with metrics.timed("build", report=report_type):
+        return report.builder(df)
+
+
+def detect_reports(file_path: str) -> list[str]:
+    """
+    Определяет по шапке файла, какие отчёты к нему подходят.
+    Читаются только первые HEADER_ROWS строк первого листа.
+    """
+    try:
+        head = read_raw_sheet(file_path, rows=HEADER_ROWS)
+    except Exception as e:
+        raise FileReadError(str(e)) from e
+
+    columns = {}
+    report_types = []
+    for report in REPORTS.values():
+        header_key = str(report.header)
+        if header_key not in columns:
+            try:
+                columns[header_key] = frame_from_raw(head, report.header).columns
+            except IndexError:
+                # В файле меньше строк, чем в шапке такого вида
+                columns[header_key] = None
+
+        if columns[header_key] is not None and report.supports(columns[header_key]):
+            report_types.append(report.key)
+
+    return report_types
+
+
+def run_all_reports(file_path: str) -> list[tuple[str, ReportResult | None, Exception | None]]:
+    """
+    Строит все отчёты, подходящие к файлу, за один разбор файла.
+    Возвращает список (тип отчёта, результат, ошибка) в порядке меню.
+    """
+    with metrics.peak_memory(report=ALL_REPORTS):
+        return _run_all_reports(file_path)
+
+
+def _run_all_reports(file_path: str) -> list[tuple[str, ReportResult | None, Exception | None]]:
+    with metrics.timed("detect", report=ALL_REPORTS):
+        reports = [REPORTS[report_type] for report_type in detect_reports(file_path)]
+
+    # Большие файлы читаются потоково — по одному проходу на отчёт,
+    # зато без полной таблицы в памяти
+    frames = None
+    if reports and not is_large_file(file_path):
+        try:
+            with metrics.timed("read", report=ALL_REPORTS):
+                frames = read_excel_modes(file_path, [report.header for report in reports])
+        except Exception as e:
+            raise FileReadError(str(e)) from e
+
+    results = []
+    for i, report in enumerate(reports):
+        try:
+            if frames is None:
+                with metrics.timed("stream", report=report.key):
+                    result = report.stream_builder(_read_chunks(file_path, **report.load_options()))
+            else:
+                df = apply_load_options(frames[i], report.columns, report.dtypes, report.converters)
+                metrics.observe("bot_report_rows", len(df), report=report.key)
+                with metrics.timed("build", report=report.key):
+                    result = report.builder(df)
+            results.append((report.key, result, None))
+        except Exception as e:
+            results.append((report.key, None, e))
+
+    return results
+
+
+def run_measured(func, *args) -> tuple:
+    """
+    Выполняет func(*args) и возвращает (результат, замеры стадий).
+    В пуле процессов метрики дочернего процесса недоступны основному,
+    поэтому замеры возвращаются вместе с результатом (см. metrics.replay).
+    """
+    with metrics.capture() as records:
+        result = func(*args)
+    return result, records
+
+
+def warm_up() -> None:
+    """
+    Прогрев процесса: импорт модулей всех отчётов и разбор небольшой книги
+    тем же путём, что и при определении отчётов. Первый разбор в процессе
+    заметно дольше последующих (openpyxl и pandas готовят свои внутренние структуры).
+    """
+    with metrics.timed("warm_up"):
+        load_reports()
+
+        workbook = Workbook()
+        workbook.active.append(["Группа", "Пара", "Понедельник"])
+        workbook.active.append(["1", 1, "Предмет: Математика"])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        detect_reports(buffer)
@@ -1,32 +1,73 @@
 import pandas as pd
 import re
 
+from reports.result import ReportResult
 
-def build_schedule_report(df: pd.DataFrame) -> list[str]:
-    subject_counter: dict[str, int] = {}
 
-    for column in df.columns:
-        # Пропускаем технические колонки (время, аудитория и т.д.),
-        # чтобы случайно не захватить лишний текст
-        if any(key in column for key in ("Время", "Группа", "Пара")):
-            continue
+# Технические колонки (время, аудитория и т.д.) не просматриваются,
+# чтобы случайно не захватить лишний текст
+TECHNICAL_COLUMNS = ("Время", "Группа", "Пара")
 
-        # Перебираем все непустые ячейки в текущей колонке
-        for cell in df[column].dropna():
-            if not isinstance(cell, str):
-                continue
+# Название предмета в ячейке расписания (компилируется один раз на процесс)
+SUBJECT_PATTERN = re.compile(r"Предмет:\s*(.+)")
 
-            if "Предмет:" not in cell:
-                continue
 
-            # Извлекаем название предмета регулярным выражением
-            match = re.search(r"Предмет:\s*(.+)", cell)
-            if not match:
-                continue
+def _subject_cells(df: pd.DataFrame) -> pd.Series:
+    # Все ячейки просматриваемых колонок одной колонкой: по колонкам слева направо,
+    # внутри колонки — сверху вниз. Индекс — (номер колонки, строка)
+    positions = [
+        i for i, column in enumerate(df.columns)
+        if not any(key in column for key in TECHNICAL_COLUMNS)
+    ]
+    if not positions:
+        return pd.Series(dtype=object)
 
-            subject = match.group(1).strip()
-            subject_counter[subject] = subject_counter.get(subject, 0) + 1
+    cells = pd.concat([df.iloc[:, i] for i in positions], keys=positions).dropna()
+    if cells.dtype != object and not isinstance(cells.dtype, pd.StringDtype):
+        # В колонках только числа или даты — предметов нет
+        return pd.Series(dtype=object)
+    return cells
 
+
+def count_subjects(df: pd.DataFrame, subject_counter: dict[str, list]) -> None:
+    """
+    Добавляет в subject_counter пары из таблицы (или порции таблицы).
+    Для каждого предмета хранится [количество, (номер колонки, строка первого появления)],
+    чтобы порядок в отчёте не зависел от того, читался файл целиком или порциями.
+    """
+    cells = _subject_cells(df)
+    if cells.empty:
+        return
+
+    # Не строки (числа, даты) и ячейки без "Предмет:" дают пропуск и отбрасываются
+    try:
+        subjects = cells.str.extract(SUBJECT_PATTERN, expand=False).dropna().str.strip()
+    except AttributeError:
+        # Колонка object, но без единой строки
+        return
+    if subjects.empty:
+        return
+
+    # Количество пар по предметам и место первого появления — без цикла по ячейкам
+    counts = subjects.value_counts(sort=False)
+    first_seen = subjects[~subjects.duplicated()]
+    for (column_index, row_index), subject in first_seen.items():
+        entry = subject_counter.get(subject)
+        if entry is None:
+            subject_counter[subject] = [int(counts[subject]), (column_index, row_index)]
+        else:
+            entry[0] += int(counts[subject])
+
+
+def _ordered_subjects(subject_counter: dict[str, list]) -> list[tuple[str, int]]:
+    # Предметы идут в порядке первого появления (по колонкам слева направо)
+    return [
+        (subject, count)
+        for subject, (count, _) in sorted(subject_counter.items(), key=lambda item: item[1][1])
+    ]
+
+
+def format_subjects(subject_counter: dict[str, list]) -> list[str]:
     if not subject_counter:
         return []
 
@@ -41,8 +82,26 @@ def build_schedule_report(df: pd.DataFrame) -> list[str]:
 
     result = []
 
-    for subject, count in subject_counter.items():
+    for subject, count in _ordered_subjects(subject_counter):
         word = pare_word(count)
         result.append(f"📋 {subject} — <b>{count} {word}</b>\n")
 
     return result
+
+
+def _result(subject_counter: dict[str, list]) -> ReportResult:
+    table = pd.DataFrame(_ordered_subjects(subject_counter), columns=['Предмет', 'Количество пар'])
+    return ReportResult(format_subjects(subject_counter), table)
+
+
+def build_schedule_report(df: pd.DataFrame) -> ReportResult:
+    subject_counter: dict[str, list] = {}
+    count_subjects(df, subject_counter)
+    return _result(subject_counter)
+
+
+def build_schedule_report_stream(chunks) -> ReportResult:
+    subject_counter: dict[str, list] = {}
+    for chunk in chunks:
+        count_subjects(chunk, subject_counter)
+    return _result(subject_counter)
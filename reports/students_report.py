@@ -1,33 +1,23 @@
 import pandas as pd
 
+from reports.result import ReportResult
+from reports.rule_engine import ReportSpec, run_spec, run_spec_chunked
 
-def build_students_report(df: pd.DataFrame) -> list[str]:
-    required_columns = {'FIO', 'Группа', 'Homework', 'Classroom'}
+# Студенты со средней оценкой за ДЗ = 1 и за классную работу <= 3
+STUDENTS_SPEC = ReportSpec(
+    columns=['FIO', 'Группа', 'Homework', 'Classroom'],
+    mask="Homework == 1 and Classroom <= 3",
+    template=(
+        "👨🏻‍🎓 {FIO} — {Группа}\n"
+        "📚 Домашняя работа: {Homework}\n"
+        "🏫 Классная работа: {Classroom}\n"
+    )
+)
 
-    # Проверяем, каких колонок не хватает в файле
-    missing_columns = required_columns - set(df.columns)
 
-    # Если есть недостающие колонки, выбрасываем ошибку с их списком
-    if missing_columns:
-        raise ValueError(f"{', '.join(missing_columns)}")
+def build_students_report(df: pd.DataFrame) -> ReportResult:
+    return run_spec(STUDENTS_SPEC, df)
 
-    df = df[['FIO', 'Группа', 'Homework', 'Classroom']].dropna()
 
-    problem_students = df[
-        (df['Homework'] == 1) &
-        (df['Classroom'] <= 3)
-    ]
-
-    if problem_students.empty:
-        return []
-
-    result = []
-
-    for _, row in problem_students.iterrows():
-        result.append(
-            f"👨🏻‍🎓 {row['FIO']} — " f"{row['Группа']}\n"
-            f"📚 Домашняя работа: {row['Homework']}\n"
-            f"🏫 Классная работа: {row['Classroom']}\n"
-        )
-
-    return result
+def build_students_report_stream(chunks) -> ReportResult:
+    return run_spec_chunked(STUDENTS_SPEC, chunks)
@@ -0,0 +1,81 @@
+import asyncio
+import io
+from typing import List
+
+import pandas as pd
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import InputFile
+
+from utils import metrics
+from utils.report_pages import PageStore
+from utils.universal_report_sender import prepare_combined_report, prepare_paged_report, prepare_report
+
+
+async def send_prepared_async(
+    bot: AsyncTeleBot,
+    chat_id: int,
+    messages: List[str],
+    documents: List[tuple[str, bytes]]
+) -> None:
+    for text in messages:
+        with metrics.timed("send_message"):
+            await bot.send_message(chat_id, text, parse_mode='HTML')
+
+    for name, data in documents:
+        with metrics.timed("send_document"):
+            await bot.send_document(chat_id, InputFile(io.BytesIO(data), name))
+
+
+async def send_report_with_preview_async(
+    *,
+    bot: AsyncTeleBot,
+    chat_id: int,
+    title: str,
+    items: List[str],
+    empty_message: str = "✅ Нарушений не найдено",
+    filename_prefix: str = "report",
+    table: pd.DataFrame | None = None,
+    pages: PageStore | None = None
+) -> None:
+    """
+    Асинхронный вариант send_report_with_preview.
+    """
+    paged = await asyncio.to_thread(
+        prepare_paged_report,
+        chat_id=chat_id, title=title, items=items, filename_prefix=filename_prefix, table=table, pages=pages
+    )
+    if paged is not None:
+        text, keyboard = paged
+        with metrics.timed("send_message"):
+            await bot.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
+        return
+
+    # Сборка файлов выгрузки (XLSX) — работа процессора, выносим её из цикла событий
+    prepared = await asyncio.to_thread(
+        prepare_report,
+        chat_id=chat_id,
+        title=title,
+        items=items,
+        empty_message=empty_message,
+        filename_prefix=filename_prefix,
+        table=table
+    )
+    await send_prepared_async(bot, chat_id, *prepared)
+
+
+async def send_combined_report_async(
+    *,
+    bot: AsyncTeleBot,
+    chat_id: int,
+    sections: List[tuple[str, List[str]]],
+    tables: dict[str, pd.DataFrame] | None = None,
+    filename_prefix: str = "all_reports"
+) -> None:
+    """
+    Асинхронный вариант send_combined_report.
+    """
+    prepared = await asyncio.to_thread(
+        prepare_combined_report,
+        chat_id=chat_id, sections=sections, tables=tables, filename_prefix=filename_prefix
+    )
+    await send_prepared_async(bot, chat_id, *prepared)
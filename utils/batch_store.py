@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from typing import Iterable, Iterator
+
+from utils.upload_store import (
+    PARTIAL_SUFFIX, StoredFile, UploadTooLargeError, _remove_quietly, is_stale_partial, write_chunks
+)
+
+logger = logging.getLogger(__name__)
+
+# Список файлов пакета внутри папки чата
+MANIFEST_NAME = "batch.json"
+
+# Расширения книг, которые попадают в пакет из ZIP-архива
+EXCEL_EXTENSIONS = (".xls", ".xlsx")
+
+# Размер порции при распаковке файла из архива
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Флаг ZIP: имя файла записано в UTF-8
+ZIP_UTF8_FLAG = 0x800
+
+
+class BatchFullError(Exception):
+    """
+    В пакете уже максимальное число файлов.
+    """
+
+
+class StorageFullError(Exception):
+    """
+    Общая квота места под файлы исчерпана.
+    """
+
+
+class _BatchEntry:
+    def __init__(self, blob: str, digest: str, name: str, size: int):
+        self.blob = blob
+        self.digest = digest
+        self.name = name
+        self.size = size
+
+    def to_json(self) -> dict:
+        return {"blob": self.blob, "digest": self.digest, "name": self.name, "size": self.size}
+
+
+class _Batch:
+    def __init__(self, entries: list[_BatchEntry], used: float):
+        self.entries = entries
+        self.used = used
+        # Сообщение со списком файлов пакета, которое бот обновляет при добавлении файлов
+        self.status_message: int | None = None
+
+
+class BatchStore:
+    """
+    Пакеты файлов для пакетной обработки: отчёт строится по всем файлам пакета
+    и приходит одним ответом, сгруппированным по файлам.
+
+    - у чата в режиме пакета — папка <directory>/<chat_id> с файлами по хэшу содержимого,
+      одинаковый файл в пакет повторно не добавляется;
+    - в пакете не больше max_files файлов и не больше chat_quota байт;
+    - пакет, к которому не обращались дольше ttl секунд, удаляется;
+    - список файлов пакета хранится в JSON в папке чата и переживает перезапуск.
+
+    on_remove(path, digest) вызывается перед удалением файла пакета с диска (например, чтобы сбросить
+    кэши и колоночную копию).
+    reserve(size) — место под файл в общей с загрузками квоте (UploadStore.reserve):
+    False — файл не добавляется (StorageFullError). Вызывается без блокировки хранилища,
+    поэтому reserve может спрашивать total_size().
+    Как и UploadStore, при создании удаляет файлы, которых нет в списках пакетов.
+    """
+
+    def __init__(
+        self, directory: str, max_files: int, chat_quota: int, ttl: float, on_remove=None, reserve=None
+    ):
+        self.directory = directory
+        self.max_files = max_files
+        self.chat_quota = chat_quota
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self.reserve = reserve
+
+        self._lock = threading.Lock()
+        self._batches: dict[int, _Batch] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def is_active(self, chat_id: int) -> bool:
+        with self._lock:
+            self._evict_expired()
+            return chat_id in self._batches
+
+    def toggle(self, chat_id: int) -> bool:
+        """
+        Включает режим пакета (с пустым пакетом) или выключает его, удаляя файлы пакета.
+        Возвращает новое состояние.
+        """
+        with self._lock:
+            if chat_id in self._batches:
+                self._remove(chat_id)
+                return False
+            self._start(chat_id)
+            return True
+
+    def files(self, chat_id: int) -> list[StoredFile]:
+        """
+        Файлы пакета в порядке добавления (пустой список — режим пакета выключен).
+        """
+        with self._lock:
+            self._evict_expired()
+            batch = self._batches.get(chat_id)
+            if batch is None:
+                return []
+            batch.used = time.time()
+            self._save(chat_id)
+            return [self._stored(chat_id, entry) for entry in batch.entries]
+
+    def add(self, chat_id: int, file_name: str, chunks: Iterable[bytes]) -> StoredFile | None:
+        """
+        Добавляет файл в пакет чата (включая режим пакета, если он выключен).
+        None — такой же файл уже есть в пакете.
+        """
+        file_name = os.path.basename(file_name)
+        with self._lock:
+            batch = self._batches.get(chat_id) or self._start(chat_id)
+            if len(batch.entries) >= self.max_files:
+                raise BatchFullError(file_name)
+            limit = self.chat_quota - self._size(chat_id)
+
+        directory = self._chat_dir(chat_id)
+        partial_path, digest, size = write_chunks(directory, file_name, chunks, limit)
+        blob = digest + os.path.splitext(file_name)[1].lower()
+
+        if self.reserve is not None and not self.reserve(size):
+            _remove_quietly(partial_path)
+            raise StorageFullError(file_name)
+
+        with self._lock:
+            # Пакет могли удалить или заполнить, пока файл записывался
+            batch = self._batches.get(chat_id)
+            if batch is None or len(batch.entries) >= self.max_files:
+                _remove_quietly(partial_path)
+                raise BatchFullError(file_name)
+            if any(entry.digest == digest for entry in batch.entries):
+                _remove_quietly(partial_path)
+                return None
+
+            os.replace(partial_path, os.path.join(directory, blob))
+            entry = _BatchEntry(blob, digest, file_name, size)
+            batch.entries.append(entry)
+            batch.used = time.time()
+            self._save(chat_id)
+            return self._stored(chat_id, entry)
+
+    def add_zip(self, chat_id: int, chunks: Iterable[bytes]) -> tuple[list[StoredFile], int]:
+        """
+        Добавляет в пакет книги Excel из ZIP-архива (папки внутри архива не учитываются).
+        Возвращает (добавленные файлы, сколько книг пропущено: повторы, не поместившиеся
+        в пакет и слишком большие). Архив, который не читается, — zipfile.BadZipFile.
+        """
+        with self._lock:
+            self._batches.get(chat_id) or self._start(chat_id)
+        partial_path, _, _ = write_chunks(self._chat_dir(chat_id), "archive.zip", chunks, self.chat_quota)
+
+        added, skipped = [], 0
+        try:
+            with zipfile.ZipFile(partial_path) as archive:
+                for info in archive.infolist():
+                    name = _member_name(info)
+                    if info.is_dir() or not name.lower().endswith(EXCEL_EXTENSIONS):
+                        continue
+                    # Служебные файлы: блокировки Excel (~$) и метаданные macOS
+                    if name.startswith(("~$", ".")) or info.filename.startswith("__MACOSX/"):
+                        continue
+                    try:
+                        stored = self.add(chat_id, name, _read_member(archive, info))
+                    except (BatchFullError, UploadTooLargeError, StorageFullError):
+                        stored = None
+                    if stored is None:
+                        skipped += 1
+                    else:
+                        added.append(stored)
+        finally:
+            _remove_quietly(partial_path)
+
+        return added, skipped
+
+    def status_message(self, chat_id: int) -> int | None:
+        with self._lock:
+            batch = self._batches.get(chat_id)
+            return None if batch is None else batch.status_message
+
+    def set_status_message(self, chat_id: int, message_id: int) -> None:
+        with self._lock:
+            batch = self._batches.get(chat_id)
+            if batch is not None:
+                batch.status_message = message_id
+
+    def _chat_dir(self, chat_id: int) -> str:
+        return os.path.join(self.directory, str(chat_id))
+
+    def _stored(self, chat_id: int, entry: _BatchEntry) -> StoredFile:
+        return StoredFile(os.path.join(self._chat_dir(chat_id), entry.blob), entry.digest, entry.name)
+
+    def total_size(self) -> int:
+        """
+        Сколько байт занимают файлы всех пакетов.
+        """
+        with self._lock:
+            return sum(self._size(chat_id) for chat_id in self._batches)
+
+    def digests(self) -> set[str]:
+        """
+        Хэши всех файлов всех пакетов.
+        """
+        with self._lock:
+            return {entry.digest for batch in self._batches.values() for entry in batch.entries}
+
+    def _size(self, chat_id: int) -> int:
+        return sum(entry.size for entry in self._batches[chat_id].entries)
+
+    def _start(self, chat_id: int) -> _Batch:
+        if chat_id in self._batches:
+            self._remove(chat_id)
+        os.makedirs(self._chat_dir(chat_id), exist_ok=True)
+        batch = self._batches[chat_id] = _Batch([], time.time())
+        self._save(chat_id)
+        return batch
+
+    def _remove(self, chat_id: int) -> None:
+        batch = self._batches.pop(chat_id)
+        if self.on_remove is not None:
+            for entry in batch.entries:
+                path = self._stored(chat_id, entry).path
+                try:
+                    self.on_remove(path, entry.digest)
+                except Exception:
+                    logger.exception("Ошибка при удалении файла %s", path)
+        shutil.rmtree(self._chat_dir(chat_id), ignore_errors=True)
+
+    def _evict_expired(self) -> None:
+        deadline = time.time() - self.ttl
+        for chat_id in [chat_id for chat_id, batch in self._batches.items() if batch.used < deadline]:
+            self._remove(chat_id)
+
+    def _load(self) -> None:
+        for name in os.listdir(self.directory):
+            chat_dir = os.path.join(self.directory, name)
+            try:
+                chat_id = int(name)
+                with open(os.path.join(chat_dir, MANIFEST_NAME), encoding="utf-8") as f:
+                    data = json.load(f)
+                entries = [
+                    _BatchEntry(item["blob"], item["digest"], item["name"], item.get("size", 0))
+                    for item in data["files"]
+                ]
+                used = data["used"]
+            except (OSError, ValueError, KeyError):
+                # Не папка пакета или пакет, записанный не до конца, — удаляем
+                logger.warning("Пакет %s не прочитан и будет удалён", name)
+                if os.path.isdir(chat_dir):
+                    shutil.rmtree(chat_dir, ignore_errors=True)
+                else:
+                    _remove_quietly(chat_dir)
+                continue
+
+            entries = [entry for entry in entries if os.path.exists(os.path.join(chat_dir, entry.blob))]
+            for entry in entries:
+                # Списки пакетов старого формата — без размеров файлов
+                entry.size = entry.size or os.path.getsize(os.path.join(chat_dir, entry.blob))
+            self._batches[chat_id] = _Batch(entries, used)
+
+            # Брошенные загрузки и распакованные не до конца архивы; свежие временные файлы
+            # могут ещё дописываться
+            referenced = {entry.blob for entry in entries} | {MANIFEST_NAME}
+            for file_name in os.listdir(chat_dir):
+                path = os.path.join(chat_dir, file_name)
+                if file_name in referenced or (file_name.endswith(PARTIAL_SUFFIX) and not is_stale_partial(path)):
+                    continue
+                _remove_quietly(path)
+
+        with self._lock:
+            self._evict_expired()
+
+    def _save(self, chat_id: int) -> None:
+        # Записываем во временный файл и подменяем, чтобы список не остался недописанным
+        batch = self._batches[chat_id]
+        data = {"used": batch.used, "files": [entry.to_json() for entry in batch.entries]}
+        path = os.path.join(self._chat_dir(chat_id), MANIFEST_NAME)
+        with open(path + PARTIAL_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + PARTIAL_SUFFIX, path)
+
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    name = info.filename
+    # Архиваторы Windows записывают русские имена в кодировке cp866 без флага UTF-8,
+    # а zipfile читает такие имена как cp437
+    if not info.flag_bits & ZIP_UTF8_FLAG:
+        try:
+            name = name.encode("cp437").decode("cp866")
+        except UnicodeError:
+            pass
+    return os.path.basename(name)
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[bytes]:
+    with archive.open(info) as f:
+        while chunk := f.read(ZIP_CHUNK_SIZE):
+            yield chunk
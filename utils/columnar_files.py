@@ -0,0 +1,74 @@
+import os
+import shutil
+import threading
+
+# Папка для колоночных копий загруженных файлов: columnar/<хэш файла>/
+COLUMNAR_DIR = "columnar"
+
+# Суффикс папки, пока конвертация файла не завершена
+PARTIAL_SUFFIX = ".partial"
+
+# Размер колоночной копии на диске по хэшу файла: копии занимают ту же общую квоту,
+# что и загруженные файлы. Модуль не импортирует pandas и pyarrow, поэтому копии
+# можно удалять и учитывать, не загружая модули отчётов
+_sizes: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def conversion_dir(digest: str) -> str:
+    return os.path.join(COLUMNAR_DIR, digest)
+
+
+def _dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def record_conversion(digest: str) -> None:
+    """
+    Учитывает размер готовой колоночной копии файла.
+    """
+    size = _dir_size(conversion_dir(digest))
+    with _lock:
+        _sizes[digest] = size
+
+
+def remove_conversion(digest: str) -> None:
+    with _lock:
+        _sizes.pop(digest, None)
+    shutil.rmtree(conversion_dir(digest), ignore_errors=True)
+
+
+def total_size() -> int:
+    """
+    Сколько байт занимают колоночные копии всех файлов.
+    """
+    with _lock:
+        return sum(_sizes.values())
+
+
+def sweep_conversions(keep: set[str]) -> None:
+    """
+    При запуске: удаляет копии файлов, которых больше нет в хранилищах (digest не в keep),
+    и недописанные копии, а размеры остальных учитывает в общей квоте.
+    """
+    if not os.path.isdir(COLUMNAR_DIR):
+        return
+    for name in os.listdir(COLUMNAR_DIR):
+        if name in keep:
+            record_conversion(name)
+            continue
+        path = os.path.join(COLUMNAR_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.columnar_files import COLUMNAR_DIR, PARTIAL_SUFFIX, conversion_dir, record_conversion
+from utils.excel_parsing import read_raw_sheets, frame_from_raw
+
+# pyarrow — необязательная зависимость: без неё отчёты читают исходный Excel-файл
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Режимы заголовка, с которыми отчёты читают таблицы
+HEADER_MODES = (0, [0, 1])
+
+# Ключ метаданных Feather-файла с исходными названиями колонок
+LABELS_KEY = b"excel_columns"
+# Ключ метаданных со списком колонок смешанного типа
+MIXED_KEY = b"excel_mixed"
+
+# Коды типов для колонок со смешанными значениями (числа вперемешку со строками)
+_TYPE_STR, _TYPE_INT, _TYPE_FLOAT, _TYPE_BOOL = 0, 1, 2, 3
+
+# Конвертация идёт в фоне по одному файлу, чтобы не отнимать CPU у отчётов
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="columnar")
+
+
+def is_available() -> bool:
+    return feather is not None
+
+
+def _header_tag(header) -> str:
+    if isinstance(header, (list, tuple)):
+        return "_".join(str(h) for h in header)
+    return str(header)
+
+
+def _sheet_path(digest: str, sheet_index: int, header) -> str:
+    return os.path.join(conversion_dir(digest), f"sheet{sheet_index}_h{_header_tag(header)}.feather")
+
+
+def _label_to_json(label):
+    if isinstance(label, tuple):
+        return [_label_to_json(part) for part in label]
+    if isinstance(label, (str, int, float, bool)) or label is None:
+        return label
+    return str(label)
+
+
+def _label_from_json(label):
+    if isinstance(label, list):
+        return tuple(label)
+    return label
+
+
+def _type_code(value) -> int:
+    if isinstance(value, bool):
+        return _TYPE_BOOL
+    if isinstance(value, int):
+        return _TYPE_INT
+    if isinstance(value, float):
+        return _TYPE_FLOAT
+    return _TYPE_STR
+
+
+def _to_table(df: pd.DataFrame):
+    """
+    Переводит таблицу в Arrow. Колонки переименовываются в c0, c1, ...,
+    а исходные названия (в том числе двухуровневые) сохраняются в метаданных.
+    Колонки со смешанными типами хранятся как строка + код исходного типа.
+    """
+    arrays, names, mixed = [], [], []
+
+    for i, (label, column) in enumerate(df.items()):
+        name = f"c{i}"
+        try:
+            arrays.append(pa.array(column, from_pandas=True))
+            names.append(name)
+            continue
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+        values = column.astype(object)
+        present = values.notna()
+        arrays.append(pa.array(values.where(present, None).map(
+            lambda v: None if v is None else str(v)
+        ), type=pa.string()))
+        arrays.append(pa.array(values.map(_type_code).where(present, _TYPE_STR), type=pa.int8()))
+        names.extend([name, f"{name}_type"])
+        mixed.append(name)
+
+    metadata = {
+        LABELS_KEY: json.dumps([_label_to_json(label) for label in df.columns], ensure_ascii=False),
+        MIXED_KEY: json.dumps(mixed),
+    }
+    return pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(metadata)
+
+
+def _restore_value(value, code: int):
+    if value is None:
+        # Пропуски в object-колонках pandas читает как NaN
+        return float("nan")
+    if code == _TYPE_INT:
+        return int(value)
+    if code == _TYPE_FLOAT:
+        return float(value)
+    if code == _TYPE_BOOL:
+        return value == "True"
+    return value
+
+
+def _restore_mixed(values: pd.Series, codes: pd.Series) -> pd.Series:
+    # Поэлементно: присваивание по маске превратило бы int в float
+    restored = [_restore_value(value, code) for value, code in zip(values.astype(object), codes)]
+    return pd.Series(restored, index=values.index, dtype=object)
+
+
+def _from_table(table, columns: list | None = None) -> pd.DataFrame:
+    metadata = table.schema.metadata
+    labels = [_label_from_json(label) for label in json.loads(metadata[LABELS_KEY])]
+    mixed = set(json.loads(metadata[MIXED_KEY]))
+
+    # Из memory-mapped файла читаются только нужные колонки
+    positions = range(len(labels))
+    if columns is not None:
+        wanted = set(columns)
+        positions = [i for i in positions if labels[i] in wanted]
+
+    data = {}
+    for i in positions:
+        name = f"c{i}"
+        if name in mixed:
+            data[i] = _restore_mixed(
+                table.column(name).to_pandas(),
+                table.column(f"{name}_type").to_pandas()
+            )
+        else:
+            data[i] = table.column(name).to_pandas()
+
+    df = pd.DataFrame(data, index=pd.RangeIndex(table.num_rows))
+    selected = [labels[i] for i in positions]
+    if any(isinstance(label, tuple) for label in labels):
+        df.columns = pd.MultiIndex.from_tuples(selected, names=None) if selected else pd.MultiIndex.from_tuples([], names=[None, None])
+    else:
+        df.columns = pd.Index(selected)
+    return df
+
+
+def _write_atomic(df: pd.DataFrame, path: str) -> None:
+    # Пишем во временный файл и переименовываем: читатели никогда не увидят
+    # недописанный файл
+    tmp_path = path + ".tmp"
+    feather.write_feather(_to_table(df), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def _convert(file_path: str, digest: str) -> None:
+    target_dir = conversion_dir(digest)
+    if os.path.isdir(target_dir):
+        return
+
+    work_dir = target_dir + PARTIAL_SUFFIX
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        sheets = read_raw_sheets(file_path)
+        for sheet_index, raw in enumerate(sheets.values()):
+            for header in HEADER_MODES:
+                # Лист слишком короткий для такого заголовка
+                header_rows = max(header) + 1 if isinstance(header, list) else header + 1
+                if len(raw) < header_rows:
+                    continue
+                df = frame_from_raw(raw, header)
+                name = os.path.basename(_sheet_path(digest, sheet_index, header))
+                _write_atomic(df, os.path.join(work_dir, name))
+        os.replace(work_dir, target_dir)
+        record_conversion(digest)
+    except Exception:
+        logger.exception("Не удалось сконвертировать %s в колоночный формат", file_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def start_conversion(file_path: str, digest: str):
+    """
+    Запускает фоновую конвертацию всех листов файла в Feather.
+    Возвращает Future или None, если pyarrow не установлен.
+    """
+    if not is_available():
+        return None
+    os.makedirs(COLUMNAR_DIR, exist_ok=True)
+    return _executor.submit(_convert, file_path, digest)
+
+
+def load_columnar(digest: str, header=0, columns: list | None = None, sheet_index: int = 0):
+    """
+    Загружает лист (или только колонки columns) из Feather-копии через memory-map.
+    Возвращает None, если конвертация ещё не завершена или pyarrow не установлен.
+    """
+    if not is_available():
+        return None
+
+    path = _sheet_path(digest, sheet_index, header)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+        return _from_table(table, columns)
+    except Exception:
+        logger.exception("Не удалось прочитать колоночную копию %s", path)
+        return None
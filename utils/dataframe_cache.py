@@ -0,0 +1,281 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config import DF_CACHE_MAX_MB
+from utils.columnar_store import load_columnar
+from utils.excel_parsing import frame_from_raw, read_raw_sheet
+from utils.excel_readers import read_excel
+
+# Размер блока при чтении файла для подсчёта хэша
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DataFrameCache:
+    """
+    LRU-кэш разобранных DataFrame, ограниченный по объёму памяти.
+    Ключ — (хэш содержимого файла, режим заголовка, параметры чтения).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Блокировки на время разбора, чтобы один файл не читался параллельно дважды
+        self._loading: dict[tuple, threading.Lock] = {}
+
+    def get(self, key: tuple) -> pd.DataFrame | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            # Слишком большие таблицы не кэшируем, чтобы не вытеснить всё остальное
+            if size > self.max_bytes:
+                return
+
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+            self._entries[key] = (df, size)
+            self._size += size
+
+            # Вытесняем самые давно использованные записи
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def get_or_load(self, key: tuple, loader) -> pd.DataFrame:
+        df = self.get(key)
+        if df is not None:
+            return df
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Пока ждали блокировку, файл мог разобрать другой поток
+            df = self.get(key)
+            if df is None:
+                df = loader()
+                self.put(key, df)
+
+        with self._lock:
+            self._loading.pop(key, None)
+
+        return df
+
+    def invalidate(self, digest: str) -> None:
+        """
+        Удаляет из кэша все таблицы, разобранные из файла с указанным хэшем.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == digest]:
+                self._size -= self._entries.pop(key)[1]
+
+
+_cache = DataFrameCache(DF_CACHE_MAX_MB * 1024 * 1024)
+
+# Хэши уже посчитанных файлов: путь -> (размер, время изменения, хэш)
+_digests: dict[str, tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Возвращает SHA-256 содержимого файла.
+    Повторно файл не хэшируется, пока не изменились его размер и время изменения.
+    """
+    stat = os.stat(file_path)
+
+    with _digests_lock:
+        known = _digests.get(file_path)
+    if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[file_path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def remember_digest(file_path: str, digest: str) -> None:
+    """
+    Запоминает уже известный хэш файла (например, посчитанный при скачивании),
+    чтобы file_digest не читал файл заново.
+    """
+    stat = os.stat(file_path)
+    with _digests_lock:
+        _digests[file_path] = (stat.st_size, stat.st_mtime_ns, digest)
+
+
+def _header_key(header) -> tuple:
+    if isinstance(header, (list, tuple)):
+        return tuple(header)
+    return (header,)
+
+
+def _options_key(columns, dtypes, converters) -> tuple | None:
+    if columns is None and not dtypes and not converters:
+        return None
+    return (
+        tuple(columns) if columns is not None else None,
+        tuple(sorted((column, getattr(dtype, "__name__", str(dtype))) for column, dtype in dtypes.items())),
+        tuple(sorted((column, convert.__qualname__) for column, convert in converters.items())),
+    )
+
+
+def _as_str(column: pd.Series) -> pd.Series:
+    # Как pd.read_excel(dtype=str): пропуски остаются пропусками, а целые числа
+    # записываются без ".0"
+    values = column.dropna()
+    if values.dtype.kind == 'f':
+        text = values.map(lambda value: str(int(value)) if value.is_integer() else str(value))
+    else:
+        text = values.astype(str)
+
+    result = column.astype(object)
+    result[text.index] = text
+    return result
+
+
+def apply_load_options(df: pd.DataFrame, columns, dtypes, converters) -> pd.DataFrame:
+    """
+    Проекция и приведение типов для уже прочитанной таблицы
+    (из колоночной копии или из закэшированной полной таблицы).
+    """
+    if columns is not None:
+        wanted = set(columns)
+        df = df[[column for column in df.columns if column in wanted]].copy(deep=False)
+    else:
+        df = df.copy(deep=False)
+
+    for column, dtype in dtypes.items():
+        if column in df.columns:
+            df[column] = _as_str(df[column]) if dtype is str else df[column].astype(dtype)
+
+    for column, convert in converters.items():
+        if column in df.columns:
+            df[column] = convert(df[column])
+
+    return df
+
+
+def load_excel(file_path: str, header=0, columns=None, dtypes=None, converters=None) -> pd.DataFrame:
+    """
+    Читает Excel-файл без кэша: только нужные колонки (usecols) и с заданными типами.
+    """
+    dtypes = dtypes or {}
+    kwargs = {}
+    if columns is not None:
+        wanted = set(columns)
+        kwargs["usecols"] = lambda column: column in wanted
+    if dtypes:
+        kwargs["dtype"] = dtypes
+
+    df = read_excel(file_path, header=header, **kwargs)
+
+    for column, convert in (converters or {}).items():
+        if column in df.columns:
+            df[column] = convert(df[column])
+
+    return df
+
+
+def read_excel_cached(file_path: str, header=0, columns=None, dtypes=None, converters=None) -> pd.DataFrame:
+    """
+    Читает Excel-файл через кэш: повторные запросы того же файла
+    с тем же режимом заголовка и теми же колонками не разбирают его заново.
+
+    columns    — читать только эти колонки (None — все);
+    dtypes     — типы колонок при чтении;
+    converters — колонка -> функция над Series, применяется сразу после чтения.
+    """
+    dtypes = dtypes or {}
+    converters = converters or {}
+    digest = file_digest(file_path)
+    options_key = _options_key(columns, dtypes, converters)
+
+    def load() -> pd.DataFrame:
+        # Если полная таблица уже в кэше, достаточно выбрать из неё колонки
+        if options_key is not None:
+            full = _cache.get((digest, _header_key(header), None))
+            if full is not None:
+                return apply_load_options(full, columns, dtypes, converters)
+
+        # Затем пробуем колоночную копию; если фоновая конвертация
+        # ещё не закончилась, читаем исходный Excel-файл
+        df = load_columnar(digest, header, columns)
+        if df is not None:
+            return apply_load_options(df, None, dtypes, converters)
+
+        return load_excel(file_path, header, columns, dtypes, converters)
+
+    df = _cache.get_or_load((digest, _header_key(header), options_key), load)
+
+    # Неглубокая копия защищает закэшированную таблицу от изменений в отчётах
+    return df.copy(deep=False)
+
+
+def read_excel_modes(file_path: str, headers: list) -> list[pd.DataFrame]:
+    """
+    Таблицы одного файла сразу для нескольких режимов заголовка (например, 0 и [0, 1]).
+    Чего нет ни в кэше, ни в колоночной копии, собирается из одного разбора листа
+    без заголовков. Возвращает таблицы в порядке headers и кладёт их в кэш.
+    """
+    digest = file_digest(file_path)
+    frames: dict[tuple, pd.DataFrame] = {}
+    missing = []
+
+    for header in headers:
+        key = _header_key(header)
+        if key in frames or header in missing:
+            continue
+
+        df = _cache.get((digest, key, None))
+        if df is None:
+            df = load_columnar(digest, header)
+            if df is not None:
+                _cache.put((digest, key, None), df)
+
+        if df is None:
+            missing.append(header)
+        else:
+            frames[key] = df
+
+    if missing:
+        raw = read_raw_sheet(file_path)
+        for header in missing:
+            df = frame_from_raw(raw, header)
+            _cache.put((digest, _header_key(header), None), df)
+            frames[_header_key(header)] = df
+
+    return [frames[_header_key(header)].copy(deep=False) for header in headers]
+
+
+def invalidate_file(file_path: str) -> str | None:
+    """
+    Сбрасывает кэш для файла (вызывается, когда пользователь загрузил новый файл).
+    Возвращает хэш сброшенного файла, если он был известен.
+    """
+    with _digests_lock:
+        known = _digests.pop(file_path, None)
+    if not known:
+        return None
+    _cache.invalidate(known[2])
+    return known[2]
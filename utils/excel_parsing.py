@@ -0,0 +1,57 @@
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from utils.excel_readers import read_excel
+
+
+def read_raw_sheets(file_path: str) -> dict:
+    """
+    Читает все листы книги без обработки заголовков (header=None).
+    Из «сырых» листов затем можно собрать таблицы с любым режимом заголовка,
+    не разбирая XML повторно.
+    """
+    return read_excel(file_path, header=None, sheet_name=None)
+
+
+def read_raw_sheet(file_path: str, rows: int | None = None) -> pd.DataFrame:
+    """
+    Читает первый лист книги без обработки заголовков.
+    rows — прочитать только столько первых строк (например, одну шапку).
+    """
+    return read_excel(file_path, header=None, nrows=rows)
+
+
+def _fill_header_row(row: list, control_row: list[bool], empty="") -> tuple[list, list[bool]]:
+    # Протягиваем объединённые ячейки заголовка вправо,
+    # но только внутри одной родительской группы (как это делает pandas).
+    # empty — чем обозначена пустая ячейка: "" в «сырых» листах, None при потоковом чтении
+    last = row[0]
+    for i in range(1, len(row)):
+        if not control_row[i]:
+            last = row[i]
+
+        if row[i] == empty:
+            row[i] = last
+        else:
+            control_row[i] = False
+            last = row[i]
+
+    return row, control_row
+
+
+def frame_from_raw(raw: pd.DataFrame, header=0) -> pd.DataFrame:
+    """
+    Собирает из «сырого» листа таблицу так же, как pd.read_excel(header=header).
+    """
+    # pandas передаёт парсеру пустые ячейки как пустые строки
+    data = raw.astype(object).where(raw.notna(), "").values.tolist()
+
+    if not data:
+        return pd.DataFrame()
+
+    if isinstance(header, (list, tuple)) and len(header) > 1:
+        control_row = [True] * len(data[0])
+        for row in header:
+            data[row], control_row = _fill_header_row(data[row], control_row)
+
+    return TextParser(data, header=header).read()
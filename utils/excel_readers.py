@@ -0,0 +1,215 @@
+import importlib.util
+import logging
+import os
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+
+import pandas as pd
+
+from config import READER_ENGINE, STREAMING_THRESHOLD_MB
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ExcelEngine:
+    """
+    Способ чтения книги Excel.
+
+    extensions    — расширения файлов, которые движок умеет читать;
+    module        — модуль, без которого движок недоступен (необязательные зависимости);
+    pandas_engine — движок pd.read_excel и его параметры (engine_kwargs) для чтения листа целиком;
+    rows          — функция (путь к файлу) -> контекстный менеджер с итератором строк
+                    первого листа для потокового чтения.
+    """
+
+    def __init__(
+        self, name: str, extensions: tuple, module: str, pandas_engine: str, rows,
+        engine_kwargs: dict | None = None
+    ):
+        self.name = name
+        self.extensions = extensions
+        self.module = module
+        self.pandas_engine = pandas_engine
+        self.engine_kwargs = engine_kwargs or {}
+        self.rows = rows
+        self._available = None
+
+    def is_available(self) -> bool:
+        if self._available is None:
+            self._available = importlib.util.find_spec(self.module) is not None
+        return self._available
+
+    def supports(self, file_path: str) -> bool:
+        return os.path.splitext(file_path)[1].lower() in self.extensions
+
+    def read(self, file_path, **kwargs) -> pd.DataFrame:
+        if self.engine_kwargs:
+            kwargs["engine_kwargs"] = self.engine_kwargs
+        return pd.read_excel(file_path, engine=self.pandas_engine, **kwargs)
+
+
+def _openpyxl_rows(read_only: bool):
+    @contextmanager
+    def rows(file_path: str) -> Iterator[Iterator[tuple]]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=read_only, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            if read_only:
+                # Размеры листа в файле бывают неверными — пусть openpyxl определит их сам
+                sheet.reset_dimensions()
+            yield sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    return rows
+
+
+@contextmanager
+def _calamine_rows(file_path: str) -> Iterator[Iterator[list]]:
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(file_path)
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+        # Строки calamine отдаёт с первой строки листа, а колонки — с первой непустой
+        offset = [""] * sheet.start[1] if sheet.start else []
+        yield (offset + row for row in sheet.iter_rows())
+    finally:
+        workbook.close()
+
+
+def _xlrd_value(cell, datemode: int):
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    return cell.value
+
+
+@contextmanager
+def _xlrd_rows(file_path: str) -> Iterator[Iterator[list]]:
+    import xlrd
+
+    workbook = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        yield (
+            [_xlrd_value(cell, workbook.datemode) for cell in sheet.row(i)]
+            for i in range(sheet.nrows)
+        )
+    finally:
+        workbook.release_resources()
+
+
+# Все движки чтения: название (READER_ENGINE, метки метрик) -> движок
+ENGINES = {
+    engine.name: engine for engine in (
+        # Быстрый разбор на Rust, но лист целиком загружается в память (pip install python-calamine)
+        ExcelEngine(
+            "calamine", (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods"), "python_calamine", "calamine", _calamine_rows
+        ),
+        # Режим read-only: строки разбираются по мере чтения, память не зависит от размера листа
+        ExcelEngine(
+            "openpyxl_readonly", (".xlsx", ".xlsm"), "openpyxl", "openpyxl", _openpyxl_rows(read_only=True)
+        ),
+        # Обычный режим openpyxl: медленнее и держит в памяти всю книгу, зато не зависит
+        # от порядка и размеров ячеек, записанных в файле (запасной вариант)
+        ExcelEngine(
+            "openpyxl", (".xlsx", ".xlsm"), "openpyxl", "openpyxl", _openpyxl_rows(read_only=False),
+            engine_kwargs={"read_only": False}
+        ),
+        # Старый формат .xls
+        ExcelEngine("xlrd", (".xls",), "xlrd", "xlrd", _xlrd_rows),
+    )
+}
+
+# Порядок выбора движков: для небольших файлов — самый быстрый, для больших
+# (потоковое чтение) — с ограниченной памятью
+AUTO_ORDER = ("calamine", "openpyxl_readonly", "openpyxl", "xlrd")
+STREAMING_ORDER = ("openpyxl_readonly", "calamine", "xlrd", "openpyxl")
+
+
+def engine_candidates(file_path: str, streaming: bool | None = None) -> list[ExcelEngine]:
+    """
+    Движки, которыми можно прочитать файл, в порядке предпочтения: движок из READER_ENGINE
+    (если задан), затем остальные установленные, подходящие к типу файла.
+    streaming — файл будет читаться потоково (None — решить по размеру файла).
+    """
+    if streaming is None:
+        streaming = os.path.getsize(file_path) >= STREAMING_THRESHOLD_MB * 1024 * 1024
+
+    order = list(STREAMING_ORDER if streaming else AUTO_ORDER)
+    if READER_ENGINE in ENGINES:
+        order.remove(READER_ENGINE)
+        order.insert(0, READER_ENGINE)
+
+    return [
+        ENGINES[name] for name in order
+        if ENGINES[name].supports(str(file_path)) and ENGINES[name].is_available()
+    ]
+
+
+def _failed(engine: ExcelEngine, file_path, error: Exception) -> None:
+    metrics.inc("bot_excel_read_errors_total", engine=engine.name)
+    logger.warning("Движок %s не прочитал файл %s: %s", engine.name, file_path, error)
+
+
+def read_excel(file_path, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_excel первым подходящим движком (для больших файлов — в первую очередь
+    потоковым: шапку большого файла он прочитает, не разбирая весь лист);
+    если движок не справился, файл читается следующим.
+    Если файл не прочитал ни один движок, выбрасывается ошибка первого из них.
+    Файл в памяти (BytesIO) читается движком openpyxl.
+    """
+    if not isinstance(file_path, (str, os.PathLike)):
+        return ENGINES["openpyxl_readonly"].read(file_path, **kwargs)
+
+    candidates = engine_candidates(file_path)
+    if not candidates:
+        raise ValueError(f"Нет установленного движка для чтения файлов {os.path.splitext(file_path)[1]}")
+
+    first_error = None
+    for engine in candidates:
+        try:
+            df = engine.read(file_path, **kwargs)
+        except Exception as e:
+            _failed(engine, file_path, e)
+            first_error = first_error or e
+            continue
+        metrics.inc("bot_excel_reads_total", engine=engine.name)
+        return df
+    raise first_error
+
+
+@contextmanager
+def open_rows(file_path: str) -> Iterator[Iterator]:
+    """
+    Итератор строк первого листа для потокового чтения (значения ячеек — как в файле,
+    пустые ячейки — None или ""). Движки перебираются, пока книга не откроется.
+    """
+    candidates = engine_candidates(file_path, streaming=True)
+    if not candidates:
+        raise ValueError(f"Нет установленного движка для чтения файлов {os.path.splitext(file_path)[1]}")
+
+    first_error = None
+    for engine in candidates:
+        stack = ExitStack()
+        try:
+            rows = stack.enter_context(engine.rows(file_path))
+        except Exception as e:
+            _failed(engine, file_path, e)
+            first_error = first_error or e
+            continue
+
+        with stack:
+            metrics.inc("bot_excel_reads_total", engine=engine.name)
+            yield rows
+        return
+    raise first_error
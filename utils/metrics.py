@@ -0,0 +1,317 @@
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм: секунды для стадий, строки и байты для размеров
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000)
+BYTES_BUCKETS = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+
+# Название метрики -> (тип, описание, корзины)
+METRICS = {
+    "bot_stage_seconds": ("histogram", "Длительность стадии обработки запроса", SECONDS_BUCKETS),
+    "bot_report_rows": ("histogram", "Количество строк в разобранной таблице", ROWS_BUCKETS),
+    "bot_upload_bytes": ("histogram", "Размер загруженного файла", BYTES_BUCKETS),
+    "bot_reports_total": ("counter", "Количество построенных отчётов", None),
+    "bot_report_cache_hits_total": ("counter", "Отчёты, отданные из кэша результатов", None),
+    "bot_report_peak_bytes": ("gauge", "Пик памяти, выделенной при построении отчёта (tracemalloc)", None),
+    "bot_excel_reads_total": ("counter", "Прочитанные файлы Excel по движкам чтения", None),
+    "bot_excel_read_errors_total": ("counter", "Файлы, которые движок чтения не смог прочитать", None),
+    "bot_startup_seconds": ("gauge", "Длительность этапа запуска процесса", None),
+}
+
+# Этапы запуска для /stats: метка phase -> подпись
+STARTUP_PHASES = {
+    "ready": "готов принимать сообщения",
+    "report_stack": "импорт модулей отчётов",
+    "prewarm": "прогрев",
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля сверху: граница корзины, в которую он попал.
+        """
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса: гистограммы, счётчики и максимумы с метками.
+    Все значения хранятся в памяти; число комбинаций меток ограничено
+    стадиями и типами отчётов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (название, метки) -> гистограмма или число
+        self._values: dict[tuple, object] = {}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = _Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set_max(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0), value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: _copy_histogram(value) if isinstance(value, _Histogram) else value
+                for key, value in self._values.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus.
+        """
+        values = self.snapshot()
+        lines = []
+        for name, (kind, description, _) in METRICS.items():
+            series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets, value.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _copy_histogram(histogram: _Histogram) -> _Histogram:
+    copy = _Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Метрики этого процесса
+REGISTRY = MetricsRegistry()
+
+# Замеры внутри capture() копятся в буфере потока, а не в REGISTRY
+_local = threading.local()
+
+
+def _record(kind: str, name: str, value: float, labels: dict) -> None:
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.append((kind, name, value, labels))
+        return
+    getattr(REGISTRY, kind)(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    _record("observe", name, value, labels)
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    _record("inc", name, value, labels)
+
+
+def set_max(name: str, value: float, **labels) -> None:
+    _record("set_max", name, value, labels)
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """
+    Замеряет длительность блока как стадию stage (метрика bot_stage_seconds).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("bot_stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+
+@contextmanager
+def capture():
+    """
+    Собирает замеры блока в список вместо записи в REGISTRY.
+    Нужно для пула процессов: замеры из дочернего процесса возвращаются
+    вместе с результатом и переносятся в основной процесс через replay().
+    """
+    previous = getattr(_local, "buffer", None)
+    _local.buffer = []
+    try:
+        yield _local.buffer
+    finally:
+        _local.buffer = previous
+
+
+def replay(records: list) -> None:
+    for kind, name, value, labels in records:
+        _record(kind, name, value, labels)
+
+
+# tracemalloc один на процесс: одновременно замеряется только один отчёт
+_memory_lock = threading.Lock()
+
+
+@contextmanager
+def peak_memory(**labels):
+    """
+    Замеряет пик памяти, выделенной в блоке, через tracemalloc (метрика bot_report_peak_bytes).
+    Если tracemalloc уже запущен (бенчмарки) или идёт замер другого отчёта,
+    блок выполняется без замера, чтобы не сбить чужой пик. В пуле потоков
+    в пик попадают и выделения других потоков за время блока.
+    """
+    if tracemalloc.is_tracing() or not _memory_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] - base
+            tracemalloc.stop()
+            set_max("bot_report_peak_bytes", peak, **labels)
+    finally:
+        _memory_lock.release()
+
+
+def format_stats() -> str:
+    """
+    Сводка метрик для команды /stats.
+    """
+    values = REGISTRY.snapshot()
+    stages: dict[str, dict[str, _Histogram]] = {}
+    counters: dict[tuple, float] = {}
+    startup: dict[str, float] = {}
+    for (name, labels), value in values.items():
+        labels = dict(labels)
+        if name == "bot_startup_seconds":
+            startup[labels["phase"]] = value
+        elif name == "bot_stage_seconds":
+            stages.setdefault(labels.get("report", "общие стадии"), {})[labels["stage"]] = value
+        elif not isinstance(value, _Histogram):
+            counters[(name, labels.get("report", "общие стадии"), labels.get("status", ""))] = value
+
+    if not values:
+        return "📈 <b>Статистика пока пуста</b>"
+
+    lines = ["📈 <b>Статистика бота</b>"]
+    uploads = values.get(("bot_upload_bytes", ()))
+    if uploads is not None and uploads.count:
+        lines.append(
+            f"\n📂 Загрузок: {uploads.count}, в среднем {uploads.sum / uploads.count / 1024 / 1024:.1f} МБ"
+        )
+
+    if startup:
+        lines.append("\n<b>Запуск</b>")
+        for phase, title in STARTUP_PHASES.items():
+            if phase in startup:
+                lines.append(f"• {title}: {startup[phase]:.2f} с")
+
+    for report, report_stages in sorted(stages.items()):
+        lines.append(f"\n<b>{report}</b>")
+        built = sum(value for (name, label, _), value in counters.items()
+                    if name == "bot_reports_total" and label == report)
+        hits = counters.get(("bot_report_cache_hits_total", report, ""), 0)
+        if built or hits:
+            lines.append(f"отчётов: {int(built)}, из кэша: {int(hits)}")
+        for stage, histogram in sorted(report_stages.items()):
+            lines.append(
+                f"• {stage}: {histogram.count} шт., среднее {histogram.sum / histogram.count:.3f} с, "
+                f"p95 ≤ {histogram.quantile(0.95)} с"
+            )
+        peak = counters.get(("bot_report_peak_bytes", report, ""))
+        if peak:
+            lines.append(f"пиковая память: {peak / 1024 / 1024:.0f} МБ")
+
+    return "\n".join(lines)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Запросы Prometheus не должны засорять лог бота
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer | None:
+    """
+    Запускает в фоновом потоке HTTP-сервер с метриками на http://host:port/metrics.
+    port = 0 — сервер не запускается.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,84 @@
+import io
+
+import pandas as pd
+
+from config import EXPORT_FORMATS
+
+# Формат выгрузки по кнопке, если выгрузка к каждому отчёту выключена (EXPORT_FORMATS пуст)
+ON_DEMAND_FORMATS = ["xlsx"]
+
+# Начало текста, с которого Excel читает ячейку CSV как формулу
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _escape_formula(value):
+    # Апостроф в начале Excel не показывает, но ячейка остаётся текстом
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def table_to_csv(table: pd.DataFrame) -> bytes:
+    text_columns = table.select_dtypes(include="object").columns
+    if len(text_columns):
+        table = table.copy()
+        for column in text_columns:
+            table[column] = table[column].map(_escape_formula)
+    # BOM нужен, чтобы Excel открыл кириллицу в CSV без ручного выбора кодировки
+    return table.to_csv(index=False).encode("utf-8-sig")
+
+
+def _keep_text(sheet) -> None:
+    # openpyxl считает формулой любую строку, начинающуюся с "=", — записываем её как текст
+    for row in sheet.iter_rows():
+        for cell in row:
+            if cell.data_type == "f":
+                cell.data_type = "s"
+
+
+def tables_to_xlsx(tables: dict[str, pd.DataFrame]) -> bytes:
+    """
+    Книга Excel в памяти: по листу на каждую таблицу.
+    """
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, table in tables.items():
+            # Название листа в Excel — не длиннее 31 символа
+            sheet_name = name[:31]
+            table.to_excel(writer, sheet_name=sheet_name, index=False)
+
+            text = table.select_dtypes(include="object")
+            if text.apply(lambda column: column.astype(str).str.startswith("=").any()).any():
+                _keep_text(writer.sheets[sheet_name])
+
+    return buffer.getvalue()
+
+
+def export_documents(
+    tables: dict[str, pd.DataFrame], filename: str, formats: list[str] | None = None
+) -> list[tuple[str, bytes]]:
+    """
+    Файлы выгрузки таблиц отчётов в форматах formats (по умолчанию EXPORT_FORMATS):
+    список (имя файла, содержимое).
+    XLSX — одна книга с листом на каждый отчёт, CSV — по файлу на отчёт.
+    """
+    formats = EXPORT_FORMATS if formats is None else formats
+    tables = {name: table for name, table in tables.items() if not table.empty}
+    if not tables:
+        return []
+
+    documents = []
+    if "xlsx" in formats:
+        documents.append((f"{filename}.xlsx", tables_to_xlsx(tables)))
+    if "csv" in formats:
+        for name, table in tables.items():
+            csv_name = filename if len(tables) == 1 else f"{filename}_{name}"
+            documents.append((f"{csv_name}.csv", table_to_csv(table)))
+    return documents
+
+
+def export_on_demand(tables: dict[str, pd.DataFrame], filename: str) -> list[tuple[str, bytes]]:
+    """
+    Выгрузка по кнопке под отчётом: в форматах EXPORT_FORMATS или, если они не заданы, в XLSX.
+    """
+    return export_documents(tables, filename, EXPORT_FORMATS or ON_DEMAND_FORMATS)
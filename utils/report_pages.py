@@ -0,0 +1,157 @@
+import secrets
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Префикс callback_data кнопок листания: "page:<токен>:<курсор>", "page:<токен>:file"
+# и "page:<токен>:export"
+PAGE_CALLBACK = "page"
+
+# Кнопка выгрузки полного списка файлом
+FILE_CURSOR = "file"
+
+# Кнопка выгрузки таблицы отчёта (XLSX/CSV)
+EXPORT_CURSOR = "export"
+
+
+class StoredList:
+    """
+    Список строк отчёта для листания в чате.
+    Строки хранятся одним блоком UTF-8 со смещениями, а не отдельными объектами str:
+    на тысячах коротких строк это в несколько раз меньше памяти.
+
+    filename — имя файлов выгрузки без расширения, tables — таблицы отчёта
+    для выгрузки по кнопке (None — выгружать нечего).
+    """
+
+    __slots__ = ("chat_id", "title", "filename", "tables", "_data", "_offsets", "_tables_size", "used")
+
+    def __init__(self, chat_id: int, title: str, items: list[str], filename: str, tables: dict | None = None):
+        self.chat_id = chat_id
+        self.title = title
+        self.filename = filename
+        self.tables = tables
+
+        encoded = [item.encode("utf-8") for item in items]
+        self._data = b"".join(encoded)
+        self._offsets = array("I", accumulate(map(len, encoded), initial=0))
+        self._tables_size = sum(
+            int(table.memory_usage(index=True, deep=True).sum()) for table in (tables or {}).values()
+        )
+        self.used = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def size(self) -> int:
+        return len(self._data) + self._offsets.itemsize * len(self._offsets) + self._tables_size
+
+    def slice(self, start: int, stop: int) -> list[str]:
+        stop = min(stop, len(self))
+        return [
+            self._data[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+            for i in range(start, stop)
+        ]
+
+    def text(self) -> str:
+        """
+        Содержимое файла с полным списком (строка на запись).
+        """
+        return "".join(item + "\n" for item in self.slice(0, len(self)))
+
+
+class PageStore:
+    """
+    Хранилище списков для листания, ограниченное по памяти (max_bytes) и времени
+    без обращений (ttl, секунды). При нехватке места удаляются давно не листавшиеся
+    списки; кнопки в их сообщениях отвечают, что список устарел.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lists: OrderedDict[str, StoredList] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(
+        self, chat_id: int, title: str, items: list[str], filename: str, tables: dict | None = None
+    ) -> str | None:
+        """
+        Сохраняет список (и таблицы для выгрузки) и возвращает его токен для callback_data.
+        None — список не помещается в хранилище.
+        """
+        stored = StoredList(chat_id, title, items, filename, tables)
+        if stored.size > self.max_bytes:
+            return None
+
+        with self._lock:
+            token = secrets.token_urlsafe(6)
+            while token in self._lists:
+                token = secrets.token_urlsafe(6)
+            self._lists[token] = stored
+            self._size += stored.size
+            self._evict()
+        return token
+
+    def get(self, token: str, chat_id: int) -> StoredList | None:
+        with self._lock:
+            self._evict()
+            stored = self._lists.get(token)
+            # Список листается только в том чате, куда был отправлен
+            if stored is None or stored.chat_id != chat_id:
+                return None
+            stored.used = time.monotonic()
+            self._lists.move_to_end(token)
+            return stored
+
+    def _evict(self) -> None:
+        expired = time.monotonic() - self.ttl
+        while self._lists:
+            token, stored = next(iter(self._lists.items()))
+            if self._size <= self.max_bytes and stored.used >= expired:
+                break
+            del self._lists[token]
+            self._size -= stored.size
+
+
+def page_callback(token: str, cursor) -> str:
+    return f"{PAGE_CALLBACK}:{token}:{cursor}"
+
+
+def is_page_callback(data: str | None) -> bool:
+    return bool(data) and data.startswith(PAGE_CALLBACK + ":")
+
+
+def parse_page_callback(data: str) -> tuple[str, str]:
+    """
+    (токен, курсор) из callback_data кнопки листания.
+    """
+    _, token, cursor = data.split(":", 2)
+    return token, cursor
+
+
+def page_keyboard(
+    token: str, cursor: int, stop: int, total: int, page_size: int, export: bool = False
+) -> InlineKeyboardMarkup:
+    """
+    Кнопки под страницей: назад и вперёд (курсор — номер первой записи страницы),
+    выгрузка полного списка файлом и, если export, выгрузка таблицы отчёта.
+    """
+    keyboard = InlineKeyboardMarkup()
+    buttons = []
+    if cursor > 0:
+        buttons.append(InlineKeyboardButton("◀", callback_data=page_callback(token, max(0, cursor - page_size))))
+    if stop < total:
+        buttons.append(InlineKeyboardButton("▶", callback_data=page_callback(token, stop)))
+    if buttons:
+        keyboard.row(*buttons)
+    keyboard.row(InlineKeyboardButton("📎 Полный список файлом", callback_data=page_callback(token, FILE_CURSOR)))
+    if export:
+        keyboard.row(InlineKeyboardButton("📊 Выгрузить таблицу", callback_data=page_callback(token, EXPORT_CURSOR)))
+    return keyboard
@@ -0,0 +1,210 @@
+import itertools
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """
+    В очереди нет свободных мест.
+    """
+
+
+class _Job:
+    def __init__(self, job_id: int, chat_id: int, func, args: tuple, on_done, lane=None):
+        self.id = job_id
+        self.chat_id = chat_id
+        # Задачи с одинаковыми (chat_id, lane) выполняются по очереди
+        self.key = (chat_id, lane)
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.future = None
+        self.cancelled = False
+
+
+class ReportQueue:
+    """
+    Очередь отчётов поверх пула процессов (или потоков).
+
+    - задачи одного чата выполняются строго по очереди, в порядке нажатий;
+    - задачи разных чатов выполняются параллельно, не больше max_workers одновременно;
+    - задачи пакета (submit_many) выполняются параллельно и друг с другом;
+    - общее число ожидающих и выполняющихся задач ограничено max_pending;
+    - cancel_chat() отменяет все задачи чата (например, после загрузки нового файла);
+    - on_done вызывается в отдельном пуле доставки, а не в потоке пула отчётов:
+      медленная отправка результата (лимиты Telegram, повторы после 429) не задерживает
+      сбор и запуск задач других чатов. Результаты задач с одним (chat_id, lane)
+      доставляются по очереди, в порядке завершения.
+    """
+
+    def __init__(self, executor, max_workers: int, max_pending: int, delivery_workers: int | None = None):
+        self._executor = executor
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._delivery = ThreadPoolExecutor(
+            max_workers=delivery_workers or max_workers, thread_name_prefix="deliver"
+        )
+
+        # RLock: _finish уже завершённой задачи может вызваться прямо внутри _dispatch
+        # (add_done_callback) и снова запустить _dispatch
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        # Ожидающие задачи всех чатов в порядке поступления
+        self._waiting: deque[_Job] = deque()
+        # Выполняющиеся задачи: (chat_id, lane) -> задача
+        self._running: dict[tuple, _Job] = {}
+        # Результаты, ожидающие доставки: (chat_id, lane) -> [(задача, результат, ошибка)]
+        self._deliveries: dict[tuple, deque] = {}
+        self._delivery_lock = threading.Lock()
+
+    def submit(self, chat_id: int, func, args: tuple, on_done) -> int:
+        """
+        Ставит задачу в очередь. on_done(result, error) вызывается по завершении
+        (если задачу не отменили). Возвращает позицию в очереди: 0 — задача
+        запущена сразу, N — перед ней ещё N - 1 задач.
+        """
+        with self._lock:
+            if len(self._waiting) + len(self._running) >= self._max_pending:
+                raise QueueFullError()
+
+            job = _Job(next(self._ids), chat_id, func, args, on_done)
+            self._waiting.append(job)
+            self._dispatch()
+
+            if job.future is not None:
+                return 0
+            return self._waiting.index(job) + 1
+
+    def submit_many(self, chat_id: int, tasks: list[tuple], on_done) -> int:
+        """
+        Ставит в очередь пакет задач [(func, args), ...], которые могут выполняться
+        параллельно друг с другом. on_done(index, result, error) вызывается по завершении
+        каждой задачи. Если в очереди не хватает мест для всего пакета, не ставится
+        ни одна задача (QueueFullError). Возвращает позицию первой задачи, как submit.
+        """
+        with self._lock:
+            if len(self._waiting) + len(self._running) + len(tasks) > self._max_pending:
+                raise QueueFullError()
+
+            jobs = []
+            for index, (func, args) in enumerate(tasks):
+                def done(result, error, index=index):
+                    on_done(index, result, error)
+
+                jobs.append(_Job(next(self._ids), chat_id, func, args, done, lane=("batch", index)))
+            self._waiting.extend(jobs)
+            self._dispatch()
+
+            if not jobs or jobs[0].future is not None:
+                return 0
+            return self._waiting.index(jobs[0]) + 1
+
+    def cancel_chat(self, chat_id: int) -> None:
+        with self._lock:
+            for job in [job for job in self._waiting if job.chat_id == chat_id]:
+                job.cancelled = True
+                self._waiting.remove(job)
+
+            for running in list(self._running.values()):
+                if running.chat_id == chat_id:
+                    # Процесс не прервать, но результат будет отброшен
+                    running.cancelled = True
+                    running.future.cancel()
+
+    def prewarm(self, func, *args):
+        """
+        Выполняет func(*args) в пуле вне очереди (например, чтобы заранее запустить
+        процесс и импортировать в нём модули отчётов). Возвращает Future.
+        """
+        return self._executor.submit(func, *args)
+
+    def _dispatch(self) -> None:
+        # Вызывается под self._lock: запускаем самые ранние задачи чатов,
+        # у которых сейчас ничего не выполняется
+        for job in list(self._waiting):
+            if len(self._running) >= self._max_workers:
+                break
+            # Задачу уже запустил или отменил вложенный вызов
+            if job.future is not None or job.cancelled:
+                continue
+            if job.key in self._running:
+                continue
+
+            self._waiting.remove(job)
+            try:
+                future = self._executor.submit(job.func, *job.args)
+            except Exception as e:
+                # Пул сломан (процесс пула упал — BrokenProcessPool) или остановлен:
+                # задача не запустится, чат получит ошибку вместо вечного ожидания
+                logger.exception("Не удалось запустить задачу %s", job.id)
+                job.future = Future()
+                job.future.set_exception(e)
+                self._queue_delivery(job, None, e)
+                continue
+
+            self._running[job.key] = job
+            job.future = future
+            future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+    def _finish(self, job: _Job, future) -> None:
+        # Здесь только освобождаем место задачи: поток, из которого вызван _finish,
+        # собирает результаты пула и не должен ждать отправки в Telegram
+        with self._lock:
+            if self._running.get(job.key) is job:
+                del self._running[job.key]
+            self._dispatch()
+
+        if job.cancelled or future.cancelled():
+            return
+
+        error = future.exception()
+        result = None if error else future.result()
+        self._queue_delivery(job, result, error)
+
+    def _queue_delivery(self, job: _Job, result, error) -> None:
+        with self._delivery_lock:
+            pending = self._deliveries.setdefault(job.key, deque())
+            pending.append((job, result, error))
+            # Результаты этой очереди уже доставляются — поток доставки заберёт и этот
+            if len(pending) > 1:
+                return
+        self._delivery.submit(self._deliver, job.key)
+
+    def _deliver(self, key: tuple) -> None:
+        while True:
+            with self._delivery_lock:
+                job, result, error = self._deliveries[key][0]
+
+            # Задачу могли отменить, пока результат ждал доставки
+            if not job.cancelled:
+                try:
+                    job.on_done(result, error)
+                except Exception:
+                    logger.exception("Ошибка при обработке результата задачи %s", job.id)
+
+            with self._delivery_lock:
+                pending = self._deliveries[key]
+                pending.popleft()
+                if not pending:
+                    del self._deliveries[key]
+                    return
+
+
+def create_report_queue(mode: str, max_workers: int, max_pending: int) -> ReportQueue:
+    """
+    Создаёт очередь поверх пула процессов (mode="process") или потоков.
+    """
+    if mode == "process":
+        # spawn вместо fork: в родительском процессе уже работают потоки бота
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+    return ReportQueue(executor, max_workers, max_pending)
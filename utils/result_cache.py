@@ -0,0 +1,65 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    LRU-кэш готовых результатов отчётов, ограниченный по объёму памяти.
+    Ключ — (хэш содержимого файла, тип отчёта, версия построения отчёта):
+    пока файл и код отчёта не изменились, результат можно отдавать без разбора файла.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, result) -> None:
+        size = result_size(result)
+
+        with self._lock:
+            # Слишком большие результаты не кэшируем, чтобы не вытеснить всё остальное
+            if size > self.max_bytes:
+                return
+
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+            self._entries[key] = (result, size)
+            self._size += size
+
+            # Вытесняем самые давно использованные записи
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+
+def result_size(result) -> int:
+    """
+    Примерный объём результата в памяти: таблица отчёта (DataFrame.memory_usage)
+    и строки для сообщения. Результат «всех отчётов» — список (тип, результат, ошибка).
+    """
+    if isinstance(result, (list, tuple)):
+        return sys.getsizeof(result) + sum(result_size(item) for item in result)
+
+    table = getattr(result, "table", None)
+    items = getattr(result, "items", None)
+    if table is None and items is None:
+        return sys.getsizeof(result)
+
+    size = sys.getsizeof(result)
+    if table is not None:
+        size += int(table.memory_usage(index=True, deep=True).sum())
+    if items is not None:
+        size += sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+    return size
@@ -0,0 +1,393 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+from telebot.types import InputFile
+
+from config import SEND_WORKERS
+from utils import metrics
+
+# Асинхронный помощник telebot требует aiohttp, который нужен только main_async.py
+try:
+    from telebot import asyncio_helper
+except ImportError:
+    asyncio_helper = None
+
+logger = logging.getLogger(__name__)
+
+# Методы бота, вызовы которых идут через очередь отправки, и позиция chat_id
+# среди позиционных аргументов (если его передали не именованным)
+QUEUED_METHODS = {
+    "send_message": 0,
+    "send_document": 0,
+    "edit_message_text": 1,
+}
+
+# Стадия в метрике bot_stage_seconds для запросов из очереди отправки
+QUEUED_STAGES = {
+    "send_message": "send_message",
+    "send_document": "send_document",
+    "edit_message_text": "edit_message",
+}
+
+# Сколько ждать после 429, если Telegram не прислал retry_after
+DEFAULT_RETRY_AFTER = 1.0
+
+# Количество чатов, после которого из ограничителя удаляются записи давно молчавших чатов
+PURGE_THRESHOLD = 1000
+
+
+def retry_after(error: Exception) -> float | None:
+    """
+    Сколько секунд ждать перед повтором, если Telegram ответил 429 Too Many Requests
+    (None — ошибка другая).
+    """
+    if getattr(error, "error_code", None) != 429:
+        return None
+    parameters = (getattr(error, "result_json", None) or {}).get("parameters") or {}
+    return float(parameters.get("retry_after", DEFAULT_RETRY_AFTER))
+
+
+def _status_code(error: Exception) -> int:
+    # Код ответа: из JSON Telegram или, если ответ не JSON, из самого HTTP-ответа
+    code = getattr(error, "error_code", None)
+    if code is None:
+        response = getattr(error, "result", None)
+        code = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return code or 0
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Временная ошибка (сеть, таймаут, 5xx): запрос можно повторить.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    # AsyncTeleBot сам перехватывает ошибки aiohttp и выбрасывает RequestTimeout
+    if asyncio_helper is not None and isinstance(error, asyncio_helper.RequestTimeout):
+        return True
+    return _status_code(error) >= 500
+
+
+def is_not_modified(error: Exception) -> bool:
+    # Повторное нажатие той же кнопки: текст сообщения уже такой
+    return "message is not modified" in str(getattr(error, "description", ""))
+
+
+def _rewind(args: tuple, kwargs: dict) -> None:
+    # Файл, отправленный в неудачной попытке, уже прочитан до конца
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, InputFile) and hasattr(value.file, "seek"):
+            value.file.seek(0)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Забирает токен (в долг, если токенов нет) и возвращает, сколько ждать до отправки.
+        """
+        self._refill(now)
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def pause(self, now: float, seconds: float) -> None:
+        # Следующий take() придётся ждать не меньше seconds секунд
+        self._refill(now)
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """
+    Ограничение частоты отправки: не больше global_rate запросов в секунду на бота
+    и chat_rate в секунду на чат (с запасом chat_burst запросов подряд).
+    """
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int):
+        self._lock = threading.Lock()
+        self._global = _TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: dict[int, _TokenBucket] = {}
+
+    def take_chat(self, chat_id: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._chats) > PURGE_THRESHOLD:
+                # Полностью восстановившаяся корзина ничем не отличается от новой
+                self._chats = {key: bucket for key, bucket in self._chats.items() if not bucket.is_full(now)}
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = _TokenBucket(self._chat_rate, self._chat_burst)
+            return bucket.take(now)
+
+    def take_global(self) -> float:
+        with self._lock:
+            return self._global.take(time.monotonic())
+
+    def pause(self, chat_id: int, seconds: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = _TokenBucket(self._chat_rate, self._chat_burst)
+            bucket.pause(now, seconds)
+
+
+class _Retry:
+    """
+    Решение о повторе запроса после ошибки: 429 — ждать retry_after,
+    временная ошибка — ждать с экспоненциальной задержкой, иначе — не повторять.
+    """
+
+    def __init__(self, max_retries: int, backoff: float, max_backoff: float):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, limiter: RateLimiter, chat_id: int, error: Exception, attempt: int) -> float | None:
+        if attempt >= self.max_retries:
+            return None
+
+        wait = retry_after(error)
+        if wait is not None:
+            logger.warning("429 для чата %s, повтор через %.1f с", chat_id, wait)
+            # Лимит чата уже превышен: остальные отправки в этот чат тоже ждут
+            limiter.pause(chat_id, wait)
+            return 0.0
+
+        if is_transient(error):
+            wait = min(self.max_backoff, self.backoff * 2 ** attempt)
+            logger.warning("Ошибка отправки в чат %s (%s), повтор через %.1f с", chat_id, error, wait)
+            return wait
+
+        return None
+
+
+class _Request:
+    __slots__ = ("func", "args", "kwargs", "future", "attempt")
+
+    def __init__(self, func, args: tuple, kwargs: dict):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempt = 0
+
+
+class SendQueue:
+    """
+    Очередь исходящих запросов к Telegram:
+    - запросы выполняют отдельные потоки отправки (workers): вызывающий поток только
+      ставит запрос в очередь и сразу получает Future с ответом Telegram;
+    - запросы одного чата выполняются строго по очереди, в порядке вызова;
+    - частота ограничена глобально и для каждого чата (RateLimiter): чат, которому
+      нужно подождать, откладывается, а потоки отправки тем временем обслуживают другие чаты;
+    - на 429 запрос повторяется через retry_after, на временные ошибки — с нарастающей
+      задержкой, не больше max_retries раз; после этого ошибка передаётся в Future.
+    """
+
+    def __init__(
+        self, global_rate: float, chat_rate: float, chat_burst: int,
+        max_retries: int, backoff: float = 1.0, max_backoff: float = 30.0, workers: int = SEND_WORKERS
+    ):
+        self.limiter = RateLimiter(global_rate, chat_rate, chat_burst)
+        self._retry = _Retry(max_retries, backoff, max_backoff)
+        self._cond = threading.Condition()
+        # chat_id -> запросы чата по порядку (первый — выполняющийся или ждущий своего времени)
+        self._chats: dict[int, deque[_Request]] = {}
+        # Чаты, первый запрос которых можно отправить не раньше указанного времени:
+        # (время, порядковый номер, chat_id)
+        self._ready: list[tuple[float, int, int]] = []
+        self._order = itertools.count()
+
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"send-{number}", daemon=True).start()
+
+    def submit(self, chat_id: int, func, *args, **kwargs) -> Future:
+        request = _Request(func, args, kwargs)
+        with self._cond:
+            requests = self._chats.setdefault(chat_id, deque())
+            requests.append(request)
+            if len(requests) == 1:
+                self._schedule(chat_id, 0.0)
+        return request.future
+
+    def call(self, chat_id: int, func, *args, **kwargs):
+        """
+        То же, что submit, но ждёт ответа Telegram.
+        """
+        return self.submit(chat_id, func, *args, **kwargs).result()
+
+    def _schedule(self, chat_id: int, delay: float) -> None:
+        # Токен чата забирается сразу: к назначенному времени запрос укладывается в лимит чата
+        wait = max(delay, self.limiter.take_chat(chat_id))
+        heapq.heappush(self._ready, (time.monotonic() + wait, next(self._order), chat_id))
+        self._cond.notify()
+
+    def _next(self) -> tuple[int, _Request]:
+        with self._cond:
+            while True:
+                if not self._ready:
+                    self._cond.wait()
+                    continue
+                when, _, chat_id = self._ready[0]
+                wait = when - time.monotonic()
+                if wait > 0:
+                    # Новый запрос другого чата может оказаться готов раньше — он разбудит поток
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._ready)
+                return chat_id, self._chats[chat_id][0]
+
+    def _work(self) -> None:
+        while True:
+            chat_id, request = self._next()
+            # Глобальный лимит общий для всех чатов: его может ждать любой поток отправки
+            time.sleep(self.limiter.take_global())
+            try:
+                result = request.func(*request.args, **request.kwargs)
+            except Exception as e:
+                delay = self._retry.delay(self.limiter, chat_id, e, request.attempt)
+                if delay is not None:
+                    request.attempt += 1
+                    _rewind(request.args, request.kwargs)
+                    with self._cond:
+                        self._schedule(chat_id, delay)
+                    continue
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+
+            with self._cond:
+                requests = self._chats[chat_id]
+                requests.popleft()
+                if requests:
+                    self._schedule(chat_id, 0.0)
+                else:
+                    del self._chats[chat_id]
+
+
+class AsyncSendQueue:
+    """
+    То же, что SendQueue, для AsyncTeleBot: ожидание не блокирует цикл событий.
+    """
+
+    def __init__(
+        self, global_rate: float, chat_rate: float, chat_burst: int,
+        max_retries: int, backoff: float = 1.0, max_backoff: float = 30.0
+    ):
+        self.limiter = RateLimiter(global_rate, chat_rate, chat_burst)
+        self._retry = _Retry(max_retries, backoff, max_backoff)
+        self._turns: dict[int, deque[asyncio.Event]] = {}
+
+    async def call(self, chat_id: int, func, *args, **kwargs):
+        turn = asyncio.Event()
+        turns = self._turns.setdefault(chat_id, deque())
+        turns.append(turn)
+        if len(turns) == 1:
+            turn.set()
+
+        try:
+            await turn.wait()
+            return await self._send(chat_id, func, args, kwargs)
+        finally:
+            # В том числе при отмене ожидающего вызова
+            was_first = turns[0] is turn
+            turns.remove(turn)
+            if not turns:
+                del self._turns[chat_id]
+            elif was_first:
+                turns[0].set()
+
+    async def _send(self, chat_id: int, func, args: tuple, kwargs: dict):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.limiter.take_chat(chat_id))
+            await asyncio.sleep(self.limiter.take_global())
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry.delay(self.limiter, chat_id, e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+            _rewind(args, kwargs)
+
+
+def _chat_id(name: str, args: tuple, kwargs: dict):
+    if "chat_id" in kwargs:
+        return kwargs["chat_id"]
+    return args[QUEUED_METHODS[name]]
+
+
+class QueuedBot:
+    """
+    Обёртка над TeleBot: методы из QUEUED_METHODS идут через очередь отправки
+    и возвращают Future с ответом Telegram (ошибка, которую никто не ждёт, попадает в лог),
+    остальные атрибуты (регистрация обработчиков, get_file и т.д.) — напрямую в бота.
+    """
+
+    def __init__(self, bot, queue: SendQueue):
+        self._bot = bot
+        self._queue = queue
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._bot, name)
+        if name not in QUEUED_METHODS:
+            return attribute
+
+        def send(*args, **kwargs):
+            with metrics.timed(QUEUED_STAGES[name]):
+                return attribute(*args, **kwargs)
+
+        def queued(*args, **kwargs) -> Future:
+            chat_id = _chat_id(name, args, kwargs)
+            future = self._queue.submit(chat_id, send, *args, **kwargs)
+            future.add_done_callback(lambda done: _log_failure(name, chat_id, done))
+            return future
+        return queued
+
+
+def _log_failure(name: str, chat_id: int, future: Future) -> None:
+    error = future.exception()
+    if error is not None and not is_not_modified(error):
+        logger.warning("Не удалось выполнить %s для чата %s: %s", name, chat_id, error)
+
+
+class AsyncQueuedBot:
+    """
+    То же, что QueuedBot, для AsyncTeleBot.
+    """
+
+    def __init__(self, bot, queue: AsyncSendQueue):
+        self._bot = bot
+        self._queue = queue
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._bot, name)
+        if name not in QUEUED_METHODS:
+            return attribute
+
+        async def queued(*args, **kwargs):
+            return await self._queue.call(_chat_id(name, args, kwargs), attribute, *args, **kwargs)
+        return queued
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Суффикс временного файла, пока снимок не записан целиком
+PARTIAL_SUFFIX = ".part"
+
+
+class SnapshotStore:
+    """
+    Снимки результатов отчётов по чатам для режима сравнения с прошлой загрузкой.
+
+    Для каждого чата — один JSON-файл: включён ли режим сравнения и по каждому отчёту
+    два снимка: "last" — результат по последнему файлу, "base" — по файлу перед ним.
+    Повторный отчёт по тому же файлу сравнивается с "base", а не сам с собой.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def is_diff_enabled(self, chat_id: int) -> bool:
+        with self._lock:
+            return self._load(chat_id).get("diff", False)
+
+    def toggle_diff(self, chat_id: int) -> bool:
+        """
+        Включает или выключает режим сравнения для чата; возвращает новое состояние.
+        """
+        with self._lock:
+            data = self._load(chat_id)
+            data["diff"] = not data.get("diff", False)
+            self._save(chat_id, data)
+            return data["diff"]
+
+    def update(self, chat_id: int, report_type: str, digest: str, snapshot: dict) -> dict | None:
+        """
+        Запоминает снимок отчёта по файлу digest и возвращает снимок,
+        с которым его нужно сравнить (None — сравнивать не с чем).
+        """
+        with self._lock:
+            data = self._load(chat_id)
+            reports = data.setdefault("reports", {})
+            entry = reports.get(report_type, {})
+
+            last = entry.get("last")
+            if last is None or last["digest"] != digest:
+                entry = {"base": last, "last": {"digest": digest, **snapshot}}
+                reports[report_type] = entry
+                self._save(chat_id, data)
+
+            return entry.get("base")
+
+    def _path(self, chat_id: int) -> str:
+        return os.path.join(self.directory, f"{chat_id}.json")
+
+    def _load(self, chat_id: int) -> dict:
+        try:
+            with open(self._path(chat_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Снимки чата %s не прочитаны, начинаем с пустых", chat_id)
+            return {}
+
+    def _save(self, chat_id: int, data: dict) -> None:
+        # Записываем во временный файл и подменяем, чтобы снимок не остался недописанным
+        path = self._path(chat_id)
+        with open(path + PARTIAL_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(path + PARTIAL_SUFFIX, path)
@@ -0,0 +1,106 @@
+from typing import Iterator
+
+import pandas as pd
+
+from config import STREAM_CHUNK_ROWS
+from utils.excel_parsing import _fill_header_row
+from utils.excel_readers import open_rows
+
+
+def _convert_cell(value):
+    # Так же, как pandas: пустые строки — пропуски, целые float — int
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _dedupe(labels: list) -> list:
+    # Повторяющиеся названия колонок pandas превращает в "x", "x.1", "x.2"
+    seen: dict = {}
+    result = []
+    for label in labels:
+        count = seen.get(label, 0)
+        seen[label] = count + 1
+        result.append(f"{label}.{count}" if count else label)
+    return result
+
+
+def _build_columns(header_rows: list[list]):
+    width = max(len(row) for row in header_rows)
+    rows = [[_convert_cell(value) for value in row] + [None] * (width - len(row)) for row in header_rows]
+
+    if len(rows) == 1:
+        labels = [
+            f"Unnamed: {i}" if value is None else value
+            for i, value in enumerate(rows[0])
+        ]
+        return pd.Index(_dedupe(labels))
+
+    control_row = [True] * width
+    for level, row in enumerate(rows):
+        rows[level], control_row = _fill_header_row(row, control_row, empty=None)
+
+    tuples = [
+        tuple(
+            f"Unnamed: {i}_level_{level}" if rows[level][i] is None else rows[level][i]
+            for level in range(len(rows))
+        )
+        for i in range(width)
+    ]
+    return pd.MultiIndex.from_tuples(tuples)
+
+
+def iter_excel_chunks(
+    file_path: str,
+    header=0,
+    chunk_size: int = STREAM_CHUNK_ROWS,
+    columns: list | None = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Читает первый лист книги порциями по chunk_size строк (движок выбирает open_rows:
+    для .xlsx — openpyxl в режиме read-only). В памяти одновременно находится только
+    одна порция, поэтому потребление памяти не зависит от размера файла.
+    Полностью пустые строки пропускаются (пустота строки определяется
+    по всем колонкам, а не только по columns).
+    columns — оставить в порциях только эти колонки (None — все).
+    """
+    header_levels = list(header) if isinstance(header, (list, tuple)) else [header]
+    header_count = max(header_levels) + 1
+
+    with open_rows(file_path) as rows:
+        header_rows = []
+        for row in rows:
+            header_rows.append(list(row))
+            if len(header_rows) == header_count:
+                break
+        if len(header_rows) < header_count:
+            return
+
+        labels = _build_columns([header_rows[level] for level in header_levels])
+        width = len(labels)
+
+        positions = list(range(width))
+        if columns is not None:
+            wanted = set(columns)
+            positions = [i for i, label in enumerate(labels) if label in wanted]
+            labels = labels[positions]
+
+        chunk = []
+        start = 0
+        for row in rows:
+            values = [_convert_cell(value) for value in row[:width]]
+            if all(value is None for value in values):
+                continue
+            values.extend([None] * (width - len(values)))
+            chunk.append([values[i] for i in positions])
+
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=labels, index=pd.RangeIndex(start, start + len(chunk)))
+                start += len(chunk)
+                chunk = []
+
+        # Пустую таблицу тоже отдаём, чтобы отчёт мог проверить наличие колонок
+        if chunk or not start:
+            yield pd.DataFrame(chunk, columns=labels, index=pd.RangeIndex(start, start + len(chunk)))
@@ -0,0 +1,43 @@
+import requests
+from telebot import apihelper
+
+
+def configure_api_url(base_url: str | None) -> None:
+    """
+    Направляет запросы бота на другой сервер Bot API
+    (локальный telegram-bot-api или тестовую заглушку).
+    """
+    if not base_url:
+        return
+
+    base_url = base_url.rstrip("/")
+    apihelper.API_URL = base_url + "/bot{0}/{1}"
+    apihelper.FILE_URL = base_url + "/file/bot{0}/{1}"
+
+    # Асинхронный клиент требует aiohttp и нужен только для main_async.py
+    try:
+        from telebot import asyncio_helper
+    except ImportError:
+        return
+    asyncio_helper.API_URL = base_url + "/bot{0}/{1}"
+    asyncio_helper.FILE_URL = base_url + "/file/bot{0}/{1}"
+
+
+# Размер блока при потоковом скачивании файлов
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def iter_file_chunks(token: str, file_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    """
+    Скачивает файл с серверов Telegram порциями, не держа его целиком в памяти
+    (в отличие от bot.download_file). file_path — из bot.get_file().
+    """
+    if apihelper.FILE_URL is None:
+        url = "https://api.telegram.org/file/bot{0}/{1}".format(token, file_path)
+    else:
+        url = apihelper.FILE_URL.format(token, file_path)
+
+    with requests.get(url, stream=True, proxies=apihelper.proxy, timeout=(10, 60)) as response:
+        if response.status_code != 200:
+            raise apihelper.ApiHTTPException("Download file", response)
+        yield from response.iter_content(chunk_size)
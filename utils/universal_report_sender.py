@@ -1,59 +1,343 @@
-import os
+import io
+import re
 from typing import List
+
+import pandas as pd
 from telebot import TeleBot
+from telebot.types import InlineKeyboardMarkup, InputFile
+
+from utils import metrics
+from utils.report_export import export_documents
+from utils.report_pages import PageStore, StoredList, page_keyboard
 
 # Максимальное кол-во записей в одном сообщении
 MAX_PREVIEW = 20
 
-# Папка для хранения отчётов
-REPORTS_DIR = "reports_output"
+# Максимальное кол-во записей каждого отчёта в сводном сообщении
+MAX_COMBINED_PREVIEW = 5
 
-os.makedirs(REPORTS_DIR, exist_ok=True)
+# Максимальная длина одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
 
 
-def send_report_with_preview(
+def message_length(text: str) -> int:
+    # Telegram считает длину в единицах UTF-16: эмодзи занимают по 2 и больше.
+    # HTML-теги тоже учитываются — это даёт запас, а не превышение лимита
+    return len(text.encode("utf-16-le")) // 2
+
+
+# Неделимые куски HTML-текста: тег, сущность (&amp; и т. п.) или один символ
+_TOKEN = re.compile(r"<[^>]*>|&#?\w+;|.", re.DOTALL)
+_TAG = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>")
+
+
+def _opening(tags: tuple) -> str:
+    return "".join(tag for _, tag in tags)
+
+
+def _closing(tags: tuple) -> str:
+    return "".join(f"</{name}>" for name, _ in reversed(tags))
+
+
+def _apply_tag(tags: tuple, token: str) -> tuple:
+    # Открытые теги после token: кортеж (имя, открывающий тег) в порядке вложенности
+    match = _TAG.fullmatch(token)
+    if match is None or token.endswith("/>"):
+        return tags
+    name = match.group(2)
+    if not match.group(1):
+        return tags + ((name, token),)
+    for i in range(len(tags) - 1, -1, -1):
+        if tags[i][0] == name:
+            return tags[:i] + tags[i + 1:]
+    return tags
+
+
+def _split_block(block: str, limit: int) -> List[str]:
+    # Блок длиннее лимита режем по последнему переводу строки, а слишком длинную строку —
+    # между тегами и сущностями. Открытые теги закрываем в конце части и открываем
+    # заново в следующей, иначе Telegram не разберёт разметку
+    if message_length(block) <= limit:
+        return [block]
+
+    parts = []
+    opened: tuple = ()  # теги, открытые к началу текущей части
+    opened_size = 0
+    tags: tuple = ()    # теги, открытые к концу набранного текста
+    body: List[str] = []
+    size = 0
+    cut = None          # (позиция, размер, теги) после последнего перевода строки
+
+    for token in _TOKEN.findall(block):
+        after = _apply_tag(tags, token)
+        length = message_length(token)
+        while body and opened_size + size + length + message_length(_closing(after)) > limit:
+            end, end_size, end_tags = cut or (len(body), size, tags)
+            text = "".join(body[:end])
+            # Часть из одних тегов не нужна: открытые в ней теги перейдут в следующую
+            if _TAG.sub("", text):
+                parts.append(_opening(opened) + text + _closing(end_tags))
+            opened, body, size, cut = end_tags, body[end:], size - end_size, None
+            opened_size = message_length(_opening(opened))
+        body.append(token)
+        size += length
+        tags = after
+        if token == "\n":
+            cut = (len(body), size, tags)
+
+    text = "".join(body)
+    if _TAG.sub("", text):
+        parts.append(_opening(opened) + text + _closing(tags))
+    return parts
+
+
+def split_message(blocks: List[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Склеивает блоки текста в сообщения не длиннее limit.
+    Сообщения разрываются только между блоками (записями отчёта),
+    кроме блоков, которые сами не помещаются в одно сообщение.
+    """
+    messages = []
+    current: List[str] = []
+    size = 0
+
+    for block in blocks:
+        for part in _split_block(block, limit):
+            length = message_length(part)
+            if current and size + length > limit:
+                messages.append("".join(current))
+                current, size = [], 0
+            current.append(part)
+            size += length
+
+    if current:
+        messages.append("".join(current))
+
+    # Сообщения из одних пробелов и переводов строк Telegram не принимает
+    return [message for message in messages if message.strip()]
+
+
+def format_report_preview(title: str, items: List[str]) -> List[str]:
+    """
+    Сообщения с превью отчёта: заголовок, количество записей
+    и первые MAX_PREVIEW строк, разбитые по лимиту длины сообщения.
+    """
+    blocks = [f"{title}\n\n", f"<i>Найдено записей: {len(items)}\n\n</i>"]
+    blocks.extend(f"• {item}\n" for item in items[:MAX_PREVIEW])
+
+    # Если в отчёте больше 20 записей, готовим отправку файла
+    if len(items) > MAX_PREVIEW:
+        blocks.append("\n📎 <b>Полный список прикреплён файлом</b> 👇")
+
+    return split_message(blocks)
+
+
+def format_page(pages: StoredList, token: str, cursor: int) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Страница списка для листания: заголовок, количество записей и до MAX_PREVIEW
+    записей, начиная с cursor, — столько, сколько помещается в одно сообщение.
+    """
+    total = len(pages)
+    cursor = min(max(cursor, 0), max(total - 1, 0))
+    header = f"{pages.title}\n\n<i>Найдено записей: {total}\n\n</i>"
+    # Место под строку «Записи X–Y из N» с самыми длинными номерами
+    size = message_length(header) + message_length(f"\n<i>Записи {total}–{total} из {total}</i>")
+
+    blocks = []
+    for item in pages.slice(cursor, cursor + MAX_PREVIEW):
+        block = f"• {item}\n"
+        if size + message_length(block) > MAX_MESSAGE_LENGTH:
+            if blocks:
+                break
+            # Запись длиннее сообщения — показываем её начало
+            block = _split_block(block, MAX_MESSAGE_LENGTH - size)[0]
+        blocks.append(block)
+        size += message_length(block)
+
+    stop = cursor + len(blocks)
+    text = header + "".join(blocks) + f"\n<i>Записи {cursor + 1}–{stop} из {total}</i>"
+    return text, page_keyboard(token, cursor, stop, total, MAX_PREVIEW, export=pages.tables is not None)
+
+
+def format_report_file(items: List[str]) -> str:
+    """
+    Содержимое файла с полным списком записей.
+    """
+    return "".join(item + "\n" for item in items)
+
+
+def combined_needs_file(sections: List[tuple[str, List[str]]]) -> bool:
+    return any(len(items) > MAX_COMBINED_PREVIEW for _, items in sections)
+
+
+def strip_tags(text: str) -> str:
+    return re.sub(r"<[^>]+>", "", text)
+
+
+def format_combined_preview(sections: List[tuple[str, List[str]]]) -> List[str]:
+    """
+    Сводные сообщения по нескольким отчётам: для каждого отчёта заголовок,
+    количество записей и первые MAX_COMBINED_PREVIEW строк.
+    """
+    blocks = []
+    for title, items in sections:
+        blocks.append(f"{title}\n")
+        if items:
+            blocks.append(f"<i>Найдено записей: {len(items)}</i>\n")
+            blocks.extend(f"• {item}\n" for item in items[:MAX_COMBINED_PREVIEW])
+        blocks.append("\n")
+
+    if combined_needs_file(sections):
+        blocks.append("📎 <b>Полные списки прикреплены файлом</b> 👇")
+
+    return split_message(blocks)
+
+
+def format_combined_file(sections: List[tuple[str, List[str]]]) -> str:
+    """
+    Содержимое файла с полными списками всех отчётов, сгруппированными по отчётам.
+    """
+    # В файле HTML-разметка заголовков не нужна
+    return "\n".join(
+        f"{strip_tags(title)}\n\n" + format_report_file(items)
+        for title, items in sections if items
+    )
+
+
+def prepare_report(
     *,
-    bot: TeleBot,
     chat_id: int,
     title: str,
     items: List[str],
     empty_message: str = "✅ Нарушений не найдено",
-    filename_prefix: str = "report"
-) -> None:
+    filename_prefix: str = "report",
+    table: pd.DataFrame | None = None
+) -> tuple[List[str], List[tuple[str, bytes]]]:
     """
-    Универсальная отправка отчёта:
-    - превью в чат (первые MAX_PREVIEW строк)
-    - полный список в файле, если строк больше MAX_PREVIEW
+    Сообщения и файлы (имя, содержимое) для отправки отчёта.
+    Файлы собираются в памяти, на диск ничего не пишется.
     """
-
     if not items:
-        bot.send_message(chat_id, empty_message, parse_mode='HTML')
-        return
+        return [empty_message], []
 
-    preview = items[:MAX_PREVIEW]
+    with metrics.timed("format"):
+        filename = f"{filename_prefix}_{chat_id}"
+        documents = []
+        if len(items) > MAX_PREVIEW:
+            documents.append((f"{filename}.txt", format_report_file(items).encode("utf-8")))
+        if table is not None:
+            documents.extend(export_documents({filename_prefix: table}, filename))
 
-    message = f"{title}\n\n"
-    message += f"<i>Найдено записей: {len(items)}\n\n</i>"
+        return format_report_preview(title, items), documents
 
-    for item in preview:
-        message += f"• {item}\n"
 
-    # Если в отчёте больше 20 записей, готовим отправку файла
-    if len(items) > MAX_PREVIEW:
-        message += "\n📎 <b>Полный список прикреплён файлом</b> 👇"
+def prepare_paged_report(
+    *,
+    chat_id: int,
+    title: str,
+    items: List[str],
+    filename_prefix: str = "report",
+    table: pd.DataFrame | None = None,
+    pages: PageStore | None = None
+) -> tuple[str, InlineKeyboardMarkup] | None:
+    """
+    Первая страница длинного отчёта с кнопками листания.
+    Список и таблица остаются в pages: следующие страницы бот показывает, редактируя
+    то же сообщение, а полный список и выгрузку таблицы отправляет файлами только по кнопкам.
+    None — отчёт помещается в превью или список не удалось сохранить.
+    """
+    if pages is None or len(items) <= MAX_PREVIEW:
+        return None
 
-    bot.send_message(chat_id, message, parse_mode='HTML')
+    tables = {filename_prefix: table} if table is not None and not table.empty else None
+    token = pages.put(chat_id, title, items, f"{filename_prefix}_{chat_id}", tables)
+    if token is None:
+        return None
 
-    # Отправка файла при необходимости
-    if len(items) > MAX_PREVIEW:
-        file_path = os.path.join(
-            REPORTS_DIR,
-            f"{filename_prefix}_{chat_id}.txt"
-        )
-        # Запись данных в файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            for item in items:
-                f.write(item + "\n")
-
-        with open(file_path, "rb") as f:
-            bot.send_document(chat_id, f)
+    with metrics.timed("format"):
+        return format_page(pages.get(token, chat_id), token, 0)
+
+
+def prepare_combined_report(
+    *,
+    chat_id: int,
+    sections: List[tuple[str, List[str]]],
+    tables: dict[str, pd.DataFrame] | None = None,
+    filename_prefix: str = "all_reports"
+) -> tuple[List[str], List[tuple[str, bytes]]]:
+    """
+    То же, что prepare_report, для сводного ответа по нескольким отчётам.
+    sections — список (заголовок, строки отчёта), tables — таблицы для выгрузки.
+    """
+    with metrics.timed("format"):
+        filename = f"{filename_prefix}_{chat_id}"
+        documents = []
+        if combined_needs_file(sections):
+            documents.append((f"{filename}.txt", format_combined_file(sections).encode("utf-8")))
+        if tables:
+            documents.extend(export_documents(tables, filename))
+
+        return format_combined_preview(sections), documents
+
+
+def send_prepared(bot: TeleBot, chat_id: int, messages: List[str], documents: List[tuple[str, bytes]]) -> None:
+    # Время отправки замеряет очередь отправки (QueuedBot): здесь запросы только ставятся в неё
+    for text in messages:
+        bot.send_message(chat_id, text, parse_mode='HTML')
+
+    for name, data in documents:
+        bot.send_document(chat_id, InputFile(io.BytesIO(data), name))
+
+
+def send_combined_report(
+    *,
+    bot: TeleBot,
+    chat_id: int,
+    sections: List[tuple[str, List[str]]],
+    tables: dict[str, pd.DataFrame] | None = None,
+    filename_prefix: str = "all_reports"
+) -> None:
+    """
+    Отправляет результаты нескольких отчётов одним ответом:
+    сводное сообщение и, если списки длинные, один общий файл.
+    """
+    send_prepared(bot, chat_id, *prepare_combined_report(
+        chat_id=chat_id, sections=sections, tables=tables, filename_prefix=filename_prefix
+    ))
+
+
+def send_report_with_preview(
+    *,
+    bot: TeleBot,
+    chat_id: int,
+    title: str,
+    items: List[str],
+    empty_message: str = "✅ Нарушений не найдено",
+    filename_prefix: str = "report",
+    table: pd.DataFrame | None = None,
+    pages: PageStore | None = None
+) -> None:
+    """
+    Универсальная отправка отчёта:
+    - превью в чат (первые MAX_PREVIEW строк, при необходимости несколькими сообщениями)
+    - полный список в файле, если строк больше MAX_PREVIEW;
+      если передано хранилище pages — вместо файла кнопки листания списка
+    - выгрузка записей в CSV/XLSX, если передана таблица
+      (для листаемого списка — по кнопке под сообщением)
+    """
+    paged = prepare_paged_report(
+        chat_id=chat_id, title=title, items=items, filename_prefix=filename_prefix, table=table, pages=pages
+    )
+    if paged is not None:
+        text, keyboard = paged
+        bot.send_message(chat_id, text, parse_mode='HTML', reply_markup=keyboard)
+        return
+
+    send_prepared(bot, chat_id, *prepare_report(
+        chat_id=chat_id,
+        title=title,
+        items=items,
+        empty_message=empty_message,
+        filename_prefix=filename_prefix,
+        table=table
+    ))
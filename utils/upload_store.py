@@ -0,0 +1,328 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# Файл индекса «чат -> текущий файл» внутри папки хранилища
+INDEX_NAME = "index.json"
+
+# Суффикс временного файла, пока загрузка не завершена
+PARTIAL_SUFFIX = ".part"
+
+# Через сколько секунд временный файл считается брошенным (загрузка прервана):
+# более свежие могут в этот момент дописываться другим процессом или потоком
+STALE_PARTIAL_SECONDS = 3600
+
+# Как часто (в секундах) записывать на диск время последнего обращения к файлам
+FLUSH_INTERVAL = 60
+
+
+class UploadTooLargeError(Exception):
+    """
+    Файл больше квоты одного чата.
+    """
+
+
+class StoredFile:
+    """
+    Текущий файл чата: путь на диске, SHA-256 содержимого и исходное имя.
+    """
+
+    def __init__(self, path: str, digest: str, name: str):
+        self.path = path
+        self.digest = digest
+        self.name = name
+
+
+class _ChatEntry:
+    def __init__(self, blob: str, digest: str, name: str, used: float):
+        self.blob = blob
+        self.digest = digest
+        self.name = name
+        self.used = used
+
+    def to_json(self) -> dict:
+        return {"blob": self.blob, "digest": self.digest, "name": self.name, "used": self.used}
+
+
+class UploadStore:
+    """
+    Хранилище загруженных файлов: у каждого чата — один текущий файл.
+
+    - файлы хранятся по хэшу содержимого: одинаковый файл из разных чатов
+      лежит на диске один раз;
+    - файл записывается на диск порциями и хэшируется по ходу записи,
+      целиком в памяти он не держится;
+    - файл одного чата не больше chat_quota байт, все файлы вместе — не больше
+      total_quota байт: при превышении удаляются давно не использованные файлы (LRU);
+      reserved() — сколько байт той же квоты занимают файлы вне хранилища (пакеты),
+      место под них освобождает reserve();
+    - файлы, к которым не обращались дольше ttl секунд, удаляются;
+    - индекс «чат -> файл» хранится в JSON рядом с файлами и переживает перезапуск:
+      изменения файлов записываются сразу, а время обращения — раз в flush_interval
+      секунд и в flush() (например, при остановке бота).
+
+    on_remove(path, digest) вызывается перед удалением файла с диска (например, чтобы сбросить
+    кэши и колоночную копию); digest — хэш содержимого из индекса.
+    При создании хранилище удаляет файлы, которых нет в индексе, — создавать его нужно
+    в одном процессе бота, а не при импорте модуля (его импортируют и процессы пула).
+    """
+
+    def __init__(
+        self, directory: str, chat_quota: int, total_quota: int, ttl: float, on_remove=None,
+        flush_interval: float = FLUSH_INTERVAL, reserved=None
+    ):
+        self.directory = directory
+        self.chat_quota = chat_quota
+        self.total_quota = total_quota
+        self.ttl = ttl
+        self.on_remove = on_remove
+        self.reserved = reserved
+
+        self._lock = threading.Lock()
+        self._chats: dict[int, _ChatEntry] = {}
+        # Имя файла в хранилище -> размер
+        self._blobs: dict[str, int] = {}
+        self._index_path = os.path.join(directory, INDEX_NAME)
+        # В индексе на диске устаревшее время обращения к файлам
+        self._dirty = False
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+        if flush_interval > 0:
+            threading.Thread(
+                target=self._flush_loop, args=(flush_interval,), name="upload-index", daemon=True
+            ).start()
+
+    def get(self, chat_id: int) -> StoredFile | None:
+        """
+        Текущий файл чата (None, если файла нет или он удалён по сроку).
+        """
+        with self._lock:
+            if self._evict_expired():
+                self._save_index()
+            entry = self._chats.get(chat_id)
+            if entry is None:
+                return None
+            # Время обращения запишется на диск в flush(), а не при каждом нажатии кнопки
+            entry.used = time.time()
+            self._dirty = True
+            return self._stored(entry)
+
+    def flush(self) -> None:
+        """
+        Записывает индекс на диск, если в нём изменилось время обращения к файлам.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def save(self, chat_id: int, file_name: str, chunks: Iterable[bytes]) -> StoredFile:
+        """
+        Записывает файл чата из порций байтов и делает его текущим файлом чата.
+        Если такой же файл уже есть в хранилище, новая копия не сохраняется.
+        """
+        # Расширение сохраняем: по нему openpyxl и pandas выбирают формат книги
+        file_name = os.path.basename(file_name)
+        partial_path, digest, size = write_chunks(self.directory, file_name, chunks, self.chat_quota)
+        blob = digest + os.path.splitext(file_name)[1].lower()
+
+        with self._lock:
+            if blob in self._blobs:
+                # Такой файл уже загружали (возможно, из другого чата)
+                _remove_quietly(partial_path)
+            else:
+                os.replace(partial_path, self._path(blob))
+                self._blobs[blob] = size
+
+            old = self._chats.get(chat_id)
+            entry = _ChatEntry(blob, digest, file_name, time.time())
+            self._chats[chat_id] = entry
+            if old is not None:
+                self._release(old.blob, old.digest)
+
+            self._evict_expired()
+            self._evict_over_quota(keep=chat_id)
+            self._save_index()
+
+            return self._stored(entry)
+
+    def remove(self, chat_id: int) -> None:
+        with self._lock:
+            entry = self._chats.pop(chat_id, None)
+            if entry is not None:
+                self._release(entry.blob, entry.digest)
+                self._save_index()
+
+    def reserve(self, size: int) -> bool:
+        """
+        Освобождает в общей квоте место под size байт файлов вне хранилища (например,
+        файла пакета), удаляя давно не использованные загрузки.
+        False — места не хватит и без них.
+        """
+        with self._lock:
+            if self._evict_over_quota(keep=None, extra=size):
+                self._save_index()
+            return self._used() + size <= self.total_quota
+
+    def total_size(self) -> int:
+        with self._lock:
+            return sum(self._blobs.values())
+
+    def digests(self) -> set[str]:
+        """
+        Хэши всех файлов хранилища.
+        """
+        with self._lock:
+            return {entry.digest for entry in self._chats.values()}
+
+    def _path(self, blob: str) -> str:
+        return os.path.join(self.directory, blob)
+
+    def _stored(self, entry: _ChatEntry) -> StoredFile:
+        return StoredFile(self._path(entry.blob), entry.digest, entry.name)
+
+    def _release(self, blob: str, digest: str) -> None:
+        # Файл удаляется с диска, когда на него не ссылается ни один чат
+        if any(entry.blob == blob for entry in self._chats.values()):
+            return
+        self._blobs.pop(blob, None)
+
+        path = self._path(blob)
+        if self.on_remove is not None:
+            try:
+                self.on_remove(path, digest)
+            except Exception:
+                logger.exception("Ошибка при удалении файла %s", path)
+        _remove_quietly(path)
+
+    def _flush_loop(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Не удалось записать индекс загрузок")
+
+    def _evict_expired(self) -> bool:
+        # True — какие-то файлы удалены по сроку
+        deadline = time.time() - self.ttl
+        expired = [(chat_id, entry) for chat_id, entry in self._chats.items() if entry.used < deadline]
+        for chat_id, entry in expired:
+            del self._chats[chat_id]
+            self._release(entry.blob, entry.digest)
+        return bool(expired)
+
+    def _used(self) -> int:
+        # Место в общей квоте: файлы хранилища и файлы вне его (reserved)
+        return sum(self._blobs.values()) + (self.reserved() if self.reserved is not None else 0)
+
+    def _evict_over_quota(self, keep: int | None, extra: int = 0) -> bool:
+        # Сначала удаляются файлы, к которым дольше всего не обращались.
+        # extra — место, которое нужно оставить свободным; True — что-то удалено
+        limit = self.total_quota - extra
+        evicted = False
+        for chat_id, entry in sorted(self._chats.items(), key=lambda item: item[1].used):
+            if self._used() <= limit:
+                break
+            if chat_id == keep:
+                continue
+            del self._chats[chat_id]
+            self._release(entry.blob, entry.digest)
+            evicted = True
+        return evicted
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            chats, blobs = index["chats"], index["blobs"]
+        except FileNotFoundError:
+            chats, blobs = {}, {}
+        except (OSError, ValueError, KeyError):
+            # В том числе индекс старого формата: файлы из него удалятся ниже
+            logger.warning("Индекс загрузок не прочитан, начинаем с пустого")
+            chats, blobs = {}, {}
+
+        for blob, size in blobs.items():
+            if os.path.exists(self._path(blob)):
+                self._blobs[blob] = size
+        for chat_id, data in chats.items():
+            if data["blob"] in self._blobs:
+                self._chats[int(chat_id)] = _ChatEntry(data["blob"], data["digest"], data["name"], data["used"])
+
+        # Файлы без записи в индексе (брошенные загрузки или из старых версий) больше не нужны
+        referenced = {entry.blob for entry in self._chats.values()}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name == INDEX_NAME or not os.path.isfile(path) or name in referenced:
+                continue
+            if name.endswith(PARTIAL_SUFFIX) and not is_stale_partial(path):
+                continue
+            self._blobs.pop(name, None)
+            _remove_quietly(path)
+
+        with self._lock:
+            self._evict_expired()
+            self._save_index()
+
+    def _save_index(self) -> None:
+        self._dirty = False
+        # Записываем во временный файл и подменяем, чтобы индекс не остался недописанным
+        data = {
+            "chats": {str(chat_id): entry.to_json() for chat_id, entry in self._chats.items()},
+            "blobs": self._blobs,
+        }
+        partial_path = self._index_path + PARTIAL_SUFFIX
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(partial_path, self._index_path)
+
+
+def is_stale_partial(path: str) -> bool:
+    """
+    Временный файл загрузки давно не менялся: загрузка прервана, файл можно удалить.
+    """
+    try:
+        return time.time() - os.path.getmtime(path) > STALE_PARTIAL_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def write_chunks(directory: str, file_name: str, chunks: Iterable[bytes], limit: int) -> tuple[str, str, int]:
+    """
+    Записывает порции байтов во временный файл в directory и считает SHA-256 по ходу записи.
+    Возвращает (путь временного файла, хэш, размер); файл больше limit байт —
+    UploadTooLargeError (временный файл удаляется).
+    """
+    # У каждой загрузки свой временный файл: один чат может прислать два файла подряд
+    fd, partial_path = tempfile.mkstemp(suffix=PARTIAL_SUFFIX, dir=directory)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLargeError(file_name)
+                sha.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        _remove_quietly(partial_path)
+        raise
+
+    return partial_path, sha.hexdigest(), size
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,96 @@
+import hmac
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram присылает secret_token из setWebhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Обновление Telegram — небольшой JSON; всё, что больше, не читаем
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookSecretError(ValueError):
+    """
+    Webhook запускается без секретного токена.
+    """
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    HTTP-сервер, принимающий обновления Telegram (режим webhook).
+
+    Обновление проверяется (путь, секретный токен, JSON) и передаётся в on_update(update).
+    Без секретного токена кто угодно, знающий адрес, мог бы слать боту поддельные
+    обновления, поэтому сервер с пустым secret не запускается (WebhookSecretError).
+    on_update должен быстро вернуть управление: обработчики бота выполняются
+    в его пуле потоков (TeleBot) или в цикле событий (AsyncTeleBot),
+    а Telegram ждёт ответа на запрос не дольше нескольких секунд.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, path: str, secret: str, on_update):
+        if not secret:
+            raise WebhookSecretError("WEBHOOK_SECRET не задан: режим webhook без секретного токена не запускается")
+        super().__init__((host, port), _WebhookHandler)
+        self.webhook_path = path
+        self.secret = secret
+        self.on_update = on_update
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    server: WebhookServer
+
+    def do_POST(self):
+        if self.path.split("?")[0] != self.server.webhook_path:
+            self.send_error(404)
+            return
+
+        if not hmac.compare_digest(
+            self.headers.get(SECRET_HEADER, "").encode(), self.server.secret.encode()
+        ):
+            self.send_error(403)
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.send_error(411)
+            return
+        # rfile.read(-1) ждал бы, пока клиент не закроет соединение
+        if length < 0:
+            self.send_error(400)
+            return
+        if length > MAX_BODY_SIZE:
+            self.send_error(413)
+            return
+
+        try:
+            update = Update.de_json(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError, TypeError):
+            update = None
+        if update is None:
+            self.send_error(400)
+            return
+
+        try:
+            self.server.on_update(update)
+        except Exception:
+            # Ошибку в одном обновлении не возвращаем Telegram: иначе он будет присылать его снова
+            logger.exception("Ошибка при обработке обновления %s", update.update_id)
+
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.send_error(405)
+
+    def log_message(self, format, *args):
+        # Каждое обновление — отдельный запрос, не засоряем ими лог бота
+        pass